@@ -1,18 +1,20 @@
 import streamlit as st
-import numpy as np
-from PIL import Image
-import io
+from crochet.auth import password_matches
+from crochet.timing import span
 
-import streamlit as st
-import hmac
-import matplotlib.pyplot as plt
+# Only the modules above load before the password gate. The rest are
+# imported after it, and Pillow, Matplotlib and the chart engine only by
+# the features that use them, so cold starts and unauthenticated visits
+# stay cheap.
 
 # --- PASSWORD PROTECTION ---
 def check_password():
     """Returns `True` if the user had the correct password."""
     def password_entered():
         """Checks whether a password entered by the user is correct."""
-        if hmac.compare_digest(st.session_state["password"], st.secrets["password"]):
+        with span("password_check"):
+            matched = password_matches(st.session_state["password"], st.secrets["password"])
+        if matched:
             st.session_state["password_correct"] = True
             del st.session_state["password"]  # Don't store the password
         else:
@@ -36,6 +38,17 @@ def check_password():
 if not check_password():
     st.stop()  # Do not run any more of the app
 
+import io
+import os
+import uuid
+
+from crochet.gauge import YARN_WEIGHTS, Gauge, base_stitch, default_gauge
+from crochet.pattern import MEASUREMENT_SYSTEMS
+from crochet.pipeline import get_chart_pipeline, get_pattern_pipeline
+from crochet.sessions import get_session_store
+from crochet.stitches import DIFFICULTIES, DRAPES, PRESETS, SHAPES, STITCH_DATABASE, get_library
+from crochet.timing import prometheus_text, snapshot
+
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
     page_title="Crochet Architect",
@@ -61,126 +74,9 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# --- DATABASE: STITCH LIBRARY WITH HYPERLINKS ---
-STITCH_DATABASE = {
-    "Treble Mesh": {
-        "desc": "Creates a grid of open squares. Ideal for airy shawls and wraps.",
-        "abbr_uk": "tr, ch1, sk1",
-        "abbr_us": "dc, ch1, sk1",
-        "video": "https://www.youtube.com/results?search_query=filet+mesh+stitch+beginner",
-        "tutorial_name": "Filet / Mesh Stitch (Beginner)",
-        "difficulty": "Beginner",
-        "drape": "Airy"
-    },
-    "Granite Stitch": {
-        "desc": "Also known as Moss Stitch or Linen Stitch. Dense, woven texture.",
-        "abbr_uk": "dc, ch1, sk1",
-        "abbr_us": "sc, ch1, sk1",
-        "video": "https://www.youtube.com/results?search_query=granite+stitch+moss+stitch+beginner",
-        "tutorial_name": "Granite / Moss Stitch (Beginner)",
-        "difficulty": "Beginner",
-        "drape": "Structured"
-    },
-    "Double Crochet": {
-        "desc": "Standard solid fabric. Very common in blankets and garments.",
-        "abbr_uk": "tr",
-        "abbr_us": "dc",
-        "video": "https://www.youtube.com/results?search_query=double+crochet+stitch+beginner",
-        "tutorial_name": "Double Crochet Stitch (Beginner)",
-        "difficulty": "Beginner",
-        "drape": "Medium"
-    },
-    "Granny Cluster": {
-        "desc": "Classic 3-stitch groups, used in traditional granny squares.",
-        "abbr_uk": "3tr group",
-        "abbr_us": "3dc group",
-        "video": "https://www.youtube.com/results?search_query=granny+cluster+stitch+beginner",
-        "tutorial_name": "Granny Cluster Stitch (Beginner)",
-        "difficulty": "Intermediate",
-        "drape": "Medium"
-    }
-}
-
-# --- PRESET PATTERNS ---
-PRESETS = {
-    "Custom": {},
-    "Classic Shawl": {
-        "shape": "Square",
-        "size": 100,
-        "neck": 15,
-        "stitch": "Treble Mesh",
-        "description": "A flowing square shawl with neck opening."
-    },
-    "Baby Blanket": {
-        "shape": "Rectangle",
-        "size": 80,
-        "neck": 0,
-        "stitch": "Granite Stitch",
-        "description": "A cozy rectangular blanket for babies."
-    },
-    "Coaster": {
-        "shape": "Square",
-        "size": 10,
-        "neck": 0,
-        "stitch": "Double Crochet",
-        "description": "Quick little coaster in solid DC."
-    },
-    "Shawlette": {
-        "shape": "Triangle",
-        "size": 60,
-        "neck": 0,
-        "stitch": "Shell Stitch",
-        "description": "Small triangular shawl with shell edge."
-    }
-}
-
-def draw_shape_outline(shape: str, size: float = 10):
-    """Return a Matplotlib figure showing the overall project shape."""
-    fig, ax = plt.subplots(figsize=(3, 3))
-    ax.set_aspect("equal")
-    ax.axis("off")
-
-    if shape == "Square":
-        ax.add_patch(plt.Rectangle((-1, -1), 2, 2, fill=False, linewidth=3, color="purple"))
-    elif shape == "Rectangle":
-        ax.add_patch(plt.Rectangle((-1.5, -1), 3, 2, fill=False, linewidth=3, color="purple"))
-    elif shape == "Circle":
-        ax.add_patch(plt.Circle((0, 0), 1, fill=False, linewidth=3, color="purple"))
-    elif shape == "Triangle":
-        ax.plot([0, -1, 1, 0], [1, -1, -1, 1], color="purple", linewidth=3)
-    else:
-        ax.add_patch(plt.Rectangle((-1, -1), 2, 2, fill=False, linewidth=3, color="purple"))
-
-    ax.set_title(f"{shape} outline", fontsize=10)
-    return fig
-
-
-def draw_stitch_texture(stitch_name: str):
-    """Return a Matplotlib figure approximating the stitch texture as a small grid."""
-    fig, ax = plt.subplots(figsize=(3, 3))
-    ax.set_aspect("equal")
-    ax.axis("off")
-
-    # Small grid
-    rows, cols = 8, 8
-
-    if "Mesh" in stitch_name:  # Treble Mesh / Filet Mesh
-        grid = np.zeros((rows, cols))
-        grid[::2, ::2] = 1  # spaced holes
-    elif "Granite" in stitch_name or "Moss" in stitch_name:
-        grid = np.ones((rows, cols)) * 0.6
-        grid[::2, 1::2] = 0.9  # woven look
-    elif "Granny" in stitch_name:
-        grid = np.zeros((rows, cols))
-        for r in range(0, rows, 4):
-            for c in range(0, cols, 4):
-                grid[r:r+3, c:c+3] = 0.8  # 3-stitch clusters
-    else:  # Double Crochet or default
-        grid = np.ones((rows, cols)) * 0.8  # solid
-
-    ax.imshow(grid, cmap="Purples")
-    ax.set_title(f"{stitch_name} texture", fontsize=10)
-    return fig
+# Charts and archives for this browser session live in the budgeted session
+# store under this id, not in st.session_state
+session_id = st.session_state.setdefault('session_id', uuid.uuid4().hex)
 
 # --- SIDEBAR CONFIGURATION ---
 
@@ -192,7 +88,7 @@ experience_level = st.sidebar.radio(
 )
 
 st.sidebar.markdown("---")
-measurement_system = st.sidebar.radio("Measurement System", ["Metric (cm)", "Imperial (inches)"])
+measurement_system = st.sidebar.radio("Measurement System", MEASUREMENT_SYSTEMS)
 st.sidebar.title("🧶 Crochet Architect")
 st.sidebar.markdown("---")
 st.sidebar.info(
@@ -233,8 +129,8 @@ with tab1:
         # Input Fields
         shape = st.selectbox(
             "Shape",
-            ["Square", "Rectangle", "Circle", "Triangle"],
-            index=0 if "shape" not in defaults else ["Square", "Rectangle", "Circle", "Triangle"].index(defaults.get("shape", "Square"))
+            SHAPES,
+            index=0 if "shape" not in defaults else SHAPES.index(defaults.get("shape", "Square"))
         )
         
         unit = " inches" if "Imperial" in measurement_system else " cm"
@@ -277,6 +173,24 @@ with tab1:
             f"**Drape:** {stitch_info['drape']}"
         )
         
+        # Gauge drives the round-by-round counts and yardage estimate
+        yarn_weight = st.selectbox(
+            "Yarn Weight",
+            list(YARN_WEIGHTS.keys()),
+            index=list(YARN_WEIGHTS.keys()).index("Worsted (4)"),
+            help="Sets a typical gauge and hook size for the yardage estimate."
+        )
+        gauge = default_gauge(yarn_weight, base_stitch(stitch_info['abbr_us']))
+        if st.toggle("Use my own swatch gauge", help="Enter the stitches and rows you measured over 10 cm."):
+            col_g1, col_g2, col_g3 = st.columns(3)
+            with col_g1:
+                swatch_sts = st.number_input("Sts / 10 cm", min_value=1.0, value=float(gauge.stitches_per_10cm), step=0.5)
+            with col_g2:
+                swatch_rows = st.number_input("Rows / 10 cm", min_value=1.0, value=float(gauge.rows_per_10cm), step=0.5)
+            with col_g3:
+                swatch_hook = st.number_input("Hook (mm)", min_value=1.0, value=float(gauge.hook_mm), step=0.25)
+            gauge = Gauge(swatch_sts, swatch_rows, swatch_hook, yarn_weight, gauge.base_stitch)
+        
         generate_btn = st.button("🎯 Generate Pattern", type="primary", use_container_width=True)
     
     # Pattern Output
@@ -285,108 +199,43 @@ with col2:
         st.session_state['generated_pattern'] = True
 
         with st.spinner("Generating your pattern..."):
-            # Calculate pattern metrics
-            unit_abbr = '"' if "Imperial" in measurement_system else "cm"
-            size_per_color = int(size / colors) if colors > 0 else size
-            est_rounds = int((size - neck) / 2.5) if neck > 0 else int(size / 2.5)
-
-            # Build Pattern Text
-            pattern_text = f"""# {shape} {stitch_key} Pattern
-
-## Project Summary
-- **Shape:** {shape}
-- **Final Dimensions:** {size}{unit_abbr} width
-- **Neck/Opening:** {neck}{unit_abbr} (if applicable)
-- **Stitch:** {stitch_key}
-- **Colors:** {colors}
-
-## Stitch Information
-**Abbreviation (UK):** `{stitch_info['abbr_uk']}`
-**Abbreviation (US):** `{stitch_info['abbr_us']}`
-**Difficulty Level:** {stitch_info['difficulty']}
-**Drape Type:** {stitch_info['drape']}
-
-## Key Abbreviations
-| Abbreviation | Meaning |
-|---|---|
-| ch | Chain |
-| st/sts | Stitch/Stitches |
-| sc | Single Crochet |
-| dc | Double Crochet |
-| tr | Treble |
-| sk | Skip |
-| sl st | Slip Stitch |
-| inc | Increase |
-| dec | Decrease |
-
-## Pattern Instructions
-
-### Foundation
-1. **Starting Chain:** Create a foundation chain of approximately {int(neck * 1.5 if neck > 0 else size * 0.5)}{unit_abbr}
-2. **Join:** Slip stitch to form a ring (or work flat if rectangular)
-3. **Setup Round:** Work {stitch_key} stitches evenly around the ring
-
-### Body (Work in Rounds)
-- **Rounds 1-{est_rounds}:** Continue working {stitch_key} in rounds
-- **Increases:** Place increases at {4 if shape == "Square" else 3} evenly spaced points per round (for even expansion)
-- **Row Height:** Approximately 2–3{unit_abbr} per round (adjust based on your gauge)
-
-### Color Pattern
-Work the following colors in striped rounds:
-"""
-
-            # this loop MUST be indented under the spinner
-            for i in range(colors):
-                pattern_text += (
-                    f"\n- **Color {i+1}:** Rounds "
-                    f"{i*size_per_color//2}-{(i+1)*size_per_color//2}"
-                )
-
-            pattern_text += f"""
-
-### Finishing
-1. Cut yarn leaving 6{unit_abbr} tail
-2. Pull through last loop
-3. Weave in all ends
-4. **Block:** Wet block and pin to shape for best results
-
-## Gauge & Notes
-- Adjust hook size if your gauge is off
-- This pattern is a guideline—modify to fit your yarn weight
-- Always swatch first!
-
----
-**[Watch {stitch_info['tutorial_name']} →]({stitch_info['video']})**
-"""
-            st.session_state['pattern_content'] = pattern_text
+            pattern_model = get_pattern_pipeline().model(
+                shape, stitch_key, stitch_info, size, neck, colors, measurement_system, gauge
+            )
+            st.session_state['pattern_model'] = pattern_model
+            st.session_state['pattern_content'] = get_pattern_pipeline().render(pattern_model)
 
         
     # Display Generated Pattern
     if 'generated_pattern' in st.session_state and st.session_state['generated_pattern']:
+        requested = st.session_state['pattern_model'].requested_colors
+        if requested:
+            st.warning(f"Only {st.session_state['pattern_model'].colors} of the {requested} colors fit: "
+                       "each color needs at least one round at this size and gauge.")
         st.markdown(st.session_state['pattern_content'])
 
         # Visual panels under the pattern
         st.markdown("### Visual preview")
 
         viz_col1, viz_col2 = st.columns(2)
+        outline_png, texture_png = get_pattern_pipeline().previews(shape, stitch_key)
 
         with viz_col1:
             st.caption("Project outline (not to scale)")
-            fig_outline = draw_shape_outline(shape)
-            st.pyplot(fig_outline)
+            st.image(outline_png)
 
         with viz_col2:
             st.caption("Stitch texture (schematic only)")
-            fig_stitch = draw_stitch_texture(stitch_key)
-            st.pyplot(fig_stitch)
+            st.image(texture_png)
 
             
         # Download Button
-        col_down1, col_down2 = st.columns(2)
+        pattern_model = st.session_state['pattern_model']
+        col_down1, col_down2, col_down3, col_down4 = st.columns(4)
         with col_down1:
             st.download_button(
                 label="📥 Download as Text",
-                data=st.session_state['pattern_content'],
+                data=get_pattern_pipeline().render(pattern_model, "text"),
                 file_name=f"crochet_pattern_{shape.lower()}.txt",
                 mime="text/plain",
                 use_container_width=True
@@ -399,6 +248,22 @@ Work the following colors in striped rounds:
                 mime="text/markdown",
                 use_container_width=True
             )
+        with col_down3:
+            st.download_button(
+                label="📥 Download as HTML",
+                data=get_pattern_pipeline().render(pattern_model, "html"),
+                file_name=f"crochet_pattern_{shape.lower()}.html",
+                mime="text/html",
+                use_container_width=True
+            )
+        with col_down4:
+            st.download_button(
+                label="📥 Download as PDF",
+                data=get_pattern_pipeline().pdf(pattern_model),
+                file_name=f"crochet_pattern_{shape.lower()}.pdf",
+                mime="application/pdf",
+                use_container_width=True
+            )
             
         # Video Tutorial
         st.markdown("---")
@@ -412,104 +277,325 @@ with tab2:
     st.header("🖼️ Image to Crochet Chart")
     st.markdown("Convert images to pixel-based crochet charts (ideal for C2C, Filet, or Tapestry crochet).")
     
-    uploaded_file = st.file_uploader(
-        "Upload an image (JPEG, PNG, or GIF)",
-        type=['jpg', 'jpeg', 'png', 'gif'],
-        help="Upload a small, simple image for best results."
+    def color_settings(key_prefix: str = None):
+        """Color Matching and Dithering selectors, shared by single and batch conversion.
+
+        Returns the ``(quantizer, dither)`` settings for ``convert_image``.
+        """
+        from crochet.dither import DITHER_LABELS
+        from crochet.quantize import YARN_PALETTES
+
+        color_match_options = {
+            "Automatic (median cut)": "median_cut",
+            "Perceptual (k-means)": "kmeans",
+            **{f"🧶 Yarn palette: {name}": f"yarn:{name}" for name in YARN_PALETTES},
+        }
+        color_match = st.selectbox(
+            "Color Matching",
+            list(color_match_options.keys()),
+            help="Yarn palettes map every stitch to the nearest shade you can actually buy, "
+                 "keeping the most used shades up to your color count.",
+            key=f"{key_prefix}_color_match" if key_prefix else None
+        )
+        dither = st.selectbox(
+            "Dithering",
+            list(DITHER_LABELS),
+            format_func=DITHER_LABELS.get,
+            help="Mixes stitches of neighbouring colors to keep gradients in photos and portraits. "
+                 "Crochet-friendly dithering only spreads color between rows, so runs stay long "
+                 "and there are fewer yarn changes.",
+            key=f"{key_prefix}_dither" if key_prefix else None
+        )
+        return color_match_options[color_match], dither
+
+    batch_mode = st.toggle(
+        "📦 Batch mode",
+        help="Convert many images (or a ZIP of images) at once and download every chart in one archive."
     )
     
+    if batch_mode:
+        from crochet.batch import convert_many, iter_zip, is_image_name, write_archive
+        
+        batch_files = st.file_uploader(
+            "Upload images or ZIP archives",
+            type=['jpg', 'jpeg', 'png', 'gif', 'zip'],
+            accept_multiple_files=True
+        )
+        col_b1, col_b2 = st.columns(2)
+        with col_b1:
+            batch_width = st.slider("Width (stitches/blocks)", min_value=10, max_value=100, value=30, key="batch_width")
+        with col_b2:
+            batch_colors = st.slider("Number of Colors", min_value=2, max_value=20, value=6, key="batch_colors")
+        # The same color settings as a single conversion, so each chart matches converting that image alone
+        batch_quantizer, batch_dither = color_settings("batch")
+        
+        if batch_files and st.button("🔄 Convert All", type="primary", use_container_width=True):
+            # Uploads are already in memory, so listing them up front costs nothing
+            sources = []
+            for f in batch_files:
+                if f.name.lower().endswith(".zip"):
+                    sources.extend(iter_zip(f))
+                elif is_image_name(f.name):
+                    sources.append((f.name, f.getvalue()))
+            total = max(len(sources), 1)
+            
+            progress = st.progress(0.0, text="Converting...")
+            status = st.empty()
+            
+            def track(results):
+                for i, result in enumerate(results, 1):
+                    status.caption(f"{'✅' if result.ok else '⚠️'} {result.name}")
+                    progress.progress(i / total, text=f"Converted {i} of {total} images...")
+                    yield result
+            
+            archive = io.BytesIO()
+            results = convert_many(sources, batch_width, batch_colors, quantizer=batch_quantizer, dither=batch_dither)
+            summary = write_archive(track(results), archive)
+            progress.progress(1.0, text="Done")
+            get_session_store().put(session_id, 'batch_archive', summary, archive.getvalue())
+        
+        batch = get_session_store().get(session_id, 'batch_archive')
+        if batch is not None:
+            summary, batch_archive = batch
+            st.success(f"✅ {summary['converted']} charts converted, {summary['failed']} failed")
+            for err in summary['errors']:
+                st.warning(err)
+            st.download_button(
+                label="📥 All Charts (ZIP)",
+                data=batch_archive,
+                file_name="crochet_charts.zip",
+                mime="application/zip",
+                use_container_width=True
+            )
+        uploaded_file = None
+    else:
+        uploaded_file = st.file_uploader(
+            "Upload an image (JPEG, PNG, or GIF) or a saved chart (.crochet)",
+            type=['jpg', 'jpeg', 'png', 'gif', 'crochet'],
+            help="Upload a small, simple image for best results, or reopen a chart you saved earlier."
+        )
+    
     if uploaded_file is not None:
-        # Load and display original
-        image = Image.open(uploaded_file)
+        from crochet import chartfile
+        from crochet.analysis import ALLOWANCE, CHART_STYLES, yarn_rows
+        from crochet.cache import image_digest
+        from crochet.dither import DITHER_LABELS
+        from crochet.engine import LARGE_MAX_WIDTH, thumbnail_image
+        from crochet.instructions import c2c_instructions, filet_foundation, filet_instructions, instructions_text
+        from crochet.pdf import PAGE_SIZES, pdf_bytes
+        from crochet.render import symbol_name
+        
+        file_bytes = uploaded_file.getvalue()
+        saved_chart = uploaded_file.name.lower().endswith(chartfile.EXTENSION)
         
         col1, col2 = st.columns(2)
         
-        with col1:
-            st.subheader("Original Image")
-            st.image(image, use_container_width=True)
+        if saved_chart:
+            # A saved chart reopens exactly as it was, with no conversion
+            try:
+                loaded_key = f"file:{image_digest(file_bytes)}"
+                source = get_session_store().get(session_id, 'source')
+                if source is None or source[0] != loaded_key:
+                    source = (loaded_key, chartfile.loads(file_bytes))
+                    get_session_store().put(session_id, 'source', *source)
+                    st.session_state['chart_source_key'] = loaded_key
+                loaded = source[1]
+                with col1:
+                    st.subheader("Saved Chart")
+                    st.markdown(
+                        f"**{loaded.width}W × {loaded.height}H stitches**, {len(loaded.palette)} colors  \n"
+                        f"Width setting: {loaded.meta.get('width_sts', loaded.width)} sts · "
+                        f"Color matching: {loaded.meta.get('quantizer', 'unknown')} · "
+                        f"Dithering: {DITHER_LABELS.get(loaded.meta.get('dither', 'none'), 'unknown')}"
+                    )
+                    if loaded.meta.get('source_sha256'):
+                        st.caption(f"Source image SHA-256: `{loaded.meta['source_sha256'][:16]}…`")
+            except (ValueError, KeyError, TypeError) as e:  # the header is checked; settings are free-form
+                st.error(f"Could not open chart file: {e}")
+        else:
+            # Load and display original (display-sized; never decodes big photos in full)
+            image_bytes = file_bytes
+            image = thumbnail_image(image_bytes)
         
-        # Settings
-        st.subheader("⚙️ Chart Settings")
-        col_s1, col_s2 = st.columns(2)
+            with col1:
+                st.subheader("Original Image")
+                st.image(image, use_container_width=True)
         
-        with col_s1:
-            width_sts = st.slider(
-                "Width (stitches/blocks)",
-                min_value=10,
-                max_value=100,
-                value=30,
-                help="Wider = more detail, but more stitches to count."
+            # Settings
+            st.subheader("⚙️ Chart Settings")
+            large_chart = st.toggle(
+                "🛏️ Large chart mode",
+                help=f"For blanket-sized charts (up to {LARGE_MAX_WIDTH} stitches wide) from big photos. "
+                     "Decodes at reduced scale and processes the image in strips to keep memory low."
             )
+            col_s1, col_s2 = st.columns(2)
         
-        with col_s2:
-            num_colors = st.slider(
-                "Number of Colors",
-                min_value=2,
-                max_value=20,
-                value=6,
-                help="Reduce image to N distinct colors."
-            )
+            with col_s1:
+                width_sts = st.slider(
+                    "Width (stitches/blocks)",
+                    min_value=10,
+                    max_value=LARGE_MAX_WIDTH if large_chart else 100,
+                    value=30,
+                    help="Wider = more detail, but more stitches to count."
+                )
         
-        # Convert Button
-        if st.button("🔄 Convert to Chart", type="primary", use_container_width=True):
-            with st.spinner("Converting image to stitch chart..."):
-                try:
-                    # Resize maintaining aspect ratio
-                    w_percent = (width_sts / float(image.size[0]))
-                    h_size = int((float(image.size[1]) * float(w_percent)))
-                    
-                    # Resize with NEAREST for pixel art effect
-                    img_small = image.resize((width_sts, h_size), Image.Resampling.NEAREST)
-                    
-                    # Quantize to N colors
-                    img_quantized = img_small.quantize(colors=num_colors)
-                    
-                    # Store in session
-                    st.session_state['chart_grid'] = np.array(img_quantized)
-                    st.session_state['chart_image'] = img_quantized
-                    st.session_state['chart_dimensions'] = (width_sts, h_size)
+            with col_s2:
+                num_colors = st.slider(
+                    "Number of Colors",
+                    min_value=2,
+                    max_value=20,
+                    value=6,
+                    help="Reduce image to N distinct colors."
+                )
+        
+            quantizer, dither = color_settings()
+        
+            # Convert Button
+            if st.button("🔄 Convert to Chart", type="primary", use_container_width=True):
+                with st.spinner("Converting image to stitch chart..."):
+                    try:
+                        # Only the stages whose inputs changed are recomputed
+                        source_key, source_chart = get_chart_pipeline().convert(
+                            image_bytes, width_sts, num_colors,
+                            large=large_chart, quantizer=quantizer, dither=dither
+                        )
+                        get_session_store().put(session_id, 'source', source_key, source_chart)
+                        st.session_state['chart_source_key'] = source_key
                     
-                except Exception as e:
-                    st.error(f"Error converting image: {e}")
+                    except Exception as e:
+                        st.error(f"Error converting image: {e}")
+        
+        with st.expander("🧹 Cleanup"):
+            merge_delta = st.slider(
+                "Merge similar colors (ΔE)",
+                min_value=0,
+                max_value=30,
+                value=0,
+                help="Colors closer than this perceptual distance become one yarn. 0 = off; "
+                     "around 10 merges shades most people would call the same."
+            )
+            col_c1, col_c2 = st.columns(2)
+            with col_c1:
+                min_area = st.slider(
+                    "Remove specks smaller than",
+                    min_value=1,
+                    max_value=5,
+                    value=1,
+                    help="Stitches with fewer same-colored stitches than this around them (themselves included) "
+                         "take the most common neighbouring color. 1 = off, 2 = single stitches."
+                )
+            with col_c2:
+                min_run = st.slider(
+                    "Shortest color run",
+                    min_value=1,
+                    max_value=5,
+                    value=1,
+                    help="Runs of a color shorter than this within a row are filled in. 1 = off."
+                )
+        
+        # The session only holds the source chart's key; the chart itself lives in the
+        # budgeted session store, and everything derived from it in the shared pipeline
+        chart = None
+        source = get_session_store().get(session_id, 'source')
+        if source is None and 'chart_source_key' in st.session_state:
+            # Dropped under memory pressure or after idling; converted charts are
+            # usually still in the shared chart cache
+            source_chart = get_chart_pipeline().lookup(st.session_state['chart_source_key'])
+            if source_chart is not None:
+                source = (st.session_state['chart_source_key'], source_chart)
+                get_session_store().put(session_id, 'source', *source)
+            else:
+                del st.session_state['chart_source_key']
+                st.info("This chart was cleared to free memory – convert the image again.")
+        
+        # Cleanup re-runs on every slider change without reconverting
+        if source is not None:
+            chart_key, chart = get_chart_pipeline().cleaned(*source, merge_delta, min_area, min_run)
         
         # Display Chart
-        if 'chart_image' in st.session_state:
+        if chart is not None:
             with col2:
                 st.subheader("Chart Preview")
-                # Resize for display
-                display_img = st.session_state['chart_image'].resize(
-                    (500, 500),
-                    Image.Resampling.NEAREST
+                show_symbols = st.toggle(
+                    "🔣 Color symbols",
+                    help="Overlay a distinct symbol on every color, for colorblind-friendly and black-and-white charts."
                 )
-                st.image(display_img, use_container_width=True)
+                st.image(get_chart_pipeline().preview_png(chart_key, chart, symbols=show_symbols),
+                         use_container_width=True)
+                st.caption("Rows are numbered from the bottom, stitches from the right; heavy lines every 10.")
             
             # Chart Info & Export
             st.markdown("---")
-            width, height = st.session_state['chart_dimensions']
+            width, height = chart.dimensions
             st.success(f"✅ Chart Generated: **{width}W × {height}H stitches**")
+            cleanup = chart.meta.get('cleanup')
+            if cleanup:
+                st.caption(
+                    f"🧹 Cleanup saved **{cleanup['yarn_changes_saved']}** color changes "
+                    f"({cleanup['yarn_changes_before']} → {cleanup['yarn_changes_after']}), "
+                    f"recolored {cleanup['stitches_changed']} stitches, "
+                    f"{cleanup['colors_before']} → {cleanup['colors_after']} colors."
+                )
             
             # Color Palette
             st.subheader("Color Palette")
-            palette = st.session_state['chart_image'].getpalette()
-            num_colors_actual = len(palette) // 3
+            with span("palette"):
+                palette = chart.palette
+                num_colors_actual = len(palette)
+                color_names = chart.meta.get('color_names', [])
             
             cols = st.columns(min(num_colors_actual, 6))
             for idx in range(num_colors_actual):
-                rgb = tuple(palette[idx*3:idx*3+3])
+                rgb = palette[idx]
+                label = f"Color {idx+1}" + (f" – {color_names[idx]}" if idx < len(color_names) else "")
+                if show_symbols:
+                    label += f" ({symbol_name(idx)})"
                 with cols[idx % len(cols)]:
-                    st.color_picker(f"Color {idx+1}", f"#{rgb[0]:02x}{rgb[1]:02x}{rgb[2]:02x}", disabled=True)
+                    st.color_picker(label, f"#{rgb[0]:02x}{rgb[1]:02x}{rgb[2]:02x}", disabled=True)
+            
+            # Yarn & color changes (vectorized over the grid, memoized per chart and gauge)
+            st.subheader("🧶 Yarn & Color Changes")
+            col_y1, col_y2 = st.columns(2)
+            with col_y1:
+                chart_yarn_weight = st.selectbox(
+                    "Yarn Weight",
+                    list(YARN_WEIGHTS.keys()),
+                    index=list(YARN_WEIGHTS.keys()).index("Worsted (4)"),
+                    key="chart_yarn_weight",
+                    help="Sets a typical gauge for the yardage estimate."
+                )
+            with col_y2:
+                yarn_style = st.radio(
+                    "Worked as",
+                    list(CHART_STYLES),
+                    horizontal=True,
+                    help="Tapestry: one single crochet per square, unused colors carried inside the stitches. "
+                         "C2C: one tile of 3 dc and a ch-3 per square."
+                )
+            analysis = get_chart_pipeline().analysis(chart_key, chart, default_gauge(chart_yarn_weight), yarn_style)
+            col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+            col_m1.metric("Total yarn", f"{analysis.total_meters:,.0f} m / {analysis.yards.sum():,.0f} yd")
+            col_m2.metric("Color changes", f"{analysis.total_changes:,}")
+            col_m3.metric("Most changes in a row", analysis.max_changes_per_row)
+            col_m4.metric("Most colors in a row", analysis.max_colors_per_row,
+                          help="In tapestry crochet, every color in a row is carried along it.")
+            yarn_table = [
+                {"Color": row[1], "Yarn": row[3] or row[2], "Stitches": row[4], "Carried": row[5],
+                 "Meters": row[6], "Yards": row[7]}
+                for row in yarn_rows("", chart, analysis)
+            ]
+            st.dataframe(yarn_table, hide_index=True, use_container_width=True)
+            st.caption(f"Includes {ALLOWANCE:.0%} for tails, joins and a gauge swatch.")
             
             # Download Chart
             st.subheader("Export Chart")
-            col_e1, col_e2, col_e3 = st.columns(3)
+            col_e1, col_e2, col_e3, col_e4 = st.columns(4)
             
             with col_e1:
                 # Save as image
-                buf = io.BytesIO()
-                st.session_state['chart_image'].save(buf, format="PNG")
                 st.download_button(
                     label="📥 Chart (PNG)",
-                    data=buf.getvalue(),
+                    data=get_chart_pipeline().png(chart_key, chart),
                     file_name="crochet_chart.png",
                     mime="image/png",
                     use_container_width=True
@@ -517,11 +603,7 @@ with tab2:
             
             with col_e2:
                 # Export as CSV (for counting)
-                csv_data = "Row,Stitch Count,Colors\n"
-                grid = st.session_state['chart_grid']
-                for row_idx, row in enumerate(grid):
-                    color_counts = np.bincount(row)
-                    csv_data += f"{row_idx},{len(row)},{len(color_counts)}\n"
+                csv_data = get_chart_pipeline().csv(chart_key, chart)
                 
                 st.download_button(
                     label="📥 Data (CSV)",
@@ -532,7 +614,90 @@ with tab2:
                 )
             
             with col_e3:
-                st.info("💡 Tip: Use C2C (Corner-to-Corner) or Filet Crochet for chart patterns.")
+                # Compact native file; upload it here later to carry on without reconverting
+                st.download_button(
+                    label="📥 Chart file (.crochet)",
+                    data=get_chart_pipeline().chart_file(chart_key, chart),
+                    file_name=f"crochet_chart{chartfile.EXTENSION}",
+                    mime=chartfile.MIME_TYPE,
+                    use_container_width=True
+                )
+            
+            with col_e4:
+                # Gridlines and row numbers at print resolution, symbols if shown above
+                st.download_button(
+                    label="🖨️ Printable chart (PNG)",
+                    data=get_chart_pipeline().printable_png(chart_key, chart, symbols=show_symbols),
+                    file_name="crochet_chart_print.png",
+                    mime="image/png",
+                    use_container_width=True
+                )
+            
+            st.info("💡 Tip: Use C2C (Corner-to-Corner) or Filet Crochet for chart patterns. "
+                    "Save the .crochet file to reopen this exact chart later.")
+            
+            # PDF: built on request, since big charts run to dozens of pages, and kept
+            # in the session store rather than rebuilt on every rerun
+            st.subheader("📄 PDF Pattern")
+            col_p1, col_p2 = st.columns(2)
+            with col_p1:
+                pdf_page_size = st.selectbox("Page size", list(PAGE_SIZES), key="pdf_page_size")
+            with col_p2:
+                include_pattern = st.checkbox(
+                    "Include the written pattern from the Pattern Generator",
+                    disabled='pattern_model' not in st.session_state,
+                    help="Generate a pattern in the first tab to add it to the PDF."
+                ) and 'pattern_model' in st.session_state
+            pdf_key = (chart_key, pdf_page_size, show_symbols, include_pattern)
+            if st.button("📄 Build PDF", use_container_width=True):
+                with st.spinner("Building PDF..."):
+                    pattern_text = None
+                    if include_pattern:
+                        pattern_text = get_pattern_pipeline().render(st.session_state['pattern_model'], "text")
+                    pdf_title = pattern_text.splitlines()[0] if pattern_text else "Crochet Chart"
+                    get_session_store().put(session_id, 'pdf', pdf_key, pdf_bytes(
+                        chart, pattern_text, title=pdf_title,
+                        page_size=PAGE_SIZES[pdf_page_size], symbols=show_symbols
+                    ))
+            built_pdf = get_session_store().get(session_id, 'pdf')
+            if built_pdf is not None and built_pdf[0] == pdf_key:
+                st.download_button(
+                    label="📥 Chart Pattern (PDF)",
+                    data=built_pdf[1],
+                    file_name="crochet_chart.pdf",
+                    mime="application/pdf",
+                    use_container_width=True
+                )
+            
+            # Written Instructions
+            st.subheader("📋 Written Instructions")
+            instr_style = st.radio(
+                "Chart style",
+                ["C2C (Corner-to-Corner)", "Filet"],
+                horizontal=True,
+                help="C2C works the chart in diagonal rows of tiles starting at the bottom-right corner. "
+                     "Filet works it in rows of open and closed blocks, darker colors closed."
+            )
+            grid = chart.grid
+            if instr_style.startswith("C2C"):
+                instr_rows = c2c_instructions(grid)
+                instr_text = instructions_text(
+                    "C2C Instructions", instr_rows,
+                    f"{width}W × {height}H tiles, {len(instr_rows)} diagonal rows. Start at the bottom-right corner; "
+                    "C1, C2, ... are the palette colors above."
+                )
+            else:
+                instr_rows = filet_instructions(grid, palette)
+                instr_text = instructions_text("Filet Instructions", instr_rows, filet_foundation(width))
+            
+            st.text_area("Instructions", instr_text, height=300, label_visibility="collapsed")
+            st.download_button(
+                label="📥 Instructions (TXT)",
+                data=instr_text,
+                file_name="c2c_instructions.txt" if instr_style.startswith("C2C") else "filet_instructions.txt",
+                mime="text/plain",
+                use_container_width=True
+            )
 
 # ==========================================
 # TAB 3: STITCH LIBRARY
@@ -541,29 +706,51 @@ with tab3:
     st.header("📚 Stitch Reference Library")
     st.markdown("Learn all available stitches with detailed descriptions and video tutorials.")
     
-    # Filter options
-    col_filt1, col_filt2 = st.columns(2)
+    library = get_library()
+    
+    # Search & filters (answered from the library's inverted indexes)
+    search_query = st.text_input(
+        "🔍 Search stitches",
+        placeholder="e.g. shell, granny, FPdc",
+        help="Matches stitch names, descriptions and UK/US abbreviations."
+    )
+    col_filt1, col_filt2, col_filt3 = st.columns([2, 2, 1])
     with col_filt1:
         difficulty_filter = st.multiselect(
             "Filter by Difficulty",
-            ["Beginner", "Intermediate", "Advanced"],
-            default=["Beginner", "Intermediate", "Advanced"]
+            DIFFICULTIES,
+            default=DIFFICULTIES
         )
     with col_filt2:
         drape_filter = st.multiselect(
             "Filter by Drape",
-            ["Airy", "Medium", "Structured", "Dimensional"],
-            default=["Airy", "Medium", "Structured", "Dimensional"]
+            DRAPES,
+            default=DRAPES
         )
+    with col_filt3:
+        abbr_filter = st.text_input("Abbreviation", placeholder="e.g. dc")
+        abbr_terms = st.radio("Terms", ["Any", "UK", "US"], horizontal=True, label_visibility="collapsed",
+                              help="UK and US terms differ: UK dc is US sc.")
+    
+    matches = library.search(search_query, difficulty_filter, drape_filter, abbr_filter,
+                             None if abbr_terms == "Any" else abbr_terms)
     
     st.markdown("---")
     
+    # Only one page of expanders is built per rerun
+    per_page = 10
+    n_pages = max(1, -(-len(matches) // per_page))
+    col_pg1, col_pg2 = st.columns([1, 3])
+    with col_pg1:
+        page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1) if n_pages > 1 else 1
+    with col_pg2:
+        st.caption(f"{len(matches)} of {len(library)} stitches" + (f" · page {page} of {n_pages}" if n_pages > 1 else ""))
+    if not matches:
+        st.info("No stitches match. Try fewer filters or a shorter search.")
+    
     # Display filtered stitches
-    for name, info in STITCH_DATABASE.items():
-        # Apply filters
-        if info['difficulty'] not in difficulty_filter or info['drape'] not in drape_filter:
-            continue
-        
+    for name in library.page(matches, page, per_page):
+        info = library[name]
         with st.expander(f"🧶 **{name}** — {info['difficulty']} | {info['drape']}"):
             col_exp1, col_exp2 = st.columns([2, 1])
             
@@ -584,23 +771,41 @@ with tab3:
                 st.metric("Difficulty", info['difficulty'])
                 st.metric("Drape", info['drape'])
             
-            # Embedded video
+            # Embedded video: the player is only created once asked for
             st.markdown("---")
-            with st.expander("📺 Video Tutorial"):
+            if st.toggle("📺 Video Tutorial", key=f"video_{name}"):
                 st.video(info['video'].replace('/embed/', '/watch?v='))
     
     # Summary statistics
     st.markdown("---")
     st.subheader("Library Statistics")
+    facets = library.facets()
     col_stat1, col_stat2, col_stat3 = st.columns(3)
     with col_stat1:
-        st.metric("Total Stitches", len(STITCH_DATABASE))
+        st.metric("Total Stitches", len(library))
     with col_stat2:
-        beginner_count = sum(1 for s in STITCH_DATABASE.values() if s['difficulty'] == 'Beginner')
-        st.metric("Beginner Stitches", beginner_count)
+        st.metric("Beginner Stitches", facets['difficulty'].get('Beginner', 0))
     with col_stat3:
-        advanced_count = sum(1 for s in STITCH_DATABASE.values() if s['difficulty'] == 'Advanced')
-        st.metric("Advanced Stitches", advanced_count)
+        st.metric("Advanced Stitches", facets['difficulty'].get('Advanced', 0))
+
+# --- DEBUG: STAGE TIMINGS ---
+# Enabled with CROCHET_DEBUG=1 or ?debug=1; rendered last so this run's spans are included.
+if os.environ.get("CROCHET_DEBUG") == "1" or st.query_params.get("debug") == "1":
+    with st.sidebar.expander("⏱️ Stage timings", expanded=True):
+        timings = snapshot()
+        if timings:
+            st.dataframe(
+                [{"stage": stage, "n": t["count"], "p50 ms": round(t["p50_ms"], 1), "p95 ms": round(t["p95_ms"], 1),
+                  "max ms": round(t["max_ms"], 1)} for stage, t in timings.items()],
+                hide_index=True,
+                use_container_width=True
+            )
+        else:
+            st.caption("No stages timed yet.")
+        st.caption(f"Chart pipeline: {get_chart_pipeline().stats()}")
+        st.caption(f"Pattern pipeline: {get_pattern_pipeline().stats()}")
+        st.caption(f"Session store: {get_session_store().stats()}")
+        st.download_button("📥 Prometheus metrics", prometheus_text(), file_name="crochet_metrics.txt", mime="text/plain")
 
 # --- FOOTER ---
 st.markdown("---")
@@ -0,0 +1,18 @@
+"""Streamlit-free core of Crochet Architect.
+
+Everything under this package can be imported from worker processes,
+scripts and benchmarks without booting the Streamlit UI in ``app.py``.
+
+The re-exports below resolve on first access, so importing a light
+submodule (``crochet.auth``, ``crochet.timing``) does not pull in NumPy
+and Pillow through the engine.
+"""
+
+__all__ = ["Chart", "convert_image", "decode_image"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        from crochet import engine
+        return getattr(engine, name)
+    raise AttributeError(f"module 'crochet' has no attribute {name!r}")
@@ -0,0 +1,212 @@
+"""Yarn consumption and color-change analysis of a chart.
+
+Everything is derived from the run-length encoding of the grid (see
+``crochet.export.row_runs``), so a 700 × 933 chart is a handful of
+bincount / reduceat passes:
+
+- stitches of each color, and the yarn they take under a gauge and a
+  chart style (how many stitches and chains one chart cell is worked in);
+- color changes in every row, and the most colors any one row uses -
+  in tapestry crochet that is how many strands are carried at once;
+- the carried strand of every color: from its first to its last stitch in
+  a row it runs inside the other colors' stitches, which costs yarn too.
+
+Yardage includes ``ALLOWANCE`` for tails, joins and swatching::
+
+    analysis = analyze_chart(chart, default_gauge("Worsted (4)"), style="Tapestry")
+    analysis.yards, analysis.max_colors_per_row
+
+``python -m crochet.analysis charts/ -o yarn.csv`` writes the per-color
+totals of every ``.crochet`` file under a folder, for kit packing.
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+from crochet.chartfile import EXTENSION as CHART_EXTENSION, load_chart
+from crochet.engine import Chart
+from crochet.export import RowRuns, row_runs
+from crochet.gauge import STITCH_BASES, YARDS_PER_METER, YARN_WEIGHTS, Gauge, default_gauge
+from crochet.timing import timed
+
+# Yarn per chain, in stitch widths
+CHAIN_YARN = 2.5
+
+# How one chart cell is worked: base stitch (None = the gauge's own),
+# stitches and chains per cell, and whether unused colors are carried.
+CHART_STYLES = {
+    "Tapestry": {"stitch": None, "stitches": 1, "chains": 0, "carry": True},
+    "C2C": {"stitch": "dc", "stitches": 3, "chains": 3, "carry": False},
+}
+
+# Extra yarn for tails, joins and a gauge swatch
+ALLOWANCE = 0.10
+
+
+@dataclass
+class ChartAnalysis:
+    """Per-color yarn totals and per-row color-change counts of one chart."""
+    stitches: np.ndarray          # (n_colors,) stitches of each color
+    carried: np.ndarray           # (n_colors,) stitches each color is carried through
+    meters: np.ndarray            # (n_colors,) yarn per color, allowance included
+    changes_per_row: np.ndarray   # (height,) color changes within each row
+    colors_per_row: np.ndarray    # (height,) distinct colors in each row
+    style: str
+    gauge: Gauge
+
+    @property
+    def yards(self) -> np.ndarray:
+        return self.meters * YARDS_PER_METER
+
+    @property
+    def total_meters(self) -> float:
+        return float(self.meters.sum())
+
+    @property
+    def total_changes(self) -> int:
+        return int(self.changes_per_row.sum())
+
+    @property
+    def max_colors_per_row(self) -> int:
+        return int(self.colors_per_row.max()) if self.colors_per_row.size else 0
+
+    @property
+    def max_changes_per_row(self) -> int:
+        return int(self.changes_per_row.max()) if self.changes_per_row.size else 0
+
+    def to_dict(self) -> dict:
+        return {
+            "style": self.style,
+            "yarn_weight": self.gauge.yarn_weight,
+            "stitches": self.stitches.tolist(),
+            "carried_stitches": self.carried.tolist(),
+            "meters": [round(m, 1) for m in self.meters.tolist()],
+            "yards": [round(y, 1) for y in self.yards.tolist()],
+            "total_meters": round(self.total_meters, 1),
+            "total_yards": round(self.total_meters * YARDS_PER_METER, 1),
+            "total_changes": self.total_changes,
+            "max_changes_per_row": self.max_changes_per_row,
+            "max_colors_per_row": self.max_colors_per_row,
+            "changes_per_row": self.changes_per_row.tolist(),
+            "colors_per_row": self.colors_per_row.tolist(),
+        }
+
+
+def cell_meters(gauge: Gauge, style: str = "Tapestry") -> float:
+    """Yarn used by one chart cell worked in ``style``, in meters."""
+    spec = CHART_STYLES[style]
+    stitch = spec["stitch"] or gauge.base_stitch
+    widths = spec["stitches"] * STITCH_BASES[stitch]["yarn"] + spec["chains"] * CHAIN_YARN
+    return widths / gauge.stitches_per_cm / 100.0
+
+
+def carried_stitches(runs: RowRuns, width: int) -> np.ndarray:
+    """Stitches each color is carried through: first-to-last span in each row minus its own stitches."""
+    n = runs.color_counts.shape[1]
+    if not runs.length.size:
+        return np.zeros(n, dtype=np.int64)
+    start = np.cumsum(runs.length) - runs.length - runs.row * width
+    end = start + runs.length
+    # Group the runs of each (row, color) together; reduceat spans each group
+    key = runs.row * n + runs.color
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    groups = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    span = np.maximum.reduceat(end[order], groups) - np.minimum.reduceat(start[order], groups)
+    own = runs.color_counts.ravel()[key[groups]]
+    return np.bincount(key[groups] % n, weights=span - own, minlength=n).astype(np.int64)
+
+
+@timed("analysis")
+def analyze_chart(chart: Chart, gauge: Gauge = None, style: str = "Tapestry") -> ChartAnalysis:
+    """Analyze ``chart`` worked in ``style`` at ``gauge`` (default: worsted single crochet)."""
+    if style not in CHART_STYLES:
+        raise ValueError(f"unknown chart style {style!r}; choose from {', '.join(CHART_STYLES)}")
+    gauge = gauge or default_gauge("Worsted (4)")
+    runs = row_runs(chart.grid, len(chart.palette))
+    stitches = runs.color_totals
+    carried = carried_stitches(runs, chart.width) if CHART_STYLES[style]["carry"] else np.zeros_like(stitches)
+    # A carried strand lies straight through the stitches: one stitch width per stitch
+    stitch_m = 1.0 / gauge.stitches_per_cm / 100.0
+    meters = (stitches * cell_meters(gauge, style) + carried * stitch_m) * (1.0 + ALLOWANCE)
+    return ChartAnalysis(stitches=stitches, carried=carried, meters=meters,
+                         changes_per_row=runs.yarn_changes, colors_per_row=runs.colors_per_row,
+                         style=style, gauge=gauge)
+
+
+YARN_CSV_HEADER = ["Chart", "Color", "Hex", "Name", "Stitches", "Carried", "Meters", "Yards",
+                   "Chart Changes", "Max Colors/Row"]
+
+
+def yarn_rows(name: str, chart: Chart, analysis: ChartAnalysis) -> list:
+    """Return one yarn CSV line per color used in ``chart``."""
+    names = chart.meta.get("color_names", [])
+    rows = []
+    for i in np.flatnonzero(analysis.stitches).tolist():
+        r, g, b = chart.palette[i]
+        rows.append([name, f"C{i + 1}", f"#{r:02x}{g:02x}{b:02x}", names[i] if i < len(names) else "",
+                     int(analysis.stitches[i]), int(analysis.carried[i]), round(float(analysis.meters[i]), 1),
+                     round(float(analysis.yards[i]), 1), analysis.total_changes, analysis.max_colors_per_row])
+    return rows
+
+
+def write_yarn_csv(charts, f, gauge: Gauge = None, style: str = "Tapestry") -> int:
+    """Stream per-color yarn totals of ``(name, chart)`` pairs into text file ``f``; returns charts written."""
+    writer = csv.writer(f)
+    writer.writerow(YARN_CSV_HEADER)
+    count = 0
+    for name, chart in charts:
+        writer.writerows(yarn_rows(name, chart, analyze_chart(chart, gauge, style)))
+        count += 1
+    return count
+
+
+def yarn_csv(charts, gauge: Gauge = None, style: str = "Tapestry") -> str:
+    """Return the yarn CSV of ``(name, chart)`` pairs as a string."""
+    buf = io.StringIO()
+    write_yarn_csv(charts, buf, gauge, style)
+    return buf.getvalue()
+
+
+def iter_chart_files(paths):
+    """Yield (name, Chart) for every ``.crochet`` file under the given files and folders."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for fname in sorted(files):
+                    if fname.endswith(CHART_EXTENSION):
+                        full = os.path.join(root, fname)
+                        yield os.path.splitext(os.path.relpath(full, path))[0], load_chart(full)
+        else:
+            yield os.path.splitext(os.path.basename(path))[0], load_chart(path)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Per-color yarn totals for many saved charts.")
+    parser.add_argument("inputs", nargs="+", help=f"{CHART_EXTENSION} files or folders")
+    parser.add_argument("-o", "--output", default="-", help="output CSV path (default: stdout)")
+    parser.add_argument("--yarn-weight", default="Worsted (4)", choices=list(YARN_WEIGHTS))
+    parser.add_argument("--stitch", default="sc", choices=list(STITCH_BASES), help="base stitch for tapestry charts")
+    parser.add_argument("--style", default="Tapestry", choices=list(CHART_STYLES))
+    args = parser.parse_args(argv)
+
+    gauge = default_gauge(args.yarn_weight, args.stitch)
+    charts = iter_chart_files(args.inputs)
+    if args.output == "-":
+        count = write_yarn_csv(charts, sys.stdout, gauge, args.style)
+    else:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            count = write_yarn_csv(charts, f, gauge, args.style)
+        print(f"{count} charts written to {args.output}", file=sys.stderr)
+    return 0 if count else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,399 @@
+"""Local JSON HTTP API for pattern generation and image-to-chart.
+
+Built on the standard library so it runs anywhere the core package does::
+
+    CROCHET_PASSWORD=... python -m crochet.api --port 8000 --workers 4
+
+Requests authenticate with ``Authorization: Bearer <password>``, checked
+with the same constant-time comparison as the Streamlit gate.
+
+Pattern requests are cheap and run in the request thread against the
+shared, memoized pattern pipeline. Chart conversions are CPU bound and
+go to a process pool behind an admission semaphore: at most
+``max_pending`` conversions may be queued or running, and requests
+beyond that are refused immediately with ``503`` and ``Retry-After``
+instead of piling up. Cached charts are answered without touching the
+pool.
+
+Endpoints:
+
+    GET  /health     pool capacity and in-flight conversions (no auth)
+    GET  /metrics    stage timing histograms, Prometheus text format (no auth)
+    GET  /stitches   stitch library, shapes and yarn weights
+                     (?q=shell&difficulty=Beginner,Intermediate&drape=Airy&abbreviation=dc
+                      &terms=any|UK|US&page=1&per_page=100)
+    POST /pattern    JSON parameters -> pattern model + rendered text
+    POST /chart      raw image body, settings in the query string
+                     (?width=30&colors=6&quantizer=median_cut&dither=none&large=0
+                      &format=json|csv|png|crochet)
+                     JSON also carries per-color yarn totals and color changes
+                     (&yarn_weight=Worsted%20(4)&style=Tapestry|C2C)
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from crochet.analysis import CHART_STYLES
+from crochet.auth import load_password, password_matches
+from crochet.cache import chart_key, image_digest
+from crochet.chartfile import MIME_TYPE
+from crochet.dither import DITHER_MODES
+from crochet.engine import LARGE_MAX_WIDTH, convert_image
+from crochet.gauge import YARN_WEIGHTS, Gauge, base_stitch, default_gauge
+from crochet.pattern import MEASUREMENT_SYSTEMS
+from crochet.pipeline import get_chart_pipeline, get_pattern_pipeline
+from crochet.quantize import quantizer_names
+from crochet.stitches import SHAPES, STITCH_DATABASE, get_library
+from crochet.timing import get_registry, prometheus_text, span
+
+MAX_BODY_BYTES = 25 * 1024 * 1024
+PATTERN_FORMATS = ("markdown", "text", "html")
+CHART_FORMATS = ("json", "csv", "png", "crochet")
+
+
+class ApiError(Exception):
+    """An error reported to the client as ``{"error": message}``."""
+
+    def __init__(self, status: HTTPStatus, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class ChartWorkers:
+    """Process pool for chart conversions with bounded admission."""
+
+    def __init__(self, max_workers: int = None, max_pending: int = None, timeout: float = 120.0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.max_workers * 4
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def convert(self, data: bytes, width_sts: int, num_colors: int, **options) -> tuple:
+        """Return ``(key, chart)``, from the chart cache or a worker process."""
+        pipeline = get_chart_pipeline()
+        digest = image_digest(data)
+        key = chart_key(digest, width_sts=width_sts, num_colors=num_colors, **options)
+        chart = pipeline.quantize.get(key)
+        if chart is not None:
+            return key, chart
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ApiError(HTTPStatus.SERVICE_UNAVAILABLE, "conversion queue is full, retry shortly",
+                           {"Retry-After": "1"})
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._pool.submit(convert_image, data, width_sts, num_colors, **options)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is held until the worker is done, not until we stop waiting:
+        # a timed-out conversion keeps its process busy and still counts as pending.
+        future.add_done_callback(self._release)
+        try:
+            chart = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise ApiError(HTTPStatus.GATEWAY_TIMEOUT, "conversion timed out")
+        except Exception as e:  # undecodable or unsupported image
+            raise ApiError(HTTPStatus.UNPROCESSABLE_ENTITY, f"{type(e).__name__}: {e}")
+        # Stage spans inside the worker stay in its registry; record the total here
+        get_registry().observe("convert", chart.meta.get("elapsed_ms", 0.0) / 1000.0)
+        chart.meta["source_sha256"] = digest
+        pipeline.quantize.put(key, chart)
+        return key, chart
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.max_workers, "capacity": self.max_pending,
+                    "in_flight": self._in_flight, "rejected": self._rejected}
+
+    def shutdown(self):
+        self._pool.shutdown(cancel_futures=True)
+
+
+# --- REQUEST PARSING ---
+def int_param(params: dict, name: str, default: int, low: int, high: int) -> int:
+    """Return an integer parameter, checking it lies in ``[low, high]``."""
+    value = params.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer")
+    if not low <= value <= high:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be between {low} and {high}")
+    return value
+
+
+def choice_param(params: dict, name: str, default: str, choices) -> str:
+    value = params.get(name, default)
+    if value not in choices:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be one of: {', '.join(choices)}")
+    return value
+
+
+def list_param(params: dict, name: str):
+    """Return a comma-separated parameter as a list, or None when absent."""
+    if name not in params:
+        return None
+    return [v.strip() for v in str(params[name]).split(",") if v.strip()]
+
+
+def bool_param(params: dict, name: str) -> bool:
+    value = params.get(name, False)
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def request_gauge(params: dict, stitch_info: dict):
+    """Return the Gauge described by ``yarn_weight`` and/or ``gauge``, or None."""
+    stitch = base_stitch(stitch_info["abbr_us"])
+    gauge = None
+    if "yarn_weight" in params:
+        gauge = default_gauge(choice_param(params, "yarn_weight", None, list(YARN_WEIGHTS)), stitch)
+    custom = params.get("gauge")
+    if custom is None:
+        return gauge
+    if not isinstance(custom, dict):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "gauge must be an object")
+    try:
+        return Gauge(
+            stitches_per_10cm=float(custom["stitches_per_10cm"]),
+            rows_per_10cm=float(custom["rows_per_10cm"]),
+            hook_mm=float(custom.get("hook_mm", gauge.hook_mm if gauge else 5.0)),
+            yarn_weight=gauge.yarn_weight if gauge else "Custom",
+            base_stitch=stitch,
+        )
+    except (KeyError, TypeError, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "gauge needs numeric stitches_per_10cm and rows_per_10cm")
+
+
+def pattern_response(params: dict) -> dict:
+    """Build and render a pattern from JSON request parameters."""
+    stitch_key = choice_param(params, "stitch", "Double Crochet", list(STITCH_DATABASE))
+    stitch_info = STITCH_DATABASE[stitch_key]
+    shape = choice_param(params, "shape", "Square", SHAPES)
+    size = int_param(params, "size", 100, 5, 1000)
+    neck = int_param(params, "neck", 0, 0, size)
+    colors = int_param(params, "colors", 6, 1, 12)
+    measurement_system = choice_param(params, "measurement_system", MEASUREMENT_SYSTEMS[0], MEASUREMENT_SYSTEMS)
+    fmt = choice_param(params, "format", "markdown", PATTERN_FORMATS)
+    gauge = request_gauge(params, stitch_info)
+
+    pipeline = get_pattern_pipeline()
+    model = pipeline.model(shape, stitch_key, stitch_info, size, neck, colors, measurement_system, gauge)
+    return {"pattern": model.to_dict(), "format": fmt, "text": pipeline.render(model, fmt)}
+
+
+def chart_params(query: dict) -> dict:
+    """Validate the chart settings in a parsed query string."""
+    large = bool_param(query, "large")
+    return {
+        "width_sts": int_param(query, "width", 30, 10, LARGE_MAX_WIDTH if large else 100),
+        "num_colors": int_param(query, "colors", 6, 2, 20),
+        "large": large,
+        "quantizer": choice_param(query, "quantizer", "median_cut", quantizer_names()),
+        "dither": choice_param(query, "dither", "none", DITHER_MODES),
+    }
+
+
+def chart_json(key: str, chart, analysis=None) -> dict:
+    return {
+        "key": key,
+        "width": chart.width,
+        "height": chart.height,
+        "palette": ["#%02x%02x%02x" % tuple(rgb) for rgb in chart.palette],
+        "grid": chart.grid.tolist(),
+        "meta": chart.meta,
+        "yarn": analysis.to_dict() if analysis is not None else None,
+    }
+
+
+# --- HTTP ---
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "CrochetArchitect/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.dispatch({"/health": self.health, "/metrics": self.metrics, "/stitches": self.stitches})
+
+    def do_POST(self):
+        self.dispatch({"/pattern": self.pattern, "/chart": self.chart})
+
+    def dispatch(self, routes: dict):
+        url = urlsplit(self.path)
+        self.query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            handler = routes.get(url.path)
+            if handler is None:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"no route for {self.command} {url.path}")
+            if handler not in (self.health, self.metrics):
+                self.authenticate()
+            with span(f"api{url.path}"):
+                handler()
+        except ApiError as e:
+            self.send_json({"error": str(e)}, e.status, e.headers)
+        except Exception as e:
+            self.log_error("%s failed: %r", url.path, e)
+            self.send_json({"error": "internal error"}, HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    def authenticate(self):
+        scheme, _, token = self.headers.get("Authorization", "").partition(" ")
+        with span("password_check"):
+            ok = scheme.lower() == "bearer" and password_matches(token.strip(), self.server.password)
+        if not ok:
+            self.drain()
+            raise ApiError(HTTPStatus.UNAUTHORIZED, "missing or incorrect password",
+                           {"WWW-Authenticate": 'Bearer realm="crochet"'})
+
+    def content_length(self) -> int:
+        """Return the declared body length; anything but a non-negative integer is a 400."""
+        value = (self.headers.get("Content-Length") or "0").strip()
+        if not (value.isascii() and value.isdigit()):
+            # The body's extent is unknown, so the connection cannot be reused
+            self.close_connection = True
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Content-Length must be a non-negative integer")
+        return int(value)
+
+    def drain(self):
+        """Discard an unread request body so the connection can be reused."""
+        length = self.content_length()
+        if 0 < length <= MAX_BODY_BYTES:
+            self.rfile.read(length)
+        elif length:
+            self.close_connection = True
+
+    def read_body(self) -> bytes:
+        length = self.content_length()
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"body exceeds {MAX_BODY_BYTES} bytes")
+        if not length:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "request body is empty")
+        return self.rfile.read(length)
+
+    def send_body(self, body: bytes, content_type: str, status=HTTPStatus.OK, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, payload, status=HTTPStatus.OK, headers: dict = None):
+        self.send_body(json.dumps(payload).encode("utf-8"), "application/json", status, headers)
+
+    # --- routes ---
+    def health(self):
+        self.send_json({"status": "ok", **self.server.workers.stats()})
+
+    def metrics(self):
+        self.send_body(prometheus_text().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+
+    def stitches(self):
+        library = get_library()
+        terms = choice_param(self.query, "terms", "any", ("any", "UK", "US"))
+        names = library.search(self.query.get("q", ""), list_param(self.query, "difficulty"),
+                               list_param(self.query, "drape"), self.query.get("abbreviation", ""),
+                               None if terms == "any" else terms)
+        page = int_param(self.query, "page", 1, 1, 1_000_000)
+        per_page = int_param(self.query, "per_page", 100, 1, 500)
+        self.send_json({"stitches": {name: library[name] for name in library.page(names, page, per_page)},
+                        "total": len(names), "page": page, "per_page": per_page,
+                        "shapes": SHAPES, "yarn_weights": YARN_WEIGHTS, "quantizers": quantizer_names()})
+
+    def pattern(self):
+        try:
+            params = json.loads(self.read_body())
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "body must be a JSON object")
+        if not isinstance(params, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "body must be a JSON object")
+        self.send_json(pattern_response(params))
+
+    def chart(self):
+        data = self.read_body()
+        params = chart_params(self.query)
+        fmt = choice_param(self.query, "format", "json", CHART_FORMATS)
+        key, chart = self.server.workers.convert(data, **params)
+        if fmt == "csv":
+            self.send_body(get_chart_pipeline().csv(key, chart).encode("utf-8"), "text/csv; charset=utf-8")
+        elif fmt == "png":
+            self.send_body(get_chart_pipeline().png(key, chart), "image/png")
+        elif fmt == "crochet":
+            self.send_body(get_chart_pipeline().chart_file(key, chart), MIME_TYPE)
+        else:
+            gauge = default_gauge(choice_param(self.query, "yarn_weight", "Worsted (4)", list(YARN_WEIGHTS)))
+            style = choice_param(self.query, "style", "Tapestry", list(CHART_STYLES))
+            self.send_json(chart_json(key, chart, get_chart_pipeline().analysis(key, chart, gauge, style)))
+
+
+class ApiServer(ThreadingHTTPServer):
+    """Threaded HTTP server owning the password and the chart worker pool."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, password: str, workers: ChartWorkers):
+        if not password:
+            raise ValueError("the API needs a password (set CROCHET_PASSWORD or .streamlit/secrets.toml)")
+        self.password = password
+        self.workers = workers
+        super().__init__(address, ApiHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.workers.shutdown()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the Crochet Architect JSON API.")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to bind (default: localhost only)")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="chart worker processes (default: all cores)")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="conversions queued or running before new ones get 503 (default: 4 per worker)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for one conversion")
+    args = parser.parse_args(argv)
+
+    workers = ChartWorkers(args.workers, args.max_pending, args.timeout)
+    try:
+        server = ApiServer((args.host, args.port), load_password(), workers)
+    except ValueError as e:
+        workers.shutdown()
+        print(e, file=sys.stderr)
+        return 2
+    print(f"Serving on http://{args.host}:{args.port} with {workers.max_workers} chart workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+"""Shared password check for the Streamlit gate and the HTTP API.
+
+Kept free of heavy imports so the password screen stays fast to load.
+"""
+
+import hmac
+import os
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11: fall back to the environment only
+    tomllib = None
+
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+
+def password_matches(candidate: str, secret: str) -> bool:
+    """Return True if ``candidate`` equals ``secret``, in constant time."""
+    if not candidate or not secret:
+        return False
+    return hmac.compare_digest(candidate.encode("utf-8"), secret.encode("utf-8"))
+
+
+def load_password(path: str = SECRETS_PATH) -> str:
+    """Return the app password from ``CROCHET_PASSWORD`` or the Streamlit secrets file."""
+    password = os.environ.get("CROCHET_PASSWORD")
+    if password or tomllib is None or not os.path.exists(path):
+        return password
+    with open(path, "rb") as f:
+        return tomllib.load(f).get("password")
@@ -0,0 +1,184 @@
+"""Batch image-to-chart conversion across a process pool.
+
+Converts a folder, a list of files or a ZIP of images, streaming results
+as they complete and packing the PNG/CSV exports into a single archive::
+
+    python -m crochet.batch photos/ more.zip -o charts.zip --width 60 --colors 8
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+
+from crochet.analysis import CHART_STYLES, YARN_CSV_HEADER, analyze_chart, yarn_rows
+from crochet.chartfile import EXTENSION as CHART_EXTENSION, dumps as chart_file_bytes
+from crochet.dither import DITHER_MODES
+from crochet.engine import Chart, convert_image
+from crochet.export import chart_csv, chart_png_bytes
+from crochet.gauge import STITCH_BASES, YARN_WEIGHTS, Gauge, default_gauge
+from crochet.quantize import quantizer_names
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif")
+
+
+@dataclass
+class BatchResult:
+    """Outcome of converting one batch entry."""
+    name: str
+    chart: Chart = None
+    error: str = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def is_image_name(name: str) -> bool:
+    """Return True if ``name`` looks like a supported image file."""
+    base = os.path.basename(name)
+    return not base.startswith(".") and base.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def iter_zip(zip_file):
+    """Yield (name, bytes) for each image inside a ZIP path or file object."""
+    with zipfile.ZipFile(zip_file) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or "__MACOSX" in info.filename or not is_image_name(info.filename):
+                continue
+            yield info.filename, zf.read(info)
+
+
+def iter_sources(paths):
+    """Yield (name, bytes) for every image under the given files, folders and ZIPs.
+
+    Files are read lazily, so only the images currently in flight are held
+    in memory.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for fname in sorted(files):
+                    if is_image_name(fname):
+                        full = os.path.join(root, fname)
+                        with open(full, "rb") as f:
+                            yield os.path.relpath(full, path), f.read()
+        elif path.lower().endswith(".zip"):
+            yield from iter_zip(path)
+        elif is_image_name(path):
+            with open(path, "rb") as f:
+                yield os.path.basename(path), f.read()
+
+
+def _convert_one(name, data, width_sts, num_colors, options):
+    """Worker entry point; must stay module-level so it can be pickled."""
+    try:
+        return BatchResult(name, chart=convert_image(data, width_sts, num_colors, **options))
+    except Exception as e:
+        return BatchResult(name, error=f"{type(e).__name__}: {e}")
+
+
+def convert_many(sources, width_sts: int, num_colors: int, max_workers: int = None, **options):
+    """Convert (name, bytes) sources in a process pool, yielding BatchResults as they finish.
+
+    Extra keyword ``options`` are passed through to ``convert_image``.
+
+    At most ``2 * max_workers`` images are in flight at once so large
+    batches do not have to be read into memory up front.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    window = max_workers * 2
+    sources = iter(sources)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < window:
+                try:
+                    name, data = next(sources)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(_convert_one, name, data, width_sts, num_colors, options))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def archive_stem(name: str) -> str:
+    """Return the archive path prefix used for one source image."""
+    stem, _ext = os.path.splitext(name.replace("\\", "/"))
+    return stem.lstrip("/")
+
+
+def write_archive(results, out, gauge: Gauge = None, style: str = "Tapestry") -> dict:
+    """Stream BatchResults into a ZIP at ``out`` (path or file object).
+
+    Each chart contributes ``<stem>.png``, ``<stem>.csv`` and a reloadable
+    ``<stem>.crochet`` chart file; ``yarn.csv`` totals the yarn of every
+    color of every chart at ``gauge`` worked in ``style`` (see
+    ``crochet.analysis``), and failures are listed in ``errors.txt``.
+    Returns a summary dict.
+    """
+    converted, errors = 0, []
+    yarn = io.StringIO()
+    yarn_writer = csv.writer(yarn)
+    yarn_writer.writerow(YARN_CSV_HEADER)
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for result in results:
+            if not result.ok:
+                errors.append(f"{result.name}: {result.error}")
+                continue
+            stem = archive_stem(result.name)
+            zf.writestr(f"{stem}.png", chart_png_bytes(result.chart))
+            zf.writestr(f"{stem}.csv", chart_csv(result.chart.grid, len(result.chart.palette)))
+            zf.writestr(f"{stem}{CHART_EXTENSION}", chart_file_bytes(result.chart))
+            yarn_writer.writerows(yarn_rows(stem, result.chart, analyze_chart(result.chart, gauge, style)))
+            converted += 1
+        if converted:
+            zf.writestr("yarn.csv", yarn.getvalue())
+        if errors:
+            zf.writestr("errors.txt", "\n".join(errors) + "\n")
+    return {"converted": converted, "failed": len(errors), "errors": errors}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Convert many images to crochet charts.")
+    parser.add_argument("inputs", nargs="+", help="image files, folders or ZIP archives")
+    parser.add_argument("-o", "--output", default="crochet_charts.zip", help="output ZIP path")
+    parser.add_argument("--width", type=int, default=30, help="chart width in stitches")
+    parser.add_argument("--colors", type=int, default=6, help="number of colors")
+    parser.add_argument("--quantizer", default="median_cut", choices=quantizer_names(),
+                        help="color reduction backend, or yarn:<palette> to match a yarn range")
+    parser.add_argument("--dither", default="none", choices=DITHER_MODES,
+                        help="dithering mode for gradients and photos")
+    parser.add_argument("--large", action="store_true", help="memory-bounded mode for big photos / wide charts")
+    parser.add_argument("--yarn-weight", default="Worsted (4)", choices=list(YARN_WEIGHTS),
+                        help="yarn weight for the yardage totals in yarn.csv")
+    parser.add_argument("--stitch", default="sc", choices=list(STITCH_BASES), help="base stitch for tapestry charts")
+    parser.add_argument("--style", default="Tapestry", choices=list(CHART_STYLES), help="how chart cells are worked")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    def progress(results):
+        for i, result in enumerate(results, 1):
+            status = "ok" if result.ok else f"FAILED ({result.error})"
+            print(f"[{i}] {result.name}: {status}", file=sys.stderr)
+            yield result
+
+    results = convert_many(iter_sources(args.inputs), args.width, args.colors, args.workers,
+                           large=args.large, quantizer=args.quantizer, dither=args.dither)
+    summary = write_archive(progress(results), args.output, default_gauge(args.yarn_weight, args.stitch), args.style)
+    print(f"{summary['converted']} charts written to {args.output}, {summary['failed']} failed")
+    return 1 if summary["failed"] and not summary["converted"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
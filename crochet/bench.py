@@ -0,0 +1,417 @@
+"""Benchmarks for the chart and pattern pipelines.
+
+Runs every case in a fresh worker process so wall time and peak RSS are
+measured in isolation, and writes the results as JSON::
+
+    python -m crochet.bench -o bench.json
+    python -m crochet.bench --quick --filter convert/RGB
+    python -m crochet.bench --baseline bench.json --tolerance 0.25   # exit 1 on regression
+
+Cases cover image → chart conversion on synthetic photos from 256 px to
+8000 px (RGB JPEG, RGBA PNG, palette PNG and GIF) at several chart
+widths, the alternative quantizers, each dithering mode, CSV/PNG
+export, yarn analysis, pattern build and render in every format, chart
+cleanup and the Matplotlib preview figures. Caches are bypassed, so
+every timed run does the full work.
+"""
+
+import argparse
+import fnmatch
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from multiprocessing import get_context
+
+import numpy as np
+from PIL import Image
+
+from crochet.analysis import analyze_chart
+from crochet.cleanup import cleanup_chart
+from crochet.dither import DITHER_MODES, dither_grid
+from crochet.engine import Chart, convert_image
+from crochet.export import chart_csv, chart_png_bytes
+from crochet.figures import shape_outline_png, stitch_texture_png
+from crochet.gauge import default_gauge
+from crochet.pattern import build_pattern, render_pattern
+from crochet.pdf import write_pdf
+from crochet.render import print_cell, render_png
+from crochet.stitches import STITCH_DATABASE
+
+# Long edge of the synthetic sources; images are 4:3.
+SIZES = (256, 1024, 2000, 4000, 8000)
+QUICK_SIZES = (256, 1024, 2000)
+MODES = ("RGB", "RGBA", "P", "GIF")
+WIDTHS = (30, 100)
+LARGE_WIDTH = 400
+CSV_GRIDS = ((30, 40), (100, 133), (700, 933))
+
+# Regressions smaller than this are treated as timer noise.
+MIN_REGRESSION_MS = 2.0
+MIN_REGRESSION_MB = 5.0
+
+
+@dataclass
+class Case:
+    """One benchmark: ``run(inputs)`` is timed, ``setup()`` builds ``inputs`` untimed."""
+    name: str
+    group: str
+    setup: object
+    run: object
+    work: float                      # units of work per run, for throughput
+    unit: str
+    params: dict = field(default_factory=dict)
+    source: tuple = None             # (size, mode) of the synthetic image read by setup
+
+
+@dataclass
+class Result:
+    name: str
+    group: str
+    params: dict
+    repeats: int
+    wall_ms: dict                    # min / median / max
+    peak_rss_mb: float
+    rss_delta_mb: float
+    throughput: float
+    unit: str
+
+
+# --- SYNTHETIC INPUTS ---
+def synthetic_rgb(long_edge: int, seed: int = 0) -> np.ndarray:
+    """Return a photo-like (h, w, 3) uint8 array: smooth gradients, blobs and noise."""
+    w, h = long_edge, long_edge * 3 // 4
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0.0, 1.0, h, dtype=np.float32)[:, None]
+    x = np.linspace(0.0, 1.0, w, dtype=np.float32)[None, :]
+    img = np.empty((h, w, 3), dtype=np.float32)
+    img[..., 0] = 200 * x + 40 * np.sin(9 * y)
+    img[..., 1] = 180 * y + 50 * np.cos(7 * x + 3 * y)
+    img[..., 2] = 120 + 100 * np.sin(5 * (x + y))
+    for cx, cy, r, color in zip(rng.random(6), rng.random(6), rng.uniform(0.05, 0.2, 6), rng.integers(0, 255, (6, 3))):
+        img[((x - cx) ** 2 + (y - cy) ** 2) < r * r] = color
+    img += rng.normal(0.0, 6.0, (h, w, 1)).astype(np.float32)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def synthetic_image(long_edge: int, mode: str) -> bytes:
+    """Encode a synthetic image as the file an upload of ``mode`` would be."""
+    img = Image.fromarray(synthetic_rgb(long_edge))
+    out = io.BytesIO()
+    if mode == "RGB":
+        img.save(out, format="JPEG", quality=90)
+    elif mode == "RGBA":
+        alpha = np.linspace(64, 255, img.width, dtype=np.uint8)[None, :].repeat(img.height, axis=0)
+        img.putalpha(Image.fromarray(alpha))
+        img.save(out, format="PNG", compress_level=1)
+    elif mode == "P":
+        img.quantize(colors=64).save(out, format="PNG", compress_level=1)
+    elif mode == "GIF":
+        img.quantize(colors=128).save(out, format="GIF")
+    else:
+        raise ValueError(f"unknown synthetic image mode {mode!r}")
+    return out.getvalue()
+
+
+def write_synthetic(path: str, long_edge: int, mode: str) -> str:
+    """Write a synthetic image to ``path`` (run in a worker to keep the parent small)."""
+    with open(path, "wb") as f:
+        f.write(synthetic_image(long_edge, mode))
+    return path
+
+
+def synthetic_grid(width: int, height: int, n_colors: int = 8, seed: int = 0) -> np.ndarray:
+    """Return a chart-like index grid with horizontal runs of color."""
+    rng = np.random.default_rng(seed)
+    runs = rng.integers(0, n_colors, (height, width // 4 + 1)).repeat(4, axis=1)[:, :width]
+    noise = rng.random((height, width)) < 0.05
+    return np.where(noise, rng.integers(0, n_colors, (height, width)), runs).astype(np.uint8)
+
+
+# --- CASE BODIES (module level so they pickle into workers) ---
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def run_convert(data: bytes, width_sts: int, num_colors: int, **options):
+    return convert_image(data, width_sts, num_colors, **options)
+
+
+def make_chart(width: int, height: int) -> Chart:
+    rng = np.random.default_rng(1)
+    palette = [tuple(int(v) for v in rgb) for rgb in rng.integers(0, 256, (8, 3))]
+    return Chart(grid=synthetic_grid(width, height), palette=palette)
+
+
+def run_csv(chart: Chart):
+    return chart_csv(chart.grid, len(chart.palette))
+
+
+def run_png(chart: Chart):
+    return chart_png_bytes(chart)
+
+
+def run_analysis(chart: Chart):
+    return analyze_chart(chart, default_gauge("Worsted (4)"))
+
+
+def run_cleanup(chart: Chart):
+    return cleanup_chart(chart, merge_delta=10.0, min_area=2, min_run=2)
+
+
+def dither_inputs(width: int) -> tuple:
+    rgb = synthetic_rgb(width)
+    palette = [tuple(int(v) for v in c) for c in np.random.default_rng(1).integers(0, 256, (8, 3))]
+    return rgb, palette
+
+
+def run_dither(inputs: tuple, mode: str):
+    rgb, palette = inputs
+    return dither_grid(rgb, palette, mode)
+
+
+def run_render(chart: Chart, symbols: bool):
+    return render_png(chart, print_cell(chart), symbols=symbols)
+
+
+def run_pdf(chart: Chart):
+    return write_pdf(io.BytesIO(), chart, title="Benchmark", symbols=True)
+
+
+def pattern_inputs(gauged: bool) -> dict:
+    stitch_info = STITCH_DATABASE["Double Crochet"]
+    return {
+        "shape": "Square", "stitch_key": "Double Crochet", "stitch_info": stitch_info,
+        "size": 150, "neck": 15, "colors": 8, "measurement_system": "Metric (cm)",
+        "gauge": default_gauge("Worsted (4)", "dc") if gauged else None,
+    }
+
+
+def run_pattern(inputs: dict, fmt: str):
+    return render_pattern(build_pattern(**inputs), fmt)
+
+
+def no_setup():
+    return None
+
+
+def run_shape_preview(_inputs, shape: str):
+    return shape_outline_png(shape)
+
+
+def run_stitch_preview(_inputs, stitch: str):
+    return stitch_texture_png(stitch)
+
+
+def build_cases(sizes: tuple, image_paths: dict) -> list:
+    """Return every benchmark case; ``image_paths`` maps (size, mode) to a synthetic file."""
+    cases = []
+    for size in sizes:
+        megapixels = size * (size * 3 // 4) / 1e6
+        for mode in MODES:
+            setup = partial(read_file, image_paths[size, mode])
+            for width in WIDTHS:
+                cases.append(Case(f"convert/{mode}/{size}px/w{width}", "convert", setup,
+                                  partial(run_convert, width_sts=width, num_colors=8),
+                                  megapixels, "Mpx/s", {"size": size, "mode": mode, "width": width},
+                                  (size, mode)))
+        if size >= 2000:
+            cases.append(Case(f"convert/RGB/{size}px/w{LARGE_WIDTH}-large", "convert",
+                              partial(read_file, image_paths[size, "RGB"]),
+                              partial(run_convert, width_sts=LARGE_WIDTH, num_colors=8, large=True),
+                              megapixels, "Mpx/s", {"size": size, "mode": "RGB", "width": LARGE_WIDTH, "large": True},
+                              (size, "RGB")))
+    quant_size = 2000 if 2000 in sizes else sizes[-1]
+    for quantizer in ("kmeans", "yarn:Worsted Basics"):
+        cases.append(Case(f"quantize/{quantizer}/{quant_size}px/w100", "quantize",
+                          partial(read_file, image_paths[quant_size, "RGB"]),
+                          partial(run_convert, width_sts=100, num_colors=8, quantizer=quantizer),
+                          quant_size * (quant_size * 3 // 4) / 1e6, "Mpx/s",
+                          {"size": quant_size, "quantizer": quantizer, "width": 100}, (quant_size, "RGB")))
+    dither_h = LARGE_WIDTH * 3 // 4
+    for mode in DITHER_MODES:
+        cases.append(Case(f"dither/{mode}/w{LARGE_WIDTH}", "dither", partial(dither_inputs, LARGE_WIDTH),
+                          partial(run_dither, mode=mode), LARGE_WIDTH * dither_h, "sts/s",
+                          {"mode": mode, "width": LARGE_WIDTH, "height": dither_h}))
+    for width, height in CSV_GRIDS:
+        setup = partial(make_chart, width, height)
+        cases.append(Case(f"export/csv/{width}x{height}", "export", setup, run_csv,
+                          width * height, "sts/s", {"width": width, "height": height}))
+        cases.append(Case(f"export/png/{width}x{height}", "export", setup, run_png,
+                          width * height, "sts/s", {"width": width, "height": height}))
+        cases.append(Case(f"analysis/{width}x{height}", "analysis", setup, run_analysis,
+                          width * height, "sts/s", {"width": width, "height": height}))
+    cases.append(Case("cleanup/400x533", "cleanup", partial(make_chart, 400, 533), run_cleanup,
+                      400 * 533, "sts/s", {"width": 400, "height": 533}))
+    for symbols in (False, True):
+        cases.append(Case(f"render/print/400x533{'-symbols' if symbols else ''}", "render",
+                          partial(make_chart, 400, 533), partial(run_render, symbols=symbols),
+                          400 * 533, "sts/s", {"width": 400, "height": 533, "symbols": symbols}))
+    for width, height in ((100, 130), (400, 533)):
+        cases.append(Case(f"pdf/{width}x{height}", "pdf", partial(make_chart, width, height), run_pdf,
+                          width * height, "sts/s", {"width": width, "height": height}))
+    for gauged in (False, True):
+        for fmt in ("markdown", "text", "html"):
+            suffix = "-gauge" if gauged else ""
+            cases.append(Case(f"pattern/{fmt}{suffix}", "pattern", partial(pattern_inputs, gauged),
+                              partial(run_pattern, fmt=fmt), 1, "patterns/s", {"format": fmt, "gauge": gauged}))
+    for shape in ("Square", "Circle"):
+        cases.append(Case(f"preview/shape/{shape}", "preview", no_setup,
+                          partial(run_shape_preview, shape=shape), 1, "images/s", {"shape": shape}))
+    cases.append(Case("preview/stitch/Treble Mesh", "preview", no_setup,
+                      partial(run_stitch_preview, stitch="Treble Mesh"), 1, "images/s", {"stitch": "Treble Mesh"}))
+    return cases
+
+
+# --- MEASUREMENT ---
+def reset_peak_rss():
+    """Reset the kernel's RSS high-water mark (Linux), so peaks exclude the parent's."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb() -> float:
+    """Return this process's peak resident set size in MB (0.0 where unsupported)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def measure(case: Case, repeats: int) -> dict:
+    """Worker entry point: one warm-up plus ``repeats`` timed runs of ``case``."""
+    inputs = case.setup()
+    reset_peak_rss()
+    before = peak_rss_mb()
+    case.run(inputs)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        case.run(inputs)
+        times.append((time.perf_counter() - start) * 1000.0)
+    peak = peak_rss_mb()
+    return {"times": times, "peak_rss_mb": peak, "rss_delta_mb": max(0.0, peak - before)}
+
+
+def in_worker(fn, *args):
+    """Run ``fn(*args)`` in a fresh spawned process and return its result."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def run_case(case: Case, repeats: int) -> Result:
+    raw = in_worker(measure, case, repeats)
+    times = raw["times"]
+    median = statistics.median(times)
+    return Result(
+        name=case.name,
+        group=case.group,
+        params=case.params,
+        repeats=repeats,
+        wall_ms={"min": round(min(times), 3), "median": round(median, 3), "max": round(max(times), 3)},
+        peak_rss_mb=round(raw["peak_rss_mb"], 1),
+        rss_delta_mb=round(raw["rss_delta_mb"], 1),
+        throughput=round(case.work / (median / 1000.0), 2) if median > 0 else 0.0,
+        unit=case.unit,
+    )
+
+
+def environment() -> dict:
+    import matplotlib
+    import PIL
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "matplotlib": matplotlib.__version__,
+    }
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Return a message for every result slower or bigger than ``baseline`` by more than ``tolerance``."""
+    previous = {r["name"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        old = previous.get(result.name)
+        if old is None:
+            continue
+        new_ms, old_ms = result.wall_ms["median"], old["wall_ms"]["median"]
+        if new_ms > old_ms * (1 + tolerance) and new_ms - old_ms > MIN_REGRESSION_MS:
+            regressions.append(f"{result.name}: median {old_ms:.1f} -> {new_ms:.1f} ms "
+                               f"(+{(new_ms / old_ms - 1) * 100:.0f}%)")
+        new_mb, old_mb = result.rss_delta_mb, old["rss_delta_mb"]
+        if new_mb > old_mb * (1 + tolerance) and new_mb - old_mb > MIN_REGRESSION_MB:
+            regressions.append(f"{result.name}: memory {old_mb:.1f} -> {new_mb:.1f} MB")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the chart and pattern pipelines.")
+    parser.add_argument("-o", "--output", default="bench.json", help="JSON results path")
+    parser.add_argument("--quick", action="store_true", help=f"only sources up to {QUICK_SIZES[-1]} px")
+    parser.add_argument("--filter", action="append", default=[],
+                        help="only run cases whose name contains this (or matches this glob); repeatable")
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per case, after one warm-up")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown / memory growth over the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    with tempfile.TemporaryDirectory(prefix="crochet-bench-") as tmp:
+        paths = {(size, mode): os.path.join(tmp, f"{mode}-{size}.img") for size in sizes for mode in MODES}
+        cases = build_cases(sizes, paths)
+        if args.filter:
+            cases = [c for c in cases if any(f in c.name or fnmatch.fnmatch(c.name, f) for f in args.filter)]
+
+        needed = sorted({c.source for c in cases if c.source})
+        with ProcessPoolExecutor(mp_context=get_context("spawn")) as pool:
+            list(pool.map(write_synthetic, [paths[k] for k in needed], [k[0] for k in needed], [k[1] for k in needed]))
+
+        results = []
+        for case in cases:
+            result = run_case(case, args.repeats)
+            results.append(result)
+            print(f"{result.name:<42} {result.wall_ms['median']:>10.2f} ms  {result.peak_rss_mb:>7.1f} MB peak"
+                  f"  {result.throughput:>12,.2f} {result.unit}", file=sys.stderr)
+
+    report = {"environment": environment(), "results": [asdict(r) for r in results]}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"{len(results)} results written to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
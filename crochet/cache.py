@@ -0,0 +1,252 @@
+"""Content-addressed cache for converted charts.
+
+Charts are keyed on a SHA-256 digest of the uploaded bytes plus the
+conversion settings, so the same file converted with the same settings
+by any session is only decoded and quantized once. There is an in-memory
+LRU tier, bounded by both entry count and grid bytes, and an optional
+on-disk tier with size-based eviction.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from crochet.engine import Chart, convert_image
+
+DISK_SUFFIX = ".chart.npz"
+
+# JSON has no tuples; on disk, meta tuples (e.g. ``source_size``) are wrapped in this key
+TUPLE_TAG = "__tuple__"
+
+# Optional ``convert_image`` settings and their defaults; keys always include all of them
+CONVERT_DEFAULTS = {name: param.default for name, param in inspect.signature(convert_image).parameters.items()
+                    if param.default is not inspect.Parameter.empty}
+
+
+def image_digest(data: bytes) -> str:
+    """Return the hex SHA-256 digest of raw image bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def chart_key(digest: str, **params) -> str:
+    """Return the cache key for an image digest and conversion settings.
+
+    Settings left out are keyed at their ``convert_image`` defaults, so a
+    caller passing only what it changed shares entries with one passing
+    everything.
+    """
+    settings = json.dumps({**CONVERT_DEFAULTS, **params}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{digest}|{settings}".encode()).hexdigest()
+
+
+def _tag_tuples(value):
+    if isinstance(value, tuple):
+        return {TUPLE_TAG: [_tag_tuples(v) for v in value]}
+    if isinstance(value, list):
+        return [_tag_tuples(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _tag_tuples(v) for k, v in value.items()}
+    return value
+
+
+def _untag_tuples(obj: dict):
+    return tuple(obj[TUPLE_TAG]) if obj.keys() == {TUPLE_TAG} else obj
+
+
+def dump_meta(meta: dict) -> str:
+    """Serialize chart metadata so that ``load_meta`` returns it unchanged, tuples included."""
+    return json.dumps(_tag_tuples(meta), default=str)
+
+
+def load_meta(text: str) -> dict:
+    return json.loads(text, object_hook=_untag_tuples)
+
+
+class ChartCache:
+    """Thread-safe two-tier (memory LRU + optional disk) chart cache."""
+
+    def __init__(self, max_items: int = 256, disk_dir: str = None, max_disk_bytes: int = 256 * 1024 * 1024,
+                 max_bytes: int = 128 * 1024 * 1024):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._items = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # --- memory tier ---
+    def get(self, key: str):
+        """Return the cached Chart for ``key`` or None."""
+        with self._lock:
+            chart = self._items.get(key)
+            if chart is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return chart
+        chart = self._disk_get(key)
+        with self._lock:
+            if chart is not None:
+                self.disk_hits += 1
+                self._remember(key, chart)
+            else:
+                self.misses += 1
+        return chart
+
+    def put(self, key: str, chart: Chart):
+        """Store ``chart`` under ``key`` in every configured tier."""
+        chart.grid.flags.writeable = False  # shared across sessions
+        with self._lock:
+            self._remember(key, chart)
+        self._disk_put(key, chart)
+
+    def _remember(self, key, chart):
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._nbytes -= old.grid.nbytes
+        self._items[key] = chart
+        self._nbytes += chart.grid.nbytes
+        while len(self._items) > 1 and (len(self._items) > self.max_items or self._nbytes > self.max_bytes):
+            _key, evicted = self._items.popitem(last=False)
+            self._nbytes -= evicted.grid.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        """Drop the memory tier (the disk tier is left in place)."""
+        with self._lock:
+            self._items.clear()
+            self._nbytes = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current tier sizes."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "items": len(self._items),
+                "bytes": self._nbytes,
+                "disk_bytes": self._disk_usage()[0] if self.disk_dir else 0,
+            }
+
+    # --- disk tier ---
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + DISK_SUFFIX)
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                chart = Chart(
+                    grid=npz["grid"],
+                    palette=[tuple(int(c) for c in rgb) for rgb in npz["palette"]],
+                    meta=load_meta(str(npz["meta"])),
+                )
+            os.utime(path)  # mtime doubles as last-used time for eviction
+            return chart
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _disk_put(self, key, chart):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f,
+                    grid=chart.grid,
+                    palette=np.array(chart.palette, dtype=np.uint8).reshape(-1, 3),
+                    meta=np.array(dump_meta(chart.meta)),
+                )
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self._evict_disk()
+
+    def _disk_usage(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(DISK_SUFFIX):
+                continue
+            try:
+                st = os.stat(os.path.join(self.disk_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+            total += st.st_size
+        return total, entries
+
+    def _evict_disk(self):
+        total, entries = self._disk_usage()
+        if total <= self.max_disk_bytes:
+            return
+        for _mtime, size, name in sorted(entries):
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+            if total <= self.max_disk_bytes:
+                break
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> ChartCache:
+    """Return the process-wide cache, configured from the environment.
+
+    ``CROCHET_CHART_CACHE_DIR`` enables the disk tier and
+    ``CROCHET_CHART_CACHE_MB`` bounds its size (default 256 MB);
+    ``CROCHET_CHART_MEMORY_MB`` bounds the memory tier (default 128 MB).
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ChartCache(
+                disk_dir=os.environ.get("CROCHET_CHART_CACHE_DIR") or None,
+                max_disk_bytes=int(os.environ.get("CROCHET_CHART_CACHE_MB", "256")) * 1024 * 1024,
+                max_bytes=int(os.environ.get("CROCHET_CHART_MEMORY_MB", "128")) * 1024 * 1024,
+            )
+        return _default_cache
+
+
+def cached_convert(data: bytes, width_sts: int, num_colors: int, cache: ChartCache = None, **options) -> Chart:
+    """Convert ``data`` like ``convert_image``, reusing any cached result.
+
+    Extra keyword ``options`` are passed to ``convert_image`` and are part
+    of the cache key.
+    """
+    cache = cache or get_default_cache()
+    digest = image_digest(data)
+    key = chart_key(digest, width_sts=width_sts, num_colors=num_colors, **options)
+    chart = cache.get(key)
+    if chart is None:
+        chart = convert_image(data, width_sts, num_colors, **options)
+        chart.meta["source_sha256"] = digest  # as the chart pipeline records it
+        cache.put(key, chart)
+    return chart
@@ -0,0 +1,293 @@
+"""Precomputed catalogue of preset-derived patterns and preview images.
+
+The Pattern Generator starts from a preset, and most requests keep its
+size and neck and only change the shape, stitch, color count, units or
+yarn weight. That is a finite space: every preset size × shape × stitch ×
+color count × measurement system × yarn weight. ``build`` renders all of
+it - Markdown, text, HTML and A4 PDF for every pattern, plus every shape
+and stitch preview PNG - across a process pool into a static directory::
+
+    python -m crochet.catalogue -o catalogue/                # Worsted, all presets
+    python -m crochet.catalogue -o catalogue/ --yarn-weight all --if-stale
+
+The pattern pipeline then serves matching requests from those files
+instead of rendering them (see ``PatternPipeline``). Files are addressed
+by ``pattern_key(model)``, a digest of the whole ``PatternModel``, so a
+lookup can only hit a file rendered from identical inputs. The manifest
+records a fingerprint of the package source and the stitch library, and
+the catalogue is ignored when that no longer matches, e.g. after an upgrade.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from crochet.gauge import YARN_WEIGHTS, base_stitch, default_gauge
+from crochet.pattern import FORMATS, MEASUREMENT_SYSTEMS, PatternModel
+from crochet.pipeline import PatternPipeline
+from crochet.stitches import DEFAULT_LIBRARY, PRESETS, SHAPES, get_library
+
+CATALOGUE_VERSION = 1
+DEFAULT_CATALOGUE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "catalogue")
+MANIFEST = "manifest.json"
+
+# What the generator starts from when a preset leaves size or neck unset
+GENERATOR_DEFAULTS = {"size": 100, "neck": 15}
+COLOR_RANGE = range(1, 13)
+DEFAULT_YARN_WEIGHT = "Worsted (4)"
+
+# Only the default page size is precomputed
+PDF_PAGE_SIZE = "A4"
+EXTENSIONS = {"markdown": ".md", "text": ".txt", "html": ".html", "pdf": ".pdf"}
+
+
+def source_files() -> list:
+    """Every file the stored output depends on: all package modules and the stitch library in use.
+
+    Editing any of them invalidates a catalogue. That is broader than the
+    modules that render files, but it cannot miss one.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    return sorted(glob.glob(os.path.join(here, "*.py"))) + [os.environ.get("CROCHET_STITCH_LIBRARY") or DEFAULT_LIBRARY]
+
+
+def fingerprint() -> str:
+    """Digest of the catalogue version and the contents of ``source_files()``."""
+    h = hashlib.sha256(f"v{CATALOGUE_VERSION}".encode())
+    for path in source_files():
+        h.update(os.path.basename(path).encode() + b"\0")
+        with open(path, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def pattern_key(model: PatternModel) -> str:
+    """Return the catalogue key of a pattern model: a digest of all its fields."""
+    settings = json.dumps(model.to_dict(), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(settings.encode()).hexdigest()
+
+
+def preview_key(kind: str, name: str) -> str:
+    """Return the catalogue key of a "shape" or "stitch" preview."""
+    return hashlib.sha256(f"{kind}|{name}".encode()).hexdigest()
+
+
+def preset_sizes() -> list:
+    """Distinct ``(size, neck)`` starting points of the presets."""
+    sizes = {(p.get("size", GENERATOR_DEFAULTS["size"]), p.get("neck", GENERATOR_DEFAULTS["neck"]))
+             for p in PRESETS.values()}
+    return sorted(sizes)
+
+
+def read_manifest(root: str):
+    """Return the manifest of the catalogue in ``root`` whatever its fingerprint, or None."""
+    try:
+        with open(os.path.join(root, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if isinstance(manifest, dict) else None
+
+
+def covers(manifest: dict, yarn_weights, colors=COLOR_RANGE) -> bool:
+    """True if ``manifest`` is current and was built for every input a new build would render."""
+    if not manifest or manifest.get("fingerprint") != fingerprint():
+        return False
+    built = {
+        "version": CATALOGUE_VERSION,
+        "sizes": [list(size) for size in preset_sizes()],
+        "shapes": SHAPES,
+        "stitches": list(get_library().names),
+        "measurement_systems": list(MEASUREMENT_SYSTEMS),
+        "formats": list(EXTENSIONS),
+        "pdf_page_size": PDF_PAGE_SIZE,
+    }
+    return (all(manifest.get(k) == v for k, v in built.items())
+            and set(yarn_weights) <= set(manifest.get("yarn_weights", ()))
+            and set(colors) <= set(manifest.get("colors", ())))
+
+
+class Catalogue:
+    """Read-only view of a built catalogue directory; every lookup is one file read."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest = None
+        self.hits = 0
+        self.misses = 0
+        manifest = read_manifest(root)
+        if manifest is not None and manifest.get("fingerprint") == fingerprint():
+            self.manifest = manifest
+
+    @property
+    def available(self) -> bool:
+        return self.manifest is not None
+
+    def path(self, key: str, ext: str) -> str:
+        return os.path.join(self.root, key[:2], key + ext)
+
+    def read(self, key: str, ext: str):
+        """Return the stored bytes for ``key``, or None."""
+        if self.manifest is None:
+            return None
+        try:
+            with open(self.path(key, ext), "rb") as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def pattern(self, model: PatternModel, fmt: str):
+        """Return the rendered pattern (str, or PDF bytes for "pdf"), or None if not catalogued."""
+        data = self.read(pattern_key(model), EXTENSIONS[fmt])
+        if data is None or fmt == "pdf":
+            return data
+        return data.decode("utf-8")
+
+    def preview(self, kind: str, name: str):
+        """Return the PNG of a "shape" or "stitch" preview, or None."""
+        return self.read(preview_key(kind, name), ".png")
+
+    def stats(self) -> dict:
+        return {
+            "available": self.available,
+            "patterns": self.manifest["patterns"] if self.manifest else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# --- BUILD ---
+def write_file(path: str, data: bytes):
+    """Write ``data`` to ``path`` atomically, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build_group(root: str, size: int, neck: int, shape: str, stitch_key: str, yarn_weights: tuple,
+                colors: tuple) -> int:
+    """Worker entry point: render every pattern of one (size, shape, stitch); returns files written."""
+    pipeline = PatternPipeline()  # no catalogue: always render
+    stitch_info = get_library()[stitch_key]
+    catalogue = Catalogue(root)
+    written = 0
+    for yarn_weight in yarn_weights:
+        gauge = default_gauge(yarn_weight, base_stitch(stitch_info["abbr_us"]))
+        for measurement_system in MEASUREMENT_SYSTEMS:
+            for n_colors in colors:
+                model = pipeline.model(shape, stitch_key, stitch_info, size, neck, n_colors, measurement_system,
+                                       gauge)
+                key = pattern_key(model)
+                for fmt in FORMATS:
+                    write_file(catalogue.path(key, EXTENSIONS[fmt]), pipeline.render(model, fmt).encode("utf-8"))
+                write_file(catalogue.path(key, EXTENSIONS["pdf"]), pipeline.pdf(model, PDF_PAGE_SIZE))
+                written += len(FORMATS) + 1
+    return written
+
+
+def build_preview(root: str, kind: str, name: str) -> int:
+    """Worker entry point: render one preview PNG."""
+    from crochet.figures import shape_outline_png, stitch_texture_png
+
+    png = shape_outline_png(name) if kind == "shape" else stitch_texture_png(name)
+    write_file(Catalogue(root).path(preview_key(kind, name), ".png"), png)
+    return 1
+
+
+def build(root: str, yarn_weights=(DEFAULT_YARN_WEIGHT,), colors=COLOR_RANGE, max_workers: int = None,
+          progress=None) -> dict:
+    """Render the whole catalogue into ``root`` across a process pool; returns the manifest.
+
+    The old manifest is removed first and the new one written last, so
+    the app never serves a half-built catalogue as current.
+    """
+    os.makedirs(root, exist_ok=True)
+    manifest_path = os.path.join(root, MANIFEST)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    yarn_weights, colors = tuple(yarn_weights), tuple(colors)
+    stitches = list(get_library().names)
+    sizes = preset_sizes()
+    start = time.perf_counter()
+    files = 0
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as pool:
+        futures = [pool.submit(build_group, root, size, neck, shape, stitch_key, yarn_weights, colors)
+                   for size, neck in sizes for shape in SHAPES for stitch_key in stitches]
+        futures += [pool.submit(build_preview, root, "shape", shape) for shape in SHAPES]
+        futures += [pool.submit(build_preview, root, "stitch", stitch_key) for stitch_key in stitches]
+        for i, future in enumerate(as_completed(futures), 1):
+            files += future.result()
+            if progress:
+                progress(i, len(futures))
+    manifest = {
+        "version": CATALOGUE_VERSION,
+        "fingerprint": fingerprint(),
+        "patterns": len(sizes) * len(SHAPES) * len(stitches) * len(yarn_weights) * len(MEASUREMENT_SYSTEMS)
+                    * len(colors),
+        "files": files,
+        "sizes": sizes,
+        "shapes": SHAPES,
+        "stitches": stitches,
+        "yarn_weights": list(yarn_weights),
+        "measurement_systems": list(MEASUREMENT_SYSTEMS),
+        "colors": list(colors),
+        "formats": list(EXTENSIONS),
+        "pdf_page_size": PDF_PAGE_SIZE,
+        "build_seconds": round(time.perf_counter() - start, 1),
+    }
+    write_file(manifest_path, json.dumps(manifest, indent=1).encode("utf-8"))
+    return manifest
+
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+
+def get_catalogue() -> Catalogue:
+    """Return the process-wide catalogue (``CROCHET_CATALOGUE`` or ``catalogue/`` next to the package)."""
+    global _catalogue
+    with _catalogue_lock:
+        if _catalogue is None:
+            _catalogue = Catalogue(os.environ.get("CROCHET_CATALOGUE") or DEFAULT_CATALOGUE)
+        return _catalogue
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Precompute the preset pattern catalogue.")
+    parser.add_argument("-o", "--output", default=os.environ.get("CROCHET_CATALOGUE") or DEFAULT_CATALOGUE,
+                        help="catalogue directory")
+    parser.add_argument("--yarn-weight", action="append", choices=list(YARN_WEIGHTS) + ["all"],
+                        help=f"yarn weight to include, repeatable (default: {DEFAULT_YARN_WEIGHT})")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--if-stale", action="store_true", help="do nothing if the catalogue is already current")
+    args = parser.parse_args(argv)
+
+    weights = args.yarn_weight or [DEFAULT_YARN_WEIGHT]
+    weights = list(YARN_WEIGHTS) if "all" in weights else list(dict.fromkeys(weights))
+    if args.if_stale and covers(read_manifest(args.output), weights):
+        print(f"{args.output} is up to date", file=sys.stderr)
+        return 0
+
+    def progress(done, total):
+        if done == total or done % 50 == 0:
+            print(f"[{done}/{total}]", file=sys.stderr)
+
+    manifest = build(args.output, weights, max_workers=args.workers, progress=progress)
+    print(f"{manifest['patterns']} patterns ({manifest['files']} files) written to {args.output} "
+          f"in {manifest['build_seconds']} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
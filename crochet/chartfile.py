@@ -0,0 +1,241 @@
+"""Native ``.crochet`` chart files: compact, versioned, memory-mappable.
+
+Layout (little-endian)::
+
+    magic     4 bytes   b"CRCH"
+    version   uint16    CHART_FORMAT_VERSION
+    reserved  uint16    0
+    header    uint32    length of the JSON header that follows
+    JSON      header    width, height, bits, palette, source hash, settings, CRC
+    padding   to an 8-byte boundary
+    data      height rows of ceil(width * bits / 8) bytes
+
+Every stitch is stored at the minimum number of bits for the palette
+(1 bit for 2 colors, 3 bits for 8, ...), most significant bit first,
+and each row starts on a byte boundary, so any band of rows can be
+decoded straight from a memory map without reading the rest of the
+file. A 700×933 chart in 12 colors is about 320 KB.
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from crochet.engine import Chart
+
+MAGIC = b"CRCH"
+CHART_FORMAT_VERSION = 1
+EXTENSION = ".crochet"
+MIME_TYPE = "application/x-crochet-chart"
+
+_PREAMBLE = struct.Struct("<4sHHI")
+
+# Per-run values that should not be frozen into a saved chart.
+TRANSIENT_META = ("elapsed_ms",)
+
+
+def bits_per_stitch(n_colors: int) -> int:
+    """Return the fewest bits that can index ``n_colors`` palette entries."""
+    return max(1, math.ceil(math.log2(max(n_colors, 2))))
+
+
+def row_bytes(width: int, bits: int) -> int:
+    return (width * bits + 7) // 8
+
+
+def pack_grid(grid: np.ndarray, bits: int) -> np.ndarray:
+    """Bit-pack a (height, width) uint8 grid into (height, row_bytes) uint8 rows."""
+    grid = np.asarray(grid, dtype=np.uint8)
+    # unpackbits gives 8 bits per value MSB first; keep the low ``bits`` of each
+    planes = np.unpackbits(grid[..., None], axis=-1)[..., 8 - bits:]
+    return np.packbits(planes.reshape(grid.shape[0], -1), axis=-1)
+
+
+def unpack_rows(packed: np.ndarray, width: int, bits: int) -> np.ndarray:
+    """Inverse of ``pack_grid`` for any band of packed rows."""
+    packed = np.asarray(packed, dtype=np.uint8)
+    planes = np.unpackbits(packed, axis=-1, count=width * bits).reshape(packed.shape[0], width, bits)
+    weights = (1 << np.arange(bits - 1, -1, -1)).astype(np.uint8)
+    return (planes * weights).sum(axis=-1, dtype=np.uint8)
+
+
+def chart_header(chart: Chart, source_digest: str = None) -> dict:
+    """Return the JSON header describing ``chart`` (everything except the stitches)."""
+    meta = {k: v for k, v in chart.meta.items() if k not in TRANSIENT_META}
+    return {
+        "width": chart.width,
+        "height": chart.height,
+        "bits": bits_per_stitch(len(chart.palette)),
+        "palette": [list(rgb) for rgb in chart.palette],
+        "source_sha256": source_digest or meta.get("source_sha256"),
+        "settings": meta,
+        "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def dumps(chart: Chart, source_digest: str = None) -> bytes:
+    """Serialize ``chart`` to ``.crochet`` bytes."""
+    header = chart_header(chart, source_digest)
+    data = pack_grid(chart.grid, header["bits"]).tobytes()
+    header["crc32"] = zlib.crc32(data)
+    raw = json.dumps(header, separators=(",", ":"), default=str).encode("utf-8")
+    preamble = _PREAMBLE.pack(MAGIC, CHART_FORMAT_VERSION, 0, len(raw))
+    padding = b"\0" * (-(len(preamble) + len(raw)) % 8)
+    return preamble + raw + padding + data
+
+
+def save_chart(chart: Chart, path: str, source_digest: str = None):
+    """Write ``chart`` to ``path`` atomically."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(dumps(chart, source_digest))
+    os.replace(tmp, path)
+
+
+def read_header(buf) -> tuple:
+    """Parse the preamble and header of a chart file; returns ``(header, data_offset)``."""
+    if len(buf) < _PREAMBLE.size:
+        raise ValueError("not a chart file: too short")
+    magic, version, _reserved, header_len = _PREAMBLE.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError("not a chart file: bad magic bytes")
+    if version > CHART_FORMAT_VERSION:
+        raise ValueError(f"chart file version {version} is newer than supported ({CHART_FORMAT_VERSION})")
+    end = _PREAMBLE.size + header_len
+    header = json.loads(bytes(buf[_PREAMBLE.size:end]).decode("utf-8"))
+    check_header(header)
+    header["version"] = version
+    return header, end + (-end % 8)
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def check_header(header):
+    """Raise ValueError unless ``header`` has every field a chart needs, with the right types."""
+    if not isinstance(header, dict):
+        raise ValueError("chart file is corrupt: header is not an object")
+    for name in ("width", "height"):
+        if not _is_int(header.get(name)) or header[name] < 0:
+            raise ValueError(f"chart file is corrupt: bad {name} {header.get(name)!r}")
+    bits = header.get("bits")
+    if not _is_int(bits) or not 1 <= bits <= 8:
+        raise ValueError(f"chart file is corrupt: bad bits per stitch {bits!r}")
+    palette = header.get("palette")
+    if not isinstance(palette, list) or not 1 <= len(palette) <= 1 << bits:
+        raise ValueError("chart file is corrupt: bad palette")
+    for rgb in palette:
+        if not (isinstance(rgb, list) and len(rgb) == 3 and all(_is_int(c) and 0 <= c <= 255 for c in rgb)):
+            raise ValueError(f"chart file is corrupt: bad palette color {rgb!r}")
+    if not isinstance(header.get("settings") or {}, dict):
+        raise ValueError("chart file is corrupt: settings is not an object")
+    if not isinstance(header.get("source_sha256") or "", str):
+        raise ValueError("chart file is corrupt: bad source hash")
+    if "crc32" in header and not _is_int(header["crc32"]):
+        raise ValueError("chart file is corrupt: bad checksum field")
+
+
+def header_chart(header: dict, grid: np.ndarray) -> Chart:
+    if grid.size and int(grid.max()) >= len(header["palette"]):
+        raise ValueError("chart file is corrupt: stitch color outside the palette")
+    meta = dict(header.get("settings") or {})
+    if header.get("source_sha256"):
+        meta["source_sha256"] = header["source_sha256"]
+    palette = [tuple(int(c) for c in rgb) for rgb in header["palette"]]
+    return Chart(grid=grid, palette=palette, meta=meta)
+
+
+def packed_rows(buf, header: dict, offset: int) -> np.ndarray:
+    """Return the (height, row_bytes) packed stitch rows of ``buf`` as a zero-copy view."""
+    n = row_bytes(header["width"], header["bits"])
+    if len(buf) < offset + header["height"] * n:
+        raise ValueError("chart file is truncated")
+    data = np.frombuffer(buf, dtype=np.uint8, count=header["height"] * n, offset=offset)
+    return data.reshape(header["height"], n)
+
+
+def loads(buf, verify: bool = True) -> Chart:
+    """Deserialize ``.crochet`` bytes into a Chart."""
+    header, offset = read_header(buf)
+    rows = packed_rows(buf, header, offset)
+    if verify and "crc32" in header and zlib.crc32(rows) != header["crc32"]:
+        raise ValueError("chart file is corrupt: checksum mismatch")
+    return header_chart(header, unpack_rows(rows, header["width"], header["bits"]))
+
+
+def load_chart(path: str) -> Chart:
+    """Read a whole chart file."""
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+class ChartFile:
+    """Read-only, memory-mapped view of a chart file.
+
+    Only the header is parsed on open; ``rows(start, stop)`` decodes just
+    the requested band, so huge charts can be paged without loading them::
+
+        with ChartFile("blanket.crochet") as cf:
+            top = cf.rows(0, 50)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _PREAMBLE.size:
+                raise ValueError("not a chart file: too short")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            # Both raise before any array view of the map exists, so it can still be closed
+            self.header, offset = read_header(self._mmap)
+            self._rows = packed_rows(self._mmap, self.header, offset)
+        except ValueError:
+            self._mmap.close()
+            raise
+
+    @property
+    def width(self) -> int:
+        return self.header["width"]
+
+    @property
+    def height(self) -> int:
+        return self.header["height"]
+
+    @property
+    def palette(self) -> list:
+        return [tuple(rgb) for rgb in self.header["palette"]]
+
+    @property
+    def settings(self) -> dict:
+        return self.header.get("settings") or {}
+
+    def rows(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """Decode chart rows ``start:stop`` into a uint8 grid."""
+        return unpack_rows(self._rows[start:stop], self.width, self.header["bits"])
+
+    def verify(self) -> bool:
+        """Return True if the stitch data matches its stored checksum."""
+        return zlib.crc32(self._rows) == self.header.get("crc32", zlib.crc32(self._rows))
+
+    def to_chart(self) -> Chart:
+        return header_chart(self.header, self.rows())
+
+    def close(self):
+        # Drop the array view first: a map with live buffer exports cannot be closed
+        self._rows = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,145 @@
+"""Chart cleanup: merge near-duplicate colors and remove speckles.
+
+Runs after ``quantize``. Photos quantize into charts full of stray single
+stitches, each one a yarn change; this stage
+
+1. merges palette entries closer than a perceptual distance (CIE76 ΔE in
+   Lab), closest pair first, into their stitch-weighted mean, then
+2. replaces stitches that sit in a tiny island (fewer than ``min_area``
+   same-colored stitches in their 3×3 neighbourhood) or in a horizontal
+   run shorter than ``min_run`` with the most common color around them.
+
+Neighbourhood counts come from a one-hot stack summed over a sliding
+window view, so a pass over a 400×400 chart takes tens of milliseconds.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from crochet.engine import Chart
+from crochet.export import row_runs
+from crochet.quantize import rgb_to_lab
+from crochet.timing import timed
+
+
+def merge_palette(grid: np.ndarray, palette: list, max_delta: float) -> tuple:
+    """Merge palette entries closer than ``max_delta`` ΔE; returns ``(grid, palette, kept)``.
+
+    ``kept[i]`` is the original index of new palette entry ``i`` - the
+    most used entry of each merged group - so per-entry metadata such as
+    yarn names can follow. Unused entries are dropped.
+    """
+    k = len(palette)
+    counts = np.bincount(grid.ravel(), minlength=k).astype(np.float64)
+    rgb = np.array(palette, dtype=np.float64).reshape(-1, 3)
+    lab = rgb_to_lab(rgb.astype(np.uint8)).astype(np.float64)
+    label = np.arange(k)
+    live = counts > 0
+
+    while max_delta > 0 and live.sum() > 1:
+        dist = np.sqrt(((lab[:, None, :] - lab[None, :, :]) ** 2).sum(axis=-1))
+        dist[~live, :] = np.inf
+        dist[:, ~live] = np.inf
+        np.fill_diagonal(dist, np.inf)
+        i, j = np.unravel_index(np.argmin(dist), dist.shape)
+        if dist[i, j] > max_delta:
+            break
+        if counts[j] > counts[i]:
+            i, j = j, i
+        rgb[i] = (rgb[i] * counts[i] + rgb[j] * counts[j]) / (counts[i] + counts[j])
+        lab[i] = rgb_to_lab(np.rint(rgb[i]).astype(np.uint8))
+        counts[i] += counts[j]
+        live[j] = False
+        label[label == j] = i
+
+    kept = np.flatnonzero(live)
+    remap = np.zeros(k, dtype=np.uint8)
+    remap[kept] = np.arange(len(kept))
+    new_palette = [tuple(int(v) for v in row) for row in np.rint(rgb[kept]).astype(int)]
+    return remap[label][grid], new_palette, kept
+
+
+def neighbour_counts(grid: np.ndarray, n_colors: int, size: int = 3) -> np.ndarray:
+    """Return (height, width, n_colors) counts of each color around every stitch.
+
+    The stitch itself is not counted; stitches past the chart edge count
+    as no color.
+    """
+    r = size // 2
+    onehot = (grid[..., None] == np.arange(n_colors, dtype=grid.dtype)).astype(np.uint8)
+    padded = np.pad(onehot, ((r, r), (r, r), (0, 0)))
+    windows = sliding_window_view(padded, (size, size), axis=(0, 1))  # (h, w, n_colors, size, size), no copy
+    # Adding the window offsets one plane at a time is much faster than
+    # reducing over the two tiny trailing window axes
+    counts = np.zeros_like(onehot)
+    for dy in range(size):
+        for dx in range(size):
+            if dy != r or dx != r:
+                counts += windows[..., dy, dx]
+    return counts
+
+
+def run_lengths(grid: np.ndarray) -> np.ndarray:
+    """Return, for every stitch, the length of the horizontal run it belongs to."""
+    starts = np.ones(grid.shape, dtype=bool)
+    np.not_equal(grid[:, 1:], grid[:, :-1], out=starts[:, 1:])
+    run_id = np.cumsum(starts.ravel()) - 1
+    return np.bincount(run_id)[run_id].reshape(grid.shape)
+
+
+def despeckle(grid: np.ndarray, n_colors: int, min_area: int = 2, min_run: int = 0, passes: int = 2) -> np.ndarray:
+    """Replace island and short-run stitches with their neighbourhood's mode color."""
+    grid = grid.copy()
+    for _ in range(passes):
+        counts = neighbour_counts(grid, n_colors)
+        mode = counts.argmax(axis=-1).astype(grid.dtype)
+        same = np.take_along_axis(counts, grid[..., None].astype(np.intp), axis=-1)[..., 0] + 1
+        speck = same < min_area
+        if min_run > 1:
+            speck |= run_lengths(grid) < min_run
+        speck &= mode != grid
+        if not speck.any():
+            break
+        grid[speck] = mode[speck]
+    return grid
+
+
+def yarn_changes(grid: np.ndarray) -> int:
+    """Total color changes across every row of ``grid``."""
+    return int(row_runs(grid).yarn_changes.sum())
+
+
+@timed("cleanup")
+def cleanup_chart(chart: Chart, merge_delta: float = 0.0, min_area: int = 0, min_run: int = 0) -> Chart:
+    """Return a cleaned copy of ``chart``; ``meta["cleanup"]`` reports what changed.
+
+    ``merge_delta`` is the ΔE below which colors merge (0 = off);
+    ``min_area`` and ``min_run`` are the smallest island and horizontal
+    run kept, in stitches (0 or 1 = off).
+    """
+    grid, palette, kept = merge_palette(chart.grid, chart.palette, merge_delta)
+    if min_area > 1 or min_run > 1:
+        grid = despeckle(grid, len(palette), min_area, min_run)
+
+    # Despeckling can empty a color out entirely; drop it
+    used = np.flatnonzero(np.bincount(grid.ravel(), minlength=len(palette)))
+    if len(used) < len(palette):
+        remap = np.zeros(len(palette), dtype=np.uint8)
+        remap[used] = np.arange(len(used))
+        grid, palette, kept = remap[grid], [palette[i] for i in used], kept[used]
+
+    before, after = yarn_changes(chart.grid), yarn_changes(grid)
+    meta = {**chart.meta, "cleanup": {
+        "merge_delta": merge_delta,
+        "min_area": min_area,
+        "min_run": min_run,
+        "colors_before": len(chart.palette),
+        "colors_after": len(palette),
+        "stitches_changed": int(np.count_nonzero(kept[grid] != chart.grid)),
+        "yarn_changes_before": before,
+        "yarn_changes_after": after,
+        "yarn_changes_saved": before - after,
+    }}
+    if "color_names" in meta:
+        meta["color_names"] = [meta["color_names"][i] for i in kept]
+    return Chart(grid=grid.astype(np.uint8), palette=palette, meta=meta)
@@ -0,0 +1,204 @@
+"""Image to chart conversion engine.
+
+Pure Python / NumPy / Pillow - no Streamlit import - so conversions can
+run in worker processes, batch jobs and benchmarks as well as the app.
+"""
+
+import io
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from PIL import Image
+
+from crochet.dither import dither_grid
+from crochet.quantize import quantize, to_rgb_array
+from crochet.timing import span, timed
+
+# Large-chart mode: widest chart offered, output rows sampled per tile, and
+# the biggest source we will fully decode when the format has no reduced
+# (draft) decoding - JPEG sources are always decoded at reduced scale.
+LARGE_MAX_WIDTH = 700
+TILE_ROWS = 64
+MAX_SOURCE_PIXELS = 50_000_000
+
+
+@dataclass
+class Chart:
+    """A converted stitch chart: one palette index per stitch."""
+    grid: np.ndarray                 # (height, width) uint8 palette indices
+    palette: list                    # [(r, g, b), ...] indexed by grid value
+    meta: dict = field(default_factory=dict)
+
+    @property
+    def width(self) -> int:
+        return int(self.grid.shape[1])
+
+    @property
+    def height(self) -> int:
+        return int(self.grid.shape[0])
+
+    @property
+    def dimensions(self) -> tuple:
+        return (self.width, self.height)
+
+    def flat_palette(self) -> list:
+        """Return the palette as a flat [r, g, b, r, g, b, ...] list."""
+        return [c for rgb in self.palette for c in rgb]
+
+    def to_image(self) -> Image.Image:
+        """Return the chart as a 1-pixel-per-stitch paletted PIL image."""
+        img = Image.fromarray(self.grid, mode="P")
+        img.putpalette(self.flat_palette())
+        return img
+
+
+@timed("decode")
+def decode_image(data: bytes) -> Image.Image:
+    """Decode uploaded image bytes into a fully loaded PIL image."""
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def open_reduced(data: bytes, width_sts: int) -> tuple:
+    """Open ``data`` lazily, asking the decoder for the smallest scale >= the chart.
+
+    Returns ``(image, source_size)`` where ``source_size`` is the size
+    before any reduction.
+
+    For JPEGs ``draft`` makes libjpeg decode at 1/2, 1/4 or 1/8 scale, so
+    a 6000px phone photo is never held at full resolution. Other formats
+    cannot decode at reduced scale and are refused above MAX_SOURCE_PIXELS.
+    """
+    image = Image.open(io.BytesIO(data))
+    source_size = image.size
+    image.draft(None, (width_sts, chart_height(source_size, width_sts)))
+    if image.size == source_size and source_size[0] * source_size[1] > MAX_SOURCE_PIXELS:
+        raise ValueError(
+            f"{image.format} image of {source_size[0]}×{source_size[1]} pixels is too large; "
+            "use a JPEG or a smaller image"
+        )
+    return image, source_size
+
+
+@timed("thumbnail")
+def thumbnail_image(data: bytes, max_size: int = 800) -> Image.Image:
+    """Decode a display-sized copy of ``data`` without loading it at full size."""
+    image = Image.open(io.BytesIO(data))
+    image.thumbnail((max_size, max_size))  # uses draft/reduce internally
+    return image
+
+
+def chart_height(src_size: tuple, width_sts: int) -> int:
+    """Return the chart height (rows) that keeps the source aspect ratio."""
+    w_percent = width_sts / float(src_size[0])
+    return max(1, int(float(src_size[1]) * w_percent))
+
+
+def resize_image(image: Image.Image, width_sts: int) -> Image.Image:
+    """Resize to ``width_sts`` stitches wide with NEAREST for a pixel-art look."""
+    h_size = chart_height(image.size, width_sts)
+    return image.resize((width_sts, h_size), Image.Resampling.NEAREST)
+
+
+def resize_tiled(image: Image.Image, width_sts: int, h_size: int, tile_rows: int = TILE_ROWS) -> Image.Image:
+    """Nearest-neighbour resize that only converts ``tile_rows`` output rows at a time.
+
+    Each tile crops just the source rows it samples, one pixel row each,
+    and indexes them with precomputed column positions, so no full-size
+    NumPy copy or converted copy of the source is ever made. Cropping a
+    whole band instead would copy every source row between them.
+    """
+    if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+        mode = "RGBA"
+    elif image.mode == "L":
+        mode = "L"
+    else:
+        mode = "RGB"
+    src_w, src_h = image.size
+    xs = ((np.arange(width_sts) + 0.5) * (src_w / width_sts)).astype(np.intp)
+    ys = ((np.arange(h_size) + 0.5) * (src_h / h_size)).astype(np.intp)
+    channels = len(mode)
+    out = np.empty((h_size, width_sts, channels), dtype=np.uint8)
+    for y0 in range(0, h_size, tile_rows):
+        band = ys[y0:y0 + tile_rows]
+        rows, index = np.unique(band, return_inverse=True)
+        tile = np.empty((len(rows), width_sts, channels), dtype=np.uint8)
+        for i, y in enumerate(rows.tolist()):
+            strip = image.crop((0, y, src_w, y + 1))
+            if strip.mode != mode:
+                strip = strip.convert(mode)
+            tile[i] = np.asarray(strip).reshape(src_w, channels)[xs]
+        out[y0:y0 + len(band)] = tile[index]
+    return Image.fromarray(out[:, :, 0] if mode == "L" else out, mode)
+
+
+def prepare_image(data: bytes, width_sts: int, large: bool = False, image: Image.Image = None) -> tuple:
+    """Decode and resize ``data`` to chart size; returns ``(img_small, source_info)``.
+
+    ``image`` may carry an already decoded copy of ``data`` so callers that
+    keep decoded sources around can skip decoding (ignored when ``large``).
+    """
+    if width_sts < 1:
+        raise ValueError("width_sts must be at least 1")
+    if large:
+        with span("decode"):
+            image, source_size = open_reduced(data, width_sts)
+        with span("resize"):  # large sources are decoded band by band while resizing
+            img_small = resize_tiled(image, width_sts, chart_height(source_size, width_sts))
+    else:
+        image = image if image is not None else decode_image(data)
+        source_size = image.size
+        with span("resize"):
+            img_small = resize_image(image, width_sts)
+    info = {"source_size": source_size, "source_mode": image.mode, "source_format": image.format}
+    return img_small, info
+
+
+def quantize_chart(img_small: Image.Image, num_colors: int, quantizer: str = "median_cut", meta: dict = None,
+                   dither: str = "none") -> Chart:
+    """Quantize a chart-sized image into a Chart, merging ``meta`` into its metadata.
+
+    ``dither`` (see ``crochet.dither``) remaps the image onto the chosen
+    palette with dithering; colors it leaves unused are dropped.
+    """
+    if not 1 <= num_colors <= 256:
+        raise ValueError("num_colors must be between 1 and 256")
+    with span("quantize"):
+        grid, palette, quant_meta = quantize(img_small, num_colors, quantizer)
+    if dither != "none":
+        with span("dither"):
+            grid = dither_grid(to_rgb_array(img_small), palette, dither)
+            used = np.flatnonzero(np.bincount(grid.ravel(), minlength=len(palette)))
+            if len(used) < len(palette):
+                remap = np.zeros(len(palette), dtype=np.uint8)
+                remap[used] = np.arange(len(used))
+                grid = remap[grid]
+                palette = [palette[i] for i in used]
+                if "color_names" in quant_meta:
+                    quant_meta["color_names"] = [quant_meta["color_names"][i] for i in used]
+    meta = {**(meta or {}), "num_colors": num_colors, "quantizer": quantizer, "dither": dither, **quant_meta}
+    return Chart(grid=grid, palette=palette, meta=meta)
+
+
+def convert_image(data: bytes, width_sts: int, num_colors: int, large: bool = False,
+                  quantizer: str = "median_cut", dither: str = "none") -> Chart:
+    """Convert raw image bytes into a stitch chart.
+
+    ``width_sts`` is the chart width in stitches; the height follows the
+    source aspect ratio. ``num_colors`` caps the palette size. ``large``
+    selects the memory-bounded path (reduced decoding + tiled resize)
+    meant for blanket-sized charts from big photos. ``quantizer`` names a
+    backend from ``crochet.quantize`` (e.g. "kmeans" or "yarn:Worsted Basics")
+    and ``dither`` a mode from ``crochet.dither`` (e.g. "floyd_steinberg").
+    """
+    if not 1 <= num_colors <= 256:
+        raise ValueError("num_colors must be between 1 and 256")
+
+    start = time.perf_counter()
+    img_small, info = prepare_image(data, width_sts, large)
+    chart = quantize_chart(img_small, num_colors, quantizer, {**info, "width_sts": width_sts, "large": large},
+                           dither)
+    chart.meta["elapsed_ms"] = (time.perf_counter() - start) * 1000.0
+    return chart
@@ -0,0 +1,123 @@
+"""Chart export encoders (PNG and CSV) shared by the app and batch jobs."""
+
+import csv
+import io
+from dataclasses import dataclass
+
+import numpy as np
+
+from crochet.engine import Chart
+from crochet.timing import timed
+
+
+@timed("export.png")
+def chart_png_bytes(chart: Chart) -> bytes:
+    """Return the chart as PNG bytes, one pixel per stitch."""
+    buf = io.BytesIO()
+    chart.to_image().save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@dataclass
+class RowRuns:
+    """Run-length encoding of every row of a chart grid.
+
+    Runs are stored flat, in row-major order; ``row`` says which chart row
+    each run belongs to and ``row_offsets[r]:row_offsets[r + 1]`` slices
+    out the runs of row ``r``.
+    """
+    row: np.ndarray              # (n_runs,) chart row of each run
+    color: np.ndarray            # (n_runs,) palette index of each run
+    length: np.ndarray           # (n_runs,) stitches in each run
+    row_offsets: np.ndarray      # (height + 1,) run index where each row starts
+    color_counts: np.ndarray     # (height, n_colors) stitches per color per row
+
+    @property
+    def runs_per_row(self) -> np.ndarray:
+        return np.diff(self.row_offsets)
+
+    @property
+    def yarn_changes(self) -> np.ndarray:
+        """Color changes within each row (runs minus one)."""
+        return self.runs_per_row - 1
+
+    @property
+    def colors_per_row(self) -> np.ndarray:
+        """Number of distinct colors used in each row."""
+        return np.count_nonzero(self.color_counts, axis=1)
+
+    @property
+    def color_totals(self) -> np.ndarray:
+        """Stitches of each color over the whole chart."""
+        return self.color_counts.sum(axis=0)
+
+
+def row_runs(grid: np.ndarray, n_colors: int = None) -> RowRuns:
+    """Run-length encode every row of ``grid`` at once.
+
+    A run starts at column 0 of every row and wherever a stitch differs
+    from its left neighbour, so runs never span rows and the whole grid
+    can be encoded from one flat boundary mask.
+    """
+    grid = np.asarray(grid)
+    height, width = grid.shape
+    n_colors = max(int(grid.max()) + 1 if grid.size else 0, n_colors or 0)
+
+    starts_mask = np.ones((height, width), dtype=bool)
+    np.not_equal(grid[:, 1:], grid[:, :-1], out=starts_mask[:, 1:])
+    starts = np.flatnonzero(starts_mask)
+
+    length = np.diff(np.append(starts, grid.size))
+    color = grid.ravel()[starts]
+    row = starts // width if width else starts
+    row_offsets = np.zeros(height + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row, minlength=height), out=row_offsets[1:])
+
+    flat = np.repeat(np.arange(height) * n_colors, width) + grid.ravel()
+    color_counts = np.bincount(flat, minlength=height * n_colors).reshape(height, n_colors)
+    return RowRuns(row=row, color=color, length=length, row_offsets=row_offsets, color_counts=color_counts)
+
+
+def run_labels(runs: RowRuns, names: list = None) -> list:
+    """Return the "5×C1, 3×C4, ..." instruction string for every row.
+
+    ``names`` optionally replaces the "C1", "C2", ... color labels.
+    """
+    # Only a few distinct (length, color) pairs occur, so format each once
+    n = runs.color_counts.shape[1]
+    names = names or [f"C{i + 1}" for i in range(n)]
+    codes, inverse = np.unique(runs.length * n + runs.color, return_inverse=True)
+    lut = np.array([f"{c // n}×{names[c % n]}" for c in codes.tolist()], dtype=object)
+    labels = lut[inverse].tolist()
+    offsets = runs.row_offsets.tolist()
+    return [", ".join(labels[a:b]) for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+def write_chart_csv(grid: np.ndarray, f, n_colors: int = None):
+    """Stream the per-row color-run CSV for ``grid`` into text file ``f``.
+
+    One line per row with its stitch count, colors used, yarn changes,
+    stitches of each color and the color runs to work, then a totals line.
+    """
+    runs = row_runs(grid, n_colors)
+    height, width = grid.shape
+    n = runs.color_counts.shape[1]
+    writer = csv.writer(f)
+    writer.writerow(["Row", "Stitch Count", "Colors Used", "Yarn Changes"]
+                    + [f"C{i + 1}" for i in range(n)] + ["Runs"])
+    labels = run_labels(runs)
+    colors_used = runs.colors_per_row.tolist()
+    changes = runs.yarn_changes.tolist()
+    counts = runs.color_counts.tolist()
+    for r in range(height):
+        writer.writerow([r + 1, width, colors_used[r], changes[r]] + counts[r] + [labels[r]])
+    writer.writerow(["Total", width * height, int(np.count_nonzero(runs.color_totals)),
+                     int(runs.yarn_changes.sum())] + runs.color_totals.tolist() + [""])
+
+
+@timed("export.csv")
+def chart_csv(grid: np.ndarray, n_colors: int = None) -> str:
+    """Return the per-row color-run CSV as a string."""
+    buf = io.StringIO()
+    write_chart_csv(grid, buf, n_colors)
+    return buf.getvalue()
@@ -0,0 +1,96 @@
+"""Matplotlib preview figures for the Pattern Generator.
+
+Figures are built with the object-oriented ``Figure`` API on the Agg
+canvas rather than ``pyplot``, so they never enter pyplot's global figure
+registry and are freed as soon as they are rendered. ``render_png`` turns
+one into PNG bytes, which is what the pipeline caches.
+"""
+
+import io
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.patches import Circle, Rectangle
+
+from crochet.timing import timed
+
+PREVIEW_DPI = 100
+
+
+def new_figure(figsize: tuple = (3, 3)) -> tuple:
+    """Return ``(fig, ax)`` on a non-interactive Agg canvas."""
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+
+@timed("figure")
+def render_png(fig: Figure, dpi: int = PREVIEW_DPI) -> bytes:
+    """Render ``fig`` to PNG bytes and release its artists."""
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
+    fig.clear()
+    return buf.getvalue()
+
+
+def draw_shape_outline(shape: str, size: float = 10):
+    """Return a Matplotlib figure showing the overall project shape."""
+    fig, ax = new_figure()
+    ax.set_aspect("equal")
+    ax.axis("off")
+
+    if shape == "Square":
+        ax.add_patch(Rectangle((-1, -1), 2, 2, fill=False, linewidth=3, color="purple"))
+    elif shape == "Rectangle":
+        ax.add_patch(Rectangle((-1.5, -1), 3, 2, fill=False, linewidth=3, color="purple"))
+    elif shape == "Circle":
+        ax.add_patch(Circle((0, 0), 1, fill=False, linewidth=3, color="purple"))
+    elif shape == "Triangle":
+        ax.plot([0, -1, 1, 0], [1, -1, -1, 1], color="purple", linewidth=3)
+    else:
+        ax.add_patch(Rectangle((-1, -1), 2, 2, fill=False, linewidth=3, color="purple"))
+
+    # Patches don't autoscale the view, so frame the widest shape explicitly
+    ax.set_xlim(-1.6, 1.6)
+    ax.set_ylim(-1.2, 1.2)
+    ax.set_title(f"{shape} outline", fontsize=10)
+    return fig
+
+
+def draw_stitch_texture(stitch_name: str):
+    """Return a Matplotlib figure approximating the stitch texture as a small grid."""
+    fig, ax = new_figure()
+    ax.set_aspect("equal")
+    ax.axis("off")
+
+    # Small grid
+    rows, cols = 8, 8
+
+    if "Mesh" in stitch_name:  # Treble Mesh / Filet Mesh
+        grid = np.zeros((rows, cols))
+        grid[::2, ::2] = 1  # spaced holes
+    elif "Granite" in stitch_name or "Moss" in stitch_name:
+        grid = np.ones((rows, cols)) * 0.6
+        grid[::2, 1::2] = 0.9  # woven look
+    elif "Granny" in stitch_name:
+        grid = np.zeros((rows, cols))
+        for r in range(0, rows, 4):
+            for c in range(0, cols, 4):
+                grid[r:r+3, c:c+3] = 0.8  # 3-stitch clusters
+    else:  # Double Crochet or default
+        grid = np.ones((rows, cols)) * 0.8  # solid
+
+    ax.imshow(grid, cmap="Purples")
+    ax.set_title(f"{stitch_name} texture", fontsize=10)
+    return fig
+
+
+def shape_outline_png(shape: str) -> bytes:
+    """Return the shape outline preview as PNG bytes."""
+    return render_png(draw_shape_outline(shape))
+
+
+def stitch_texture_png(stitch_name: str) -> bytes:
+    """Return the stitch texture preview as PNG bytes."""
+    return render_png(draw_stitch_texture(stitch_name))
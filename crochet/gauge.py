@@ -0,0 +1,156 @@
+"""Gauge-driven stitch, round and yardage calculator.
+
+Every shape is worked outward from the center (or the neck opening) in
+rounds. The stitch count of a round is the perimeter of the shape at
+that round's distance from the center times the stitch gauge, rounded to
+a multiple of the shape's increase points so increases stay symmetric:
+
+    Circle    P(r) = 2πr          (6 increase points)
+    Square    P(r) = 8r           (4 corners)
+    Rectangle P(r) = 8r + 2(w-h)  (4 corners around a foundation chain)
+    Triangle  P(r) = 6√3·r        (3 corners)
+
+Because P is linear in r, totals for whole grids of sizes × yarns ×
+gauges have a closed form and are evaluated as array operations.
+"""
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+CM_PER_INCH = 2.54
+YARDS_PER_METER = 1.0936
+
+# Rectangles are drawn and worked 3:2 (width : height).
+RECTANGLE_ASPECT = 2 / 3
+
+# (perimeter slope, increase points) per shape; see module docstring.
+SHAPES = {
+    "Circle": (2 * math.pi, 6),
+    "Square": (8.0, 4),
+    "Rectangle": (8.0, 4),
+    "Triangle": (6 * math.sqrt(3), 3),
+}
+
+# Standard yarn weights with typical single crochet gauge per 10 cm and
+# the middle of the recommended hook range.
+YARN_WEIGHTS = {
+    "Fingering (1)": {"stitches_per_10cm": 24, "rows_per_10cm": 28, "hook_mm": 3.0},
+    "Sport (2)": {"stitches_per_10cm": 18, "rows_per_10cm": 21, "hook_mm": 4.0},
+    "DK (3)": {"stitches_per_10cm": 15, "rows_per_10cm": 17, "hook_mm": 5.0},
+    "Worsted (4)": {"stitches_per_10cm": 13, "rows_per_10cm": 15, "hook_mm": 6.0},
+    "Bulky (5)": {"stitches_per_10cm": 10, "rows_per_10cm": 11, "hook_mm": 8.0},
+    "Super Bulky (6)": {"stitches_per_10cm": 8, "rows_per_10cm": 9, "hook_mm": 10.0},
+}
+
+# Base stitches: row height relative to sc, and yarn used per stitch
+# measured in stitch widths.
+STITCH_BASES = {
+    "sc": {"height": 1.0, "yarn": 5.5},
+    "hdc": {"height": 1.5, "yarn": 7.5},
+    "dc": {"height": 2.0, "yarn": 10.0},
+    "tr": {"height": 2.7, "yarn": 13.0},
+}
+
+
+@dataclass(frozen=True)
+class Gauge:
+    """Stitches and rows per 10 cm for one yarn, hook and stitch."""
+    stitches_per_10cm: float
+    rows_per_10cm: float
+    hook_mm: float
+    yarn_weight: str = "Custom"
+    base_stitch: str = "sc"
+
+    @property
+    def stitches_per_cm(self) -> float:
+        return self.stitches_per_10cm / 10.0
+
+    @property
+    def row_height_cm(self) -> float:
+        return 10.0 / self.rows_per_10cm
+
+    @property
+    def meters_per_stitch(self) -> float:
+        """Yarn used by one stitch, in meters."""
+        return STITCH_BASES[self.base_stitch]["yarn"] / self.stitches_per_cm / 100.0
+
+
+def base_stitch(abbr_us: str) -> str:
+    """Return the base stitch ("sc", "hdc", "dc", "tr") of a US abbreviation like "3dc group"."""
+    first = abbr_us.split(",")[0].strip().lstrip("0123456789").split()[0] if abbr_us.strip() else ""
+    return first if first in STITCH_BASES else "sc"
+
+
+def default_gauge(yarn_weight: str, stitch: str = "sc") -> Gauge:
+    """Return the typical gauge for a yarn weight worked in ``stitch``."""
+    weight = YARN_WEIGHTS[yarn_weight]
+    return Gauge(
+        stitches_per_10cm=weight["stitches_per_10cm"],
+        rows_per_10cm=round(weight["rows_per_10cm"] / STITCH_BASES[stitch]["height"], 1),
+        hook_mm=weight["hook_mm"],
+        yarn_weight=yarn_weight,
+        base_stitch=stitch,
+    )
+
+
+def to_cm(value, measurement_system: str):
+    """Convert a size in the UI's measurement system to centimeters."""
+    return value * CM_PER_INCH if "Imperial" in measurement_system else value
+
+
+def shape_extent(shape: str, size_cm):
+    """Return ``(outer_radius, perimeter_offset)`` for a shape ``size_cm`` wide."""
+    if shape == "Triangle":
+        return size_cm / (2 * math.sqrt(3)), 0.0
+    if shape == "Rectangle":
+        height = size_cm * RECTANGLE_ASPECT
+        return height / 2, 2 * (size_cm - height)
+    return size_cm / 2, 0.0
+
+
+def round_counts(shape: str, size_cm: float, neck_cm: float, gauge: Gauge) -> np.ndarray:
+    """Return the stitch count of every round, from round 1 outward."""
+    slope, points = SHAPES.get(shape, SHAPES["Square"])
+    outer, offset = shape_extent(shape, size_cm)
+    inner = min(neck_cm / 2, outer)
+    n_rounds = max(1, math.ceil((outer - inner) / gauge.row_height_cm))
+    radius = inner + np.arange(1, n_rounds + 1) * gauge.row_height_cm
+    perimeter = slope * radius + offset
+    counts = np.rint(perimeter * gauge.stitches_per_cm / points) * points
+    return np.maximum(counts, points).astype(np.int64)
+
+
+def split_rounds(n_rounds: int, colors: int) -> list:
+    """Split rounds 1..n_rounds into ``colors`` near-equal bands of (first, last)."""
+    colors = max(1, min(colors, n_rounds))
+    edges = np.linspace(0, n_rounds, colors + 1).round().astype(int)
+    return [(int(a) + 1, int(b)) for a, b in zip(edges[:-1], edges[1:])]
+
+
+def band_meters(counts: np.ndarray, bands: list, gauge: Gauge) -> np.ndarray:
+    """Return meters of yarn per color band, summing each band's rounds at once."""
+    starts = np.array([first - 1 for first, _last in bands], dtype=np.intp)
+    return np.add.reduceat(counts, starts) * gauge.meters_per_stitch
+
+
+def yardage_grid(shape: str, sizes_cm, rows_per_10cm, yarn_factor=5.5, neck_cm=0.0):
+    """Total meters of yarn for every combination of the broadcast inputs.
+
+    Uses the closed form of the per-round sum (ignoring per-round
+    rounding), so a grid of thousands of size × yarn × gauge combinations
+    is a handful of array operations. Pass inputs shaped for broadcasting,
+    e.g. ``sizes[:, None]`` and ``rows[None, :]``. ``yarn_factor`` is the
+    yarn per stitch in stitch widths (see STITCH_BASES); the stitch gauge
+    cancels out, since stitches × stitch width is just the round's length.
+    """
+    slope, _points = SHAPES.get(shape, SHAPES["Square"])
+    sizes_cm = np.asarray(sizes_cm, dtype=np.float64)
+    row_h = 10.0 / np.asarray(rows_per_10cm, dtype=np.float64)
+    outer, offset = shape_extent(shape, sizes_cm)
+    inner = np.minimum(np.asarray(neck_cm, dtype=np.float64) / 2, outer)
+    n = np.maximum(1, np.ceil((outer - inner) / row_h))
+    # sum over k=1..n of slope * (inner + k*row_h) + offset, in cm of fabric
+    worked_cm = slope * (n * inner + row_h * n * (n + 1) / 2) + offset * n
+    return worked_cm * np.asarray(yarn_factor, dtype=np.float64) / 100.0
@@ -0,0 +1,133 @@
+"""Written row-by-row instructions for C2C and filet charts.
+
+Both generators work on the whole chart at once: C2C diagonals are
+gathered into one skewed (diagonal × tile) array with index arithmetic
+and filet rows are flipped with slicing, then everything is run-length
+encoded in a single ``row_runs`` pass - no per-cell Python loops.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from crochet.export import RowRuns, row_runs, run_labels
+from crochet.timing import timed
+
+
+@dataclass
+class InstructionRow:
+    """One worked row (a C2C diagonal or a filet row)."""
+    number: int         # 1-based, in working order
+    phase: str          # "increase", "decrease", "inc/dec", "start"; filet: "RS"/"WS"
+    stitches: int       # C2C tiles or filet blocks in the row
+    runs: str           # "3×C1, 2×C4, ..."
+
+
+def trim_runs(runs: RowRuns, sentinel: int) -> RowRuns:
+    """Drop the runs of padding color ``sentinel`` from a RowRuns."""
+    keep = runs.color != sentinel
+    row = runs.row[keep]
+    height = len(runs.row_offsets) - 1
+    row_offsets = np.zeros(height + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row, minlength=height), out=row_offsets[1:])
+    return RowRuns(row=row, color=runs.color[keep], length=runs.length[keep],
+                   row_offsets=row_offsets, color_counts=runs.color_counts[:, :sentinel])
+
+
+def c2c_diagonals(grid: np.ndarray) -> tuple:
+    """Return (diagonals, lengths) for working ``grid`` corner to corner.
+
+    Work starts at the bottom-right corner. Diagonal ``d`` holds the
+    tiles with (rows up from the bottom) + (columns in from the right)
+    == d; odd rows are read from the bottom/right edge upward, even rows
+    back down, matching the back-and-forth of C2C. ``diagonals`` is a
+    (width + height - 1, min(width, height)) array padded past each
+    diagonal's length with the value ``grid.max() + 1``.
+    """
+    b = np.asarray(grid)[::-1, ::-1]        # row 0 = bottom, col 0 = rightmost
+    height, width = b.shape
+    n_diag = width + height - 1
+    d = np.arange(n_diag)[:, None]
+    j = np.arange(min(width, height))[None, :]
+
+    r_first = np.maximum(0, d - (width - 1))             # lowest row on the diagonal
+    lengths = (np.minimum(d, height - 1) - r_first + 1).ravel()
+    offset = np.where(d % 2 == 1, lengths[:, None] - 1 - j, j)  # even rows run backwards
+    r = r_first + offset
+    c = d - r
+    valid = j < lengths[:, None]
+
+    sentinel = int(b.max()) + 1 if b.size else 0
+    diagonals = np.where(valid, b[np.clip(r, 0, height - 1), np.clip(c, 0, width - 1)], sentinel)
+    return diagonals.astype(np.uint16), lengths
+
+
+def c2c_phases(width: int, height: int) -> list:
+    """Return the increase/decrease phase of every C2C diagonal."""
+    d = np.arange(width + height - 1)
+    bottom_inc = d <= width - 1
+    side_inc = d <= height - 1
+    phases = np.where(bottom_inc & side_inc, "increase",
+                      np.where(~bottom_inc & ~side_inc, "decrease", "inc/dec"))
+    phases = phases.tolist()
+    phases[0] = "start"
+    return phases
+
+
+@timed("instructions.c2c")
+def c2c_instructions(grid: np.ndarray, names: list = None) -> list:
+    """Return one InstructionRow per C2C diagonal of ``grid``."""
+    grid = np.asarray(grid)
+    diagonals, lengths = c2c_diagonals(grid)
+    sentinel = int(grid.max()) + 1
+    runs = trim_runs(row_runs(diagonals, sentinel + 1), sentinel)
+    labels = run_labels(runs, names)
+    phases = c2c_phases(grid.shape[1], grid.shape[0])
+    return [InstructionRow(i + 1, phases[i], int(lengths[i]), labels[i]) for i in range(len(labels))]
+
+
+def filet_mask(grid: np.ndarray, palette: list, filled: list = None) -> np.ndarray:
+    """Return a boolean (rows × blocks) array, True where the block is closed.
+
+    ``filled`` lists the palette indices worked as closed blocks; by
+    default every color darker than the palette's mean luminance is.
+    """
+    if filled is None:
+        rgb = np.array(palette, dtype=np.float64).reshape(-1, 3)
+        luma = rgb @ np.array([0.299, 0.587, 0.114])
+        filled = np.flatnonzero(luma < luma.mean()) if len(luma) > 1 else []
+    lut = np.zeros(max(len(palette), int(np.asarray(grid).max()) + 1), dtype=bool)
+    lut[list(filled)] = True
+    return lut[grid]
+
+
+@timed("instructions.filet")
+def filet_instructions(grid: np.ndarray, palette: list, filled: list = None) -> list:
+    """Return one InstructionRow per filet row, worked from the bottom up.
+
+    Right-side (odd) rows are read right to left and wrong-side rows left
+    to right, as they are worked.
+    """
+    mask = filet_mask(grid, palette, filled)[::-1].astype(np.uint8)
+    worked = mask.copy()
+    worked[0::2] = mask[0::2, ::-1]
+    runs = row_runs(worked, 2)
+    labels = run_labels(runs, ["open", "closed"])
+    width = grid.shape[1]
+    return [InstructionRow(i + 1, "RS" if i % 2 == 0 else "WS", width, label) for i, label in enumerate(labels)]
+
+
+def filet_foundation(width: int) -> str:
+    """Return the foundation chain instruction for ``width`` filet blocks."""
+    return (f"Chain {3 * width + 1} (3 per block + 1), then chain 3 more to turn "
+            f"(counts as the first dc). Closed block: 1 dc in each of the next 2 sts + 1 dc; "
+            f"open block: ch 2, sk 2, 1 dc.")
+
+
+def instructions_text(title: str, rows: list, preamble: str = "") -> str:
+    """Render instruction rows as plain text for download."""
+    lines = [title, "=" * len(title)]
+    if preamble:
+        lines += [preamble, ""]
+    lines += [f"Row {row.number} ({row.phase}, {row.stitches}): {row.runs}" for row in rows]
+    return "\n".join(lines) + "\n"
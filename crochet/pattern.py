@@ -0,0 +1,439 @@
+"""Pattern Generator model and renderers.
+
+``build_pattern`` is a pure function from the generator parameters to a
+``PatternModel`` (foundation chain, rounds, increases, color bands,
+gauge notes). Given a ``Gauge`` it also carries exact per-round stitch
+counts and yardage per color band from ``crochet.gauge``.
+``render_pattern`` turns a model into Markdown, plain text or HTML with
+``string.Template`` templates compiled once at import, so patterns can
+be produced from scripts, the API or batch jobs without the UI, and
+models can be cached by their parameters.
+"""
+
+import html
+from dataclasses import asdict, dataclass
+from string import Template
+
+from crochet.gauge import (SHAPES, YARDS_PER_METER, Gauge, band_meters, round_counts, split_rounds,
+                           to_cm)
+from crochet.timing import timed
+
+FORMATS = ("markdown", "text", "html")
+MEASUREMENT_SYSTEMS = ("Metric (cm)", "Imperial (inches)")
+
+ABBREVIATIONS = (
+    ("ch", "Chain"),
+    ("st/sts", "Stitch/Stitches"),
+    ("sc", "Single Crochet"),
+    ("dc", "Double Crochet"),
+    ("tr", "Treble"),
+    ("sk", "Skip"),
+    ("sl st", "Slip Stitch"),
+    ("inc", "Increase"),
+    ("dec", "Decrease"),
+)
+
+GAUGE_NOTES = (
+    "Adjust hook size if your gauge is off",
+    "This pattern is a guideline—modify to fit your yarn weight",
+    "Always swatch first!",
+)
+
+
+@dataclass(frozen=True)
+class ColorBand:
+    """A stripe of one color, worked over a range of rounds."""
+    color: int
+    first_round: int
+    last_round: int
+
+
+@dataclass(frozen=True)
+class PatternModel:
+    """Everything needed to render a pattern, computed once from the inputs."""
+    shape: str
+    stitch_key: str
+    stitch_info: tuple          # sorted (key, value) pairs from the stitch database
+    size: float
+    neck: float
+    colors: int
+    unit_abbr: str
+    foundation_chain: int       # foundation chain length, in units
+    est_rounds: int
+    increase_points: int        # increases per round
+    color_bands: tuple          # ColorBand per color
+    gauge_notes: tuple = GAUGE_NOTES
+    gauge: Gauge = None
+    round_counts: tuple = ()    # stitches in each round (gauge only)
+    band_meters: tuple = ()     # yarn per color band, meters (gauge only)
+    requested_colors: int = None  # colors asked for, when there were fewer rounds than that (gauge only)
+
+    @property
+    def stitch(self) -> dict:
+        return dict(self.stitch_info)
+
+    def to_dict(self) -> dict:
+        """Return the model as plain JSON-serializable data."""
+        data = asdict(self)
+        data["stitch_info"] = self.stitch
+        return data
+
+
+def unit_abbreviation(measurement_system: str) -> str:
+    """Return the unit suffix used in pattern text for a measurement system."""
+    return '"' if "Imperial" in measurement_system else "cm"
+
+
+def pattern_metrics(size: float, neck: float, colors: int) -> dict:
+    """Return the derived pattern numbers for the given parameters."""
+    return {
+        "size_per_color": int(size / colors) if colors > 0 else size,
+        "est_rounds": int((size - neck) / 2.5) if neck > 0 else int(size / 2.5),
+        "foundation": int(neck * 1.5 if neck > 0 else size * 0.5),
+    }
+
+
+def color_bands(colors: int, size_per_color: int) -> tuple:
+    """Return the striped color bands, half the per-color size in rounds each."""
+    return tuple(
+        ColorBand(i + 1, i * size_per_color // 2, (i + 1) * size_per_color // 2)
+        for i in range(colors)
+    )
+
+
+@timed("pattern.build")
+def build_pattern(shape: str, stitch_key: str, stitch_info: dict, size: float, neck: float,
+                  colors: int, measurement_system: str, metrics: dict = None,
+                  gauge: Gauge = None) -> PatternModel:
+    """Return the PatternModel for the Pattern Generator inputs.
+
+    Without a ``gauge`` the round count is the rough 2.5-units-per-round
+    estimate; with one, rounds, bands and yardage come from the gauge.
+    """
+    metrics = metrics or pattern_metrics(size, neck, colors)
+    gauge_fields = {}
+    if gauge is not None:
+        counts = round_counts(shape, to_cm(size, measurement_system), to_cm(neck, measurement_system), gauge)
+        bands = split_rounds(len(counts), colors)
+        gauge_fields = {
+            # One band per color needs a round per color; fewer rounds mean fewer colors
+            "colors": len(bands),
+            "requested_colors": colors if colors > len(bands) else None,
+            "gauge": gauge,
+            "est_rounds": len(counts),
+            "round_counts": tuple(counts.tolist()),
+            "color_bands": tuple(ColorBand(i + 1, first, last) for i, (first, last) in enumerate(bands)),
+            "band_meters": tuple(round(m, 1) for m in band_meters(counts, bands, gauge).tolist()),
+        }
+    fields = dict(
+        shape=shape,
+        stitch_key=stitch_key,
+        stitch_info=tuple(sorted(stitch_info.items())),
+        size=size,
+        neck=neck,
+        colors=colors,
+        unit_abbr=unit_abbreviation(measurement_system),
+        foundation_chain=metrics["foundation"],
+        est_rounds=metrics["est_rounds"],
+        increase_points=SHAPES.get(shape, SHAPES["Square"])[1],
+        color_bands=color_bands(colors, metrics["size_per_color"]),
+    )
+    fields.update(gauge_fields)
+    return PatternModel(**fields)
+
+
+# --- TEMPLATES ---
+MARKDOWN = {
+    "document": Template("""# $shape $stitch_key Pattern
+
+## Project Summary
+- **Shape:** $shape
+- **Final Dimensions:** $size$unit width
+- **Neck/Opening:** $neck$unit (if applicable)
+- **Stitch:** $stitch_key
+- **Colors:** $colors
+
+## Stitch Information
+**Abbreviation (UK):** `$abbr_uk`
+**Abbreviation (US):** `$abbr_us`
+**Difficulty Level:** $difficulty
+**Drape Type:** $drape
+
+## Key Abbreviations
+| Abbreviation | Meaning |
+|---|---|
+$abbreviations
+
+## Pattern Instructions
+
+### Foundation
+1. **Starting Chain:** Create a foundation chain of approximately $foundation$unit
+2. **Join:** Slip stitch to form a ring (or work flat if rectangular)
+3. **Setup Round:** Work $stitch_key stitches evenly around the ring
+
+### Body (Work in Rounds)
+- **Rounds 1-$est_rounds:** Continue working $stitch_key in rounds
+- **Increases:** Place increases at $increase_points evenly spaced points per round (for even expansion)
+- **Row Height:** Approximately 2–3$unit per round (adjust based on your gauge)
+
+### Color Pattern
+Work the following colors in striped rounds:
+$bands$gauge_section
+
+### Finishing
+1. Cut yarn leaving 6$unit tail
+2. Pull through last loop
+3. Weave in all ends
+4. **Block:** Wet block and pin to shape for best results
+
+## Gauge & Notes
+$notes
+
+---
+**[Watch $tutorial_name →]($video)**
+"""),
+    "abbreviation": Template("| $abbr | $meaning |"),
+    "band": Template("\n- **Color $color:** Rounds $first-$last"),
+    "note": Template("- $note"),
+    "gauge": Template("""
+
+### Gauge
+- **Yarn:** $yarn_weight, $hook mm hook
+- **Gauge:** $gauge_sts sts × $gauge_rows rows = 10 cm in $base_stitch
+
+### Round-by-Round Stitch Counts
+| Round | Stitches | Increases |
+|---|---|---|
+$round_rows
+
+### Yarn Requirements (estimate)
+| Color | Rounds | Meters | Yards |
+|---|---|---|---|
+$yarn_rows
+| **Total** | | **$total_m** | **$total_yd** |"""),
+    "round_row": Template("| $round | $stitches | +$increases |"),
+    "yarn_row": Template("| Color $color | $first-$last | $meters | $yards |"),
+}
+
+TEXT = {
+    "document": Template("""$shape $stitch_key Pattern
+$rule
+
+PROJECT SUMMARY
+  Shape: $shape
+  Final Dimensions: $size$unit width
+  Neck/Opening: $neck$unit (if applicable)
+  Stitch: $stitch_key
+  Colors: $colors
+
+STITCH INFORMATION
+  Abbreviation (UK): $abbr_uk
+  Abbreviation (US): $abbr_us
+  Difficulty Level: $difficulty
+  Drape Type: $drape
+
+KEY ABBREVIATIONS
+$abbreviations
+
+FOUNDATION
+  1. Starting Chain: Create a foundation chain of approximately $foundation$unit
+  2. Join: Slip stitch to form a ring (or work flat if rectangular)
+  3. Setup Round: Work $stitch_key stitches evenly around the ring
+
+BODY (WORK IN ROUNDS)
+  Rounds 1-$est_rounds: Continue working $stitch_key in rounds
+  Increases: Place increases at $increase_points evenly spaced points per round (for even expansion)
+  Row Height: Approximately 2–3$unit per round (adjust based on your gauge)
+
+COLOR PATTERN
+Work the following colors in striped rounds:
+$bands$gauge_section
+
+FINISHING
+  1. Cut yarn leaving 6$unit tail
+  2. Pull through last loop
+  3. Weave in all ends
+  4. Block: Wet block and pin to shape for best results
+
+GAUGE & NOTES
+$notes
+
+Video tutorial: $tutorial_name – $video
+"""),
+    "abbreviation": Template("  $abbr$meaning"),
+    "band": Template("\n  Color $color: Rounds $first-$last"),
+    "note": Template("  - $note"),
+    "gauge": Template("""
+
+GAUGE
+  Yarn: $yarn_weight, $hook mm hook
+  Gauge: $gauge_sts sts x $gauge_rows rows = 10 cm in $base_stitch
+
+ROUND-BY-ROUND STITCH COUNTS
+$round_rows
+
+YARN REQUIREMENTS (ESTIMATE)
+$yarn_rows
+  Total: $total_m m / $total_yd yd"""),
+    "round_row": Template("  Round $round: $stitches sts (+$increases)"),
+    "yarn_row": Template("  Color $color (rounds $first-$last): $meters m / $yards yd"),
+}
+
+HTML = {
+    "document": Template("""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>$shape $stitch_key Pattern</title>
+</head>
+<body>
+<h1>$shape $stitch_key Pattern</h1>
+<h2>Project Summary</h2>
+<ul>
+<li><strong>Shape:</strong> $shape</li>
+<li><strong>Final Dimensions:</strong> $size$unit width</li>
+<li><strong>Neck/Opening:</strong> $neck$unit (if applicable)</li>
+<li><strong>Stitch:</strong> $stitch_key</li>
+<li><strong>Colors:</strong> $colors</li>
+</ul>
+<h2>Stitch Information</h2>
+<p><strong>Abbreviation (UK):</strong> <code>$abbr_uk</code><br>
+<strong>Abbreviation (US):</strong> <code>$abbr_us</code><br>
+<strong>Difficulty Level:</strong> $difficulty<br>
+<strong>Drape Type:</strong> $drape</p>
+<h2>Key Abbreviations</h2>
+<table>
+<tr><th>Abbreviation</th><th>Meaning</th></tr>
+$abbreviations
+</table>
+<h2>Pattern Instructions</h2>
+<h3>Foundation</h3>
+<ol>
+<li><strong>Starting Chain:</strong> Create a foundation chain of approximately $foundation$unit</li>
+<li><strong>Join:</strong> Slip stitch to form a ring (or work flat if rectangular)</li>
+<li><strong>Setup Round:</strong> Work $stitch_key stitches evenly around the ring</li>
+</ol>
+<h3>Body (Work in Rounds)</h3>
+<ul>
+<li><strong>Rounds 1-$est_rounds:</strong> Continue working $stitch_key in rounds</li>
+<li><strong>Increases:</strong> Place increases at $increase_points evenly spaced points per round (for even expansion)</li>
+<li><strong>Row Height:</strong> Approximately 2–3$unit per round (adjust based on your gauge)</li>
+</ul>
+<h3>Color Pattern</h3>
+<p>Work the following colors in striped rounds:</p>
+<ul>$bands
+</ul>$gauge_section
+<h3>Finishing</h3>
+<ol>
+<li>Cut yarn leaving 6$unit tail</li>
+<li>Pull through last loop</li>
+<li>Weave in all ends</li>
+<li><strong>Block:</strong> Wet block and pin to shape for best results</li>
+</ol>
+<h2>Gauge &amp; Notes</h2>
+<ul>
+$notes
+</ul>
+<hr>
+<p><a href="$video">Watch $tutorial_name →</a></p>
+</body>
+</html>
+"""),
+    "abbreviation": Template("<tr><td>$abbr</td><td>$meaning</td></tr>"),
+    "band": Template("\n<li><strong>Color $color:</strong> Rounds $first-$last</li>"),
+    "note": Template("<li>$note</li>"),
+    "gauge": Template("""
+<h3>Gauge</h3>
+<ul>
+<li><strong>Yarn:</strong> $yarn_weight, $hook mm hook</li>
+<li><strong>Gauge:</strong> $gauge_sts sts × $gauge_rows rows = 10 cm in $base_stitch</li>
+</ul>
+<h3>Round-by-Round Stitch Counts</h3>
+<table>
+<tr><th>Round</th><th>Stitches</th><th>Increases</th></tr>
+$round_rows
+</table>
+<h3>Yarn Requirements (estimate)</h3>
+<table>
+<tr><th>Color</th><th>Rounds</th><th>Meters</th><th>Yards</th></tr>
+$yarn_rows
+<tr><th>Total</th><td></td><th>$total_m</th><th>$total_yd</th></tr>
+</table>"""),
+    "round_row": Template("<tr><td>$round</td><td>$stitches</td><td>+$increases</td></tr>"),
+    "yarn_row": Template("<tr><td>Color $color</td><td>$first-$last</td><td>$meters</td><td>$yards</td></tr>"),
+}
+
+TEMPLATES = {"markdown": MARKDOWN, "text": TEXT, "html": HTML}
+
+
+def colors_label(model: PatternModel) -> str:
+    """Return the color count for the summary, noting when fewer colors than requested fit."""
+    if not model.requested_colors:
+        return str(model.colors)
+    rounds = "round" if model.est_rounds == 1 else "rounds"
+    return f"{model.colors} ({model.requested_colors} requested; only {model.est_rounds} {rounds} at this gauge)"
+
+
+@timed("pattern.render")
+def render_pattern(model: PatternModel, fmt: str = "markdown") -> str:
+    """Render ``model`` as "markdown", "text" or "html"."""
+    if fmt not in TEMPLATES:
+        raise ValueError(f"unknown pattern format {fmt!r}; choose from {', '.join(FORMATS)}")
+    templates = TEMPLATES[fmt]
+    esc = html.escape if fmt == "html" else str
+    stitch = model.stitch
+    title = f"{model.shape} {model.stitch_key} Pattern"
+    context = {
+        "shape": esc(model.shape),
+        "stitch_key": esc(model.stitch_key),
+        "size": model.size,
+        "neck": model.neck,
+        "unit": esc(model.unit_abbr),
+        "colors": colors_label(model),
+        "abbr_uk": esc(stitch["abbr_uk"]),
+        "abbr_us": esc(stitch["abbr_us"]),
+        "difficulty": esc(stitch["difficulty"]),
+        "drape": esc(stitch["drape"]),
+        "tutorial_name": esc(stitch["tutorial_name"]),
+        "video": esc(stitch["video"]),
+        "foundation": model.foundation_chain,
+        "est_rounds": model.est_rounds,
+        "increase_points": model.increase_points,
+        "rule": "=" * len(title),
+        "abbreviations": "\n".join(
+            templates["abbreviation"].substitute(abbr=esc(a).ljust(8) if fmt == "text" else esc(a), meaning=esc(m))
+            for a, m in ABBREVIATIONS
+        ),
+        "bands": "".join(
+            templates["band"].substitute(color=b.color, first=b.first_round, last=b.last_round)
+            for b in model.color_bands
+        ),
+        "notes": "\n".join(templates["note"].substitute(note=esc(n)) for n in model.gauge_notes),
+        "gauge_section": render_gauge_section(model, templates, esc) if model.gauge else "",
+    }
+    return templates["document"].substitute(context)
+
+
+def render_gauge_section(model: PatternModel, templates: dict, esc) -> str:
+    """Render the gauge, per-round counts and yardage tables of a gauged model."""
+    gauge = model.gauge
+    previous = (0,) + model.round_counts[:-1]
+    total_m = sum(model.band_meters)
+    return templates["gauge"].substitute(
+        yarn_weight=esc(gauge.yarn_weight),
+        hook=f"{gauge.hook_mm:g}",
+        gauge_sts=f"{gauge.stitches_per_10cm:g}",
+        gauge_rows=f"{gauge.rows_per_10cm:g}",
+        base_stitch=gauge.base_stitch,
+        round_rows="\n".join(
+            templates["round_row"].substitute(round=i + 1, stitches=n, increases=n - p)
+            for i, (n, p) in enumerate(zip(model.round_counts, previous))
+        ),
+        yarn_rows="\n".join(
+            templates["yarn_row"].substitute(color=b.color, first=b.first_round, last=b.last_round,
+                                             meters=f"{m:.0f}", yards=f"{m * YARDS_PER_METER:.0f}")
+            for b, m in zip(model.color_bands, model.band_meters)
+        ),
+        total_m=f"{total_m:.0f}",
+        total_yd=f"{total_m * YARDS_PER_METER:.0f}",
+    )
@@ -0,0 +1,426 @@
+"""Multi-page PDF export for patterns and charts, written as a stream.
+
+A small PDF 1.4 writer (standard Helvetica fonts, Flate-compressed
+palette images) that writes each object to the output as soon as it is
+complete. Only the page being laid out is ever held in memory: a chart
+tile is rendered, compressed, written and dropped before the next one, so
+a blanket chart spanning dozens of pages costs no more memory than a
+single page. The page tree is written last, as PDF allows.
+
+A document holds, in order:
+
+* a cover with the title, a summary and a thumbnail of the chart;
+* the written pattern (``render_pattern(model, "text")``), if given;
+* the chart, split into page-sized tiles that repeat ``overlap`` rows
+  and stitches of their neighbours, worked order first (bottom-right);
+* the color legend with stitch counts and symbols;
+* row-by-row color runs, numbered from the bottom like the chart.
+
+    with open("blanket.pdf", "wb") as f:
+        write_pdf(f, chart=chart, pattern_text=text, title="Blanket")
+"""
+
+import io
+import re
+import time
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+from crochet.engine import Chart
+from crochet.export import row_runs, run_labels
+from crochet.render import MIN_SYMBOL_CELL, render_chart, symbol_name
+from crochet.timing import timed
+
+A4 = (595.28, 841.89)
+LETTER = (612.0, 792.0)
+PAGE_SIZES = {"A4": A4, "Letter": LETTER}
+MARGIN = 40.0
+
+# Chart tiles: stitch size on paper and in the embedded image
+CELL_PT = 10.0
+MAX_CELL_PT = 24.0
+CELL_PX = 16
+OVERLAP = 2
+ZLIB_LEVEL = 3
+
+FONTS = {"F1": "Helvetica", "F2": "Helvetica-Bold"}
+# Helvetica advance widths (1/1000 em) for ASCII 32-126; bold is approximated
+HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+BOLD_FACTOR = 1.08
+
+
+def pdf_text(s: str) -> bytes:
+    """Encode ``s`` as a PDF literal string in WinAnsi (unsupported characters become '?')."""
+    raw = s.encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+@lru_cache(maxsize=4096)
+def text_units(s: str) -> int:
+    """Width of ``s`` in Helvetica glyph units (1/1000 em); words repeat a lot, so this is cached."""
+    return sum(HELVETICA_WIDTHS[ord(c) - 32] if 32 <= ord(c) < 127 else 556 for c in s)
+
+
+def text_width(s: str, size: float, bold: bool = False) -> float:
+    """Return the width of ``s`` in points when set in Helvetica at ``size``."""
+    return text_units(s) * size / 1000.0 * (BOLD_FACTOR if bold else 1.0)
+
+
+def wrap(s: str, width: float, size: float, bold: bool = False) -> list:
+    """Word-wrap ``s`` into lines no wider than ``width`` points."""
+    lines, line, line_w = [], "", 0.0
+    space_w = text_width(" ", size, bold)
+    for word in s.split(" "):
+        word_w = text_width(word, size, bold)
+        # Track the line width as it grows instead of re-measuring the whole line
+        if line and line_w + space_w + word_w > width:
+            lines.append(line)
+            line, line_w = word, word_w
+        elif line:
+            line, line_w = f"{line} {word}", line_w + space_w + word_w
+        else:
+            line, line_w = word, word_w
+    lines.append(line)
+    return lines
+
+
+class PdfWriter:
+    """Streaming PDF writer: objects go to ``fp`` as soon as they are complete.
+
+    Draw with ``text``, ``rect`` and ``image`` between ``begin_page`` and
+    ``end_page``; ``close`` writes the page tree, cross-reference table
+    and trailer.
+    """
+
+    CATALOG, PAGES = 1, 2
+
+    def __init__(self, fp, page_size: tuple = A4, title: str = ""):
+        self.fp = fp
+        self.page_size = page_size
+        self.title = title
+        self.offsets = {}
+        self.pages = []
+        self._next = 3
+        self._ops = None
+        self._xobjects = {}
+        self._pos = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self.fonts = {name: self._object(f"<< /Type /Font /Subtype /Type1 /BaseFont /{base} "
+                                         f"/Encoding /WinAnsiEncoding >>".encode())
+                      for name, base in FONTS.items()}
+
+    @property
+    def width(self) -> float:
+        return self.page_size[0]
+
+    @property
+    def height(self) -> float:
+        return self.page_size[1]
+
+    # --- objects ---
+    def _write(self, data: bytes):
+        self.fp.write(data)
+        self._pos += len(data)
+
+    def _object(self, body: bytes, num: int = None) -> int:
+        if num is None:
+            num, self._next = self._next, self._next + 1
+        self.offsets[num] = self._pos
+        self._write(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+        return num
+
+    def _stream(self, entries: str, data: bytes) -> int:
+        data = zlib.compress(data, ZLIB_LEVEL)
+        return self._object(f"<< {entries} /Filter /FlateDecode /Length {len(data)} >>\nstream\n".encode()
+                            + data + b"\nendstream")
+
+    # --- pages ---
+    def begin_page(self):
+        self._ops = []
+        self._xobjects = {}
+
+    def text(self, x: float, y: float, s: str, size: float = 10.0, bold: bool = False):
+        font = "F2" if bold else "F1"
+        self._ops.append(b"BT /%s %.1f Tf %.2f %.2f Td %s Tj ET" % (font.encode(), size, x, y, pdf_text(s)))
+
+    def rect(self, x: float, y: float, w: float, h: float, fill: tuple = None, stroke: bool = True):
+        ops = b"%.2f %.2f %.2f %.2f re " % (x, y, w, h)
+        if fill is not None:
+            ops = b"%.3f %.3f %.3f rg " % tuple(c / 255.0 for c in fill) + ops
+        self._ops.append(b"q 0.5 w " + ops + (b"B" if stroke and fill is not None else b"S" if stroke else b"f")
+                         + b" Q")
+
+    def image(self, img, x: float, y: float, w: float, h: float):
+        """Place a Pillow image (``P``, ``L`` or RGB) at ``(x, y)`` scaled to ``w``×``h`` points."""
+        if img.mode == "P":
+            palette = bytes(img.getpalette()[:768])
+            n = len(palette) // 3
+            space = f"[/Indexed /DeviceRGB {n - 1} <{palette.hex()}>]"
+        elif img.mode == "L":
+            space = "/DeviceGray"
+        else:
+            img = img.convert("RGB")
+            space = "/DeviceRGB"
+        num = self._stream(f"/Type /XObject /Subtype /Image /Width {img.width} /Height {img.height} "
+                           f"/ColorSpace {space} /BitsPerComponent 8", img.tobytes())
+        name = f"Im{len(self._xobjects) + 1}"
+        self._xobjects[name] = num
+        self._ops.append(b"q %.2f 0 0 %.2f %.2f %.2f cm /%s Do Q" % (w, h, x, y, name.encode()))
+
+    def end_page(self):
+        content = self._stream("", b"\n".join(self._ops))
+        fonts = " ".join(f"/{name} {num} 0 R" for name, num in self.fonts.items())
+        xobjects = " ".join(f"/{name} {num} 0 R" for name, num in self._xobjects.items())
+        page = self._object(
+            f"<< /Type /Page /Parent {self.PAGES} 0 R /MediaBox [0 0 {self.width:.2f} {self.height:.2f}] "
+            f"/Resources << /Font << {fonts} >> /XObject << {xobjects} >> >> /Contents {content} 0 R >>".encode()
+        )
+        self.pages.append(page)
+        self._ops = None
+
+    def close(self):
+        kids = " ".join(f"{num} 0 R" for num in self.pages)
+        self._object(f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>".encode(), self.PAGES)
+        self._object(f"<< /Type /Catalog /Pages {self.PAGES} 0 R >>".encode(), self.CATALOG)
+        info = self._object(b"<< /Title " + pdf_text(self.title) + b" /Producer (Crochet Architect) /CreationDate "
+                            + pdf_text(time.strftime("D:%Y%m%d%H%M%S")) + b" >>")
+        xref = self._pos
+        size = self._next
+        rows = [b"0000000000 65535 f \n"] + [b"%010d 00000 n \n" % self.offsets[i] for i in range(1, size)]
+        self._write(b"xref\n0 %d\n" % size + b"".join(rows))
+        self._write(b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                    % (size, self.CATALOG, info, xref))
+
+
+class Flow:
+    """Top-to-bottom text layout over as many pages as it takes."""
+
+    def __init__(self, pdf: PdfWriter, footer: str = ""):
+        self.pdf = pdf
+        self.footer = footer
+        self.y = None
+
+    @property
+    def line_width(self) -> float:
+        return self.pdf.width - 2 * MARGIN
+
+    def new_page(self):
+        self.finish()
+        self.pdf.begin_page()
+        self.y = self.pdf.height - MARGIN
+
+    def finish(self):
+        if self.y is not None:
+            page_no = len(self.pdf.pages) + 1
+            self.pdf.text(MARGIN, MARGIN / 2, f"{self.footer}  ·  page {page_no}".strip(" ·"), size=8)
+            self.pdf.end_page()
+            self.y = None
+
+    def need(self, height: float):
+        if self.y is None or self.y - height < MARGIN:
+            self.new_page()
+
+    def line(self, s: str, size: float = 10.0, bold: bool = False, indent: float = 0.0, tab: float = 0.0):
+        """Write ``s`` wrapped to the page; with ``tab``, text after a run of 2+ spaces starts at that offset."""
+        leading = size * 1.35
+        head, body = s, None
+        if tab:
+            parts = re.split(r"\s{2,}", s, maxsplit=1)
+            if len(parts) == 2:
+                head, body = parts
+        if body is None:
+            for part in wrap(s, self.line_width - indent, size, bold):
+                self.need(leading)
+                self.y -= leading
+                self.pdf.text(MARGIN + indent, self.y, part, size, bold)
+            return
+        self.need(leading)
+        self.y -= leading
+        self.pdf.text(MARGIN + indent, self.y, head, size, bold)
+        for i, part in enumerate(wrap(body, self.line_width - indent - tab, size, bold)):
+            if i:
+                self.need(leading)
+                self.y -= leading
+            self.pdf.text(MARGIN + indent + tab, self.y, part, size, bold)
+
+    def heading(self, s: str, size: float = 14.0):
+        self.need(size * 3)
+        self.space(size * 0.6)
+        self.line(s, size, bold=True)
+        self.space(size * 0.3)
+
+    def space(self, points: float):
+        if self.y is not None:
+            self.y -= points
+
+
+def write_cover(pdf: PdfWriter, title: str, chart: Chart = None, summary: list = ()):
+    flow = Flow(pdf)
+    flow.new_page()
+    flow.space(80)
+    flow.line(title, size=26, bold=True)
+    flow.space(6)
+    flow.line("Crochet Architect", size=12)
+    flow.space(18)
+    for item in summary:
+        flow.line(item, size=11)
+    if chart is not None:
+        box = max(72.0, min(pdf.width - 2 * MARGIN, flow.y - 2 * MARGIN))
+        cell = max(1, int(box * 2 // max(chart.width, chart.height)))
+        thumb = render_chart(chart, min(cell, 24), labels=False, grid_every=0)
+        scale = box / max(thumb.width, thumb.height)
+        w, h = thumb.width * scale, thumb.height * scale
+        pdf.image(thumb, (pdf.width - w) / 2, MARGIN + (flow.y - MARGIN - h) / 2, w, h)
+    pdf.end_page()
+
+
+def write_pattern(pdf: PdfWriter, text: str, title: str):
+    """Lay out ``render_pattern(model, "text")`` output: title, section headings, indented items."""
+    flow = Flow(pdf, footer=title)
+    flow.new_page()
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        if set(line) == {"="}:
+            continue
+        if i + 1 < len(lines) and lines[i + 1] and set(lines[i + 1]) == {"="}:
+            flow.line(line, size=18, bold=True)
+            flow.space(6)
+        elif line and line == line.upper() and not line.startswith(" ") and any(c.isalpha() for c in line):
+            flow.heading(line.title(), size=12)
+        elif not line.strip():
+            flow.space(5)
+        else:
+            indent = len(line) - len(line.lstrip(" "))
+            flow.line(line.strip(), indent=indent * 4.0, tab=60.0)
+    flow.finish()
+
+
+def chart_tiles(chart: Chart, cols: int, rows: int, overlap: int) -> list:
+    """Return ``(y0, y1, x0, x1)`` grid slices covering ``chart`` in working order.
+
+    Tiles start at the bottom-right corner and move left, then up; each
+    repeats ``overlap`` rows/stitches of the tile before it.
+    """
+    def spans(total, size):
+        repeat = overlap if size > overlap else 0
+        out, stop = [], total
+        while True:
+            start = max(0, stop - size)
+            out.append((start, stop))
+            if start == 0:
+                return out
+            stop = start + repeat
+
+    return [(y0, y1, x0, x1) for y0, y1 in spans(chart.height, rows) for x0, x1 in spans(chart.width, cols)]
+
+
+def write_chart(pdf: PdfWriter, chart: Chart, title: str, cell_pt: float = CELL_PT, overlap: int = OVERLAP,
+                symbols: bool = False):
+    """Write the chart as one page per tile, each rendered and released before the next."""
+    page_w, page_h = pdf.width - 2 * MARGIN, pdf.height - 2 * MARGIN - 40
+    # Leave room for row numbers on both sides and stitch numbers below
+    avail_w, avail_h = page_w - 6 * cell_pt, page_h - 3 * cell_pt
+    if chart.width * cell_pt <= avail_w and chart.height * cell_pt <= avail_h:
+        cell_pt = min(MAX_CELL_PT, avail_w / chart.width, avail_h / chart.height)
+    cols, rows = max(1, int(avail_w // cell_pt)), max(1, int(avail_h // cell_pt))
+    tiles = chart_tiles(chart, cols, rows, overlap)
+    cell_px = max(CELL_PX, MIN_SYMBOL_CELL) if symbols else CELL_PX
+    for n, (y0, y1, x0, x1) in enumerate(tiles, 1):
+        tile = Chart(grid=chart.grid[y0:y1, x0:x1], palette=chart.palette)
+        img = render_chart(tile, cell_px, symbols=symbols,
+                           row_offset=chart.height - y1, col_offset=chart.width - x1)
+        scale = min(cell_pt / cell_px, page_w / img.width, page_h / img.height)
+        pdf.begin_page()
+        top = pdf.height - MARGIN
+        pdf.text(MARGIN, top - 12, f"Chart – page {n} of {len(tiles)}", size=12, bold=True)
+        pdf.text(MARGIN, top - 26, f"Rows {chart.height - y1 + 1}–{chart.height - y0}, "
+                                   f"stitches {chart.width - x1 + 1}–{chart.width - x0} "
+                                   f"(rows from the bottom, stitches from the right)", size=9)
+        w, h = img.width * scale, img.height * scale
+        pdf.image(img, (pdf.width - w) / 2, top - 34 - h, w, h)
+        if len(tiles) > 1 and overlap:
+            pdf.text(MARGIN, MARGIN / 2 + 10, f"Edges repeat {overlap} rows/stitches of the neighbouring pages.",
+                     size=8)
+        pdf.text(MARGIN, MARGIN / 2, f"{title}  ·  page {len(pdf.pages) + 1}", size=8)
+        pdf.end_page()
+        del img
+
+
+def write_legend(pdf: PdfWriter, chart: Chart, title: str, symbols: bool = False):
+    flow = Flow(pdf, footer=title)
+    flow.new_page()
+    flow.heading("Color Legend", size=16)
+    totals = np.bincount(chart.grid.ravel(), minlength=len(chart.palette))
+    names = chart.meta.get("color_names", [])
+    total = max(1, int(totals.sum()))
+    for i, rgb in enumerate(chart.palette):
+        flow.need(22)
+        flow.y -= 22
+        pdf.rect(MARGIN, flow.y - 4, 16, 16, fill=rgb)
+        label = f"C{i + 1}" + (f" – {names[i]}" if i < len(names) else "")
+        if symbols:
+            label += f"  (symbol: {symbol_name(i)})"
+        pdf.text(MARGIN + 26, flow.y, label, size=11)
+        pdf.text(pdf.width - MARGIN - 150, flow.y,
+                 f"{int(totals[i]):,} sts ({100.0 * totals[i] / total:.1f}%)", size=10)
+    flow.space(12)
+    flow.line(f"{chart.width} stitches × {chart.height} rows = {chart.width * chart.height:,} stitches.", size=10)
+    flow.finish()
+
+
+def write_row_counts(pdf: PdfWriter, chart: Chart, title: str):
+    """Row-by-row color runs from the bottom; odd rows read right to left, even rows left to right."""
+    worked = chart.grid[::-1].copy()
+    worked[0::2] = worked[0::2, ::-1]
+    runs = row_runs(worked, len(chart.palette))
+    labels = run_labels(runs)
+    changes = runs.yarn_changes.tolist()
+    flow = Flow(pdf, footer=title)
+    flow.new_page()
+    flow.heading("Row-by-Row Color Counts", size=16)
+    flow.line("Rows are numbered from the bottom. Odd rows are read right to left and even rows left "
+              "to right, as worked flat.", size=9)
+    flow.space(6)
+    for r, label in enumerate(labels):
+        flow.line(f"Row {r + 1}  ({changes[r]} changes): {label}", size=9, tab=0)
+    flow.finish()
+
+
+@timed("export.pdf")
+def write_pdf(fp, chart: Chart = None, pattern_text: str = None, title: str = "Crochet Pattern",
+              page_size: tuple = A4, cell_pt: float = CELL_PT, overlap: int = OVERLAP,
+              symbols: bool = False) -> int:
+    """Stream a PDF of the pattern and/or chart into binary file ``fp``; returns the page count."""
+    pdf = PdfWriter(fp, page_size, title)
+    summary = []
+    if chart is not None:
+        summary += [f"Chart: {chart.width} stitches × {chart.height} rows",
+                    f"Colors: {len(chart.palette)}",
+                    f"Total stitches: {chart.width * chart.height:,}"]
+    if pattern_text:
+        summary.append("Includes the written pattern")
+    write_cover(pdf, title, chart, summary)
+    if pattern_text:
+        write_pattern(pdf, pattern_text, title)
+    if chart is not None:
+        write_chart(pdf, chart, title, cell_pt, overlap, symbols)
+        write_legend(pdf, chart, title, symbols)
+        write_row_counts(pdf, chart, title)
+    pdf.close()
+    return len(pdf.pages)
+
+
+def pdf_bytes(chart: Chart = None, pattern_text: str = None, **options) -> bytes:
+    """Return ``write_pdf`` output as bytes."""
+    buf = io.BytesIO()
+    write_pdf(buf, chart, pattern_text, **options)
+    return buf.getvalue()
@@ -0,0 +1,343 @@
+"""Staged, memoized chart and pattern pipelines.
+
+Streamlit reruns the whole script on every widget change, so each
+pipeline is split into explicit stages, each memoized on its own inputs:
+
+    chart:   decode -> resize -> quantize -> cleanup -> export / preview / analysis
+    pattern: parameters (+ gauge) -> metrics -> model -> text -> figures
+
+A change only recomputes the stages downstream of it - e.g. changing the
+color count reuses the resized image, and switching measurement system
+reuses the metrics and preview figures. The pipelines live at module
+level, so every session in the process shares them.
+
+The shared pattern pipeline first looks for text, PDF and preview
+outputs in the precomputed catalogue (``crochet.catalogue``), so preset
+patterns are file reads; anything not catalogued is rendered as usual.
+
+The chart stages import the image stack (Pillow, via the engine) and the
+preview stage imports Matplotlib on first use, so building patterns -
+and importing this module - does not load either.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from crochet.gauge import Gauge
+from crochet.pattern import PatternModel, build_pattern, pattern_metrics, render_pattern
+
+if TYPE_CHECKING:
+    from crochet.cache import ChartCache
+    from crochet.catalogue import Catalogue
+    from crochet.engine import Chart
+
+
+# Memory budgets of the chart stages. A decoded 12 MP photo is ~36 MB,
+# so the decode stage holds a couple of sources and skips bigger ones.
+DECODE_MB = 96
+RESIZE_MB = 32
+CLEANUP_MB = 32
+EXPORT_MB = 64
+PREVIEW_MB = 32
+
+
+def value_nbytes(value) -> int:
+    """Estimate the memory held by a memoized value: images, arrays, charts, bytes and containers of them."""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if hasattr(value, "nbytes"):  # NumPy arrays
+        return int(value.nbytes)
+    if hasattr(value, "getbands"):  # PIL images
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, (tuple, list)):
+        return sum(value_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(value_nbytes(v) for v in value.values())
+    if hasattr(value, "__dict__"):  # Chart, ChartAnalysis, ...
+        return sum(value_nbytes(v) for v in vars(value).values())
+    return 0
+
+
+class Memo:
+    """Bounded LRU memo for one pipeline stage, with hit/miss counters.
+
+    ``maxsize`` caps the entry count. ``max_bytes``, if set, also caps the
+    estimated memory of the entries (see ``value_nbytes``); a value bigger
+    than the whole budget is returned but not kept.
+    """
+
+    def __init__(self, name: str, maxsize: int = 32, max_bytes: int = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()  # key -> (value, nbytes)
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped = 0
+
+    def get(self, key, compute):
+        """Return the memoized value for ``key``, calling ``compute()`` on a miss."""
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key][0]
+            self.misses += 1
+        value = compute()
+        size = value_nbytes(value) if self.max_bytes is not None else 0
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[1]
+            if self.max_bytes is not None and size > self.max_bytes:
+                self.skipped += 1
+                return value
+            self._items[key] = (value, size)
+            self._nbytes += size
+            while len(self._items) > self.maxsize or (self.max_bytes is not None and self._nbytes > self.max_bytes):
+                _key, (_value, evicted) = self._items.popitem(last=False)
+                self._nbytes -= evicted
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._nbytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {"hits": self.hits, "misses": self.misses, "items": len(self._items)}
+            if self.max_bytes is not None:
+                stats.update(bytes=self._nbytes, evictions=self.evictions, skipped=self.skipped)
+            return stats
+
+
+class ChartPipeline:
+    """decode -> resize -> quantize -> export, memoized per stage.
+
+    Every stage is bounded by bytes as well as entries. Decoded sources
+    are large, so only a few are kept, and one bigger than the decode
+    budget is not kept at all; resized images are chart-sized and cheap to
+    keep. The quantize stage is the shared content-addressed ChartCache.
+    """
+
+    def __init__(self, cache: "ChartCache" = None):
+        mb = 1024 * 1024
+        self.decode = Memo("decode", maxsize=4, max_bytes=DECODE_MB * mb)
+        self.resize = Memo("resize", maxsize=64, max_bytes=RESIZE_MB * mb)
+        self.cleanup = Memo("cleanup", maxsize=64, max_bytes=CLEANUP_MB * mb)
+        self.export = Memo("export", maxsize=64, max_bytes=EXPORT_MB * mb)
+        # Display previews are derived here on demand rather than kept per session
+        self.preview = Memo("preview", maxsize=64, max_bytes=PREVIEW_MB * mb)
+        self.cache = cache
+
+    @property
+    def quantize(self) -> "ChartCache":
+        from crochet.cache import get_default_cache
+        return self.cache or get_default_cache()
+
+    def resized(self, data: bytes, digest: str, width_sts: int, large: bool = False) -> tuple:
+        """Return ``(img_small, source_info)``, decoding only if this width is new."""
+        from crochet.engine import decode_image, prepare_image
+
+        def compute():
+            if large:  # large mode decodes at reduced scale itself
+                return prepare_image(data, width_sts, large=True)
+            image = self.decode.get(digest, lambda: decode_image(data))
+            return prepare_image(data, width_sts, image=image)
+        return self.resize.get((digest, width_sts, large), compute)
+
+    def convert(self, data: bytes, width_sts: int, num_colors: int, large: bool = False,
+                quantizer: str = "median_cut", dither: str = "none") -> tuple:
+        """Return ``(key, chart)`` for ``data``, recomputing only the stages that changed."""
+        from crochet.cache import chart_key, image_digest
+        from crochet.engine import quantize_chart
+
+        digest = image_digest(data)
+        key = chart_key(digest, width_sts=width_sts, num_colors=num_colors, large=large, quantizer=quantizer,
+                        dither=dither)
+        chart = self.quantize.get(key)
+        if chart is None:
+            img_small, info = self.resized(data, digest, width_sts, large)
+            chart = quantize_chart(img_small, num_colors, quantizer,
+                                   {**info, "width_sts": width_sts, "large": large, "source_sha256": digest}, dither)
+            self.quantize.put(key, chart)
+        return key, chart
+
+    def lookup(self, key: str):
+        """Return the converted chart stored under ``key`` in the quantize stage, or None."""
+        return self.quantize.get(key)
+
+    def cleaned(self, key: str, chart: "Chart", merge_delta: float = 0.0, min_area: int = 0,
+                min_run: int = 0) -> tuple:
+        """Return ``(key, chart)`` after the cleanup stage; unchanged when every option is off.
+
+        The returned key extends ``key`` with the cleanup settings, so the
+        export stage memoizes cleaned charts separately.
+        """
+        if not (merge_delta > 0 or min_area > 1 or min_run > 1):
+            return key, chart
+        from crochet.cleanup import cleanup_chart
+
+        clean_key = f"{key}:clean:{merge_delta:g}:{min_area}:{min_run}"
+        return clean_key, self.cleanup.get(clean_key, lambda: cleanup_chart(chart, merge_delta, min_area, min_run))
+
+    def csv(self, key: str, chart: "Chart") -> str:
+        """Return the memoized CSV export for the chart stored under ``key``."""
+        from crochet.export import chart_csv
+        return self.export.get((key, "csv"), lambda: chart_csv(chart.grid, len(chart.palette)))
+
+    def png(self, key: str, chart: "Chart") -> bytes:
+        """Return the memoized PNG export for the chart stored under ``key``."""
+        from crochet.export import chart_png_bytes
+        return self.export.get((key, "png"), lambda: chart_png_bytes(chart))
+
+    def chart_file(self, key: str, chart: "Chart") -> bytes:
+        """Return the memoized ``.crochet`` file for the chart stored under ``key``."""
+        from crochet.chartfile import dumps
+        return self.export.get((key, "crochet"), lambda: dumps(chart))
+
+    def preview_png(self, key: str, chart: "Chart", size: int = 800, symbols: bool = False) -> bytes:
+        """Return the memoized display preview (long edge about ``size`` px) for the chart under ``key``."""
+        from crochet.render import fit_cell, render_png
+        return self.preview.get((key, size, symbols),
+                                lambda: render_png(chart, fit_cell(chart, size), symbols=symbols))
+
+    def printable_png(self, key: str, chart: "Chart", symbols: bool = False) -> bytes:
+        """Return the memoized printable chart (about 4000 px) for the chart under ``key``."""
+        from crochet.render import print_cell, render_png
+        return self.export.get((key, "print", symbols),
+                               lambda: render_png(chart, print_cell(chart), symbols=symbols))
+
+    def analysis(self, key: str, chart: "Chart", gauge: Gauge = None, style: str = "Tapestry"):
+        """Return the memoized yarn and color-change analysis for the chart under ``key``."""
+        from crochet.analysis import analyze_chart
+        return self.export.get((key, "analysis", gauge, style), lambda: analyze_chart(chart, gauge, style))
+
+    def stats(self) -> dict:
+        return {
+            "decode": self.decode.stats(),
+            "resize": self.resize.stats(),
+            "quantize": self.quantize.stats(),
+            "cleanup": self.cleanup.stats(),
+            "export": self.export.stats(),
+            "preview": self.preview.stats(),
+        }
+
+
+class PatternPipeline:
+    """parameters -> metrics -> model -> text -> figures, memoized per stage."""
+
+    def __init__(self, catalogue: "Catalogue" = None):
+        self.catalogue = catalogue
+        self.metrics = Memo("metrics", maxsize=256)
+        self.models = Memo("model", maxsize=256)
+        self.text = Memo("text", maxsize=256)
+        # Rendered PNG bytes (a few KB each), not live Matplotlib figures
+        self.figures = Memo("figures", maxsize=32)
+
+    def pattern_metrics(self, size: float, neck: float, colors: int) -> dict:
+        return self.metrics.get((size, neck, colors), lambda: pattern_metrics(size, neck, colors))
+
+    def model(self, shape: str, stitch_key: str, stitch_info: dict, size: float, neck: float,
+              colors: int, measurement_system: str, gauge: Gauge = None) -> PatternModel:
+        """Return the PatternModel, reusing metrics when only non-numeric inputs change."""
+        key = (shape, stitch_key, tuple(sorted(stitch_info.items())), size, neck, colors, measurement_system, gauge)
+
+        def compute():
+            metrics = self.pattern_metrics(size, neck, colors)
+            return build_pattern(shape, stitch_key, stitch_info, size, neck, colors, measurement_system, metrics,
+                                 gauge=gauge)
+        return self.models.get(key, compute)
+
+    def render(self, model: PatternModel, fmt: str = "markdown") -> str:
+        """Return ``model`` rendered as "markdown", "text" or "html"."""
+        return self.text.get((model, fmt), lambda: self.catalogued(model, fmt) or render_pattern(model, fmt))
+
+    def catalogued(self, model: PatternModel, fmt: str):
+        """Return the precomputed output for ``model`` from the catalogue, or None."""
+        return self.catalogue.pattern(model, fmt) if self.catalogue is not None else None
+
+    def pdf(self, model: PatternModel, page_size: str = "A4") -> bytes:
+        """Return the pattern as a PDF (cover + written pattern)."""
+        from crochet.catalogue import PDF_PAGE_SIZE
+
+        def compute():
+            data = self.catalogued(model, "pdf") if page_size == PDF_PAGE_SIZE else None
+            if data is None:
+                from crochet.pdf import PAGE_SIZES, pdf_bytes
+                text = self.render(model, "text")
+                data = pdf_bytes(pattern_text=text, title=text.splitlines()[0], page_size=PAGE_SIZES[page_size])
+            return data
+        return self.text.get((model, "pdf", page_size), compute)
+
+    def markdown(self, shape: str, stitch_key: str, stitch_info: dict, size: float, neck: float,
+                 colors: int, measurement_system: str) -> str:
+        """Return the pattern Markdown for the generator inputs."""
+        return self.render(self.model(shape, stitch_key, stitch_info, size, neck, colors, measurement_system))
+
+    def shape_png(self, shape: str) -> bytes:
+        """Return the cached PNG of the shape outline preview."""
+        def compute():
+            png = self.catalogued_preview("shape", shape)
+            if png is None:
+                from crochet.figures import shape_outline_png
+                png = shape_outline_png(shape)
+            return png
+        return self.figures.get(("shape", shape), compute)
+
+    def stitch_png(self, stitch_name: str) -> bytes:
+        """Return the cached PNG of the stitch texture preview."""
+        def compute():
+            png = self.catalogued_preview("stitch", stitch_name)
+            if png is None:
+                from crochet.figures import stitch_texture_png
+                png = stitch_texture_png(stitch_name)
+            return png
+        return self.figures.get(("stitch", stitch_name), compute)
+
+    def catalogued_preview(self, kind: str, name: str):
+        """Return a precomputed preview PNG from the catalogue, or None."""
+        return self.catalogue.preview(kind, name) if self.catalogue is not None else None
+
+    def previews(self, shape: str, stitch_name: str) -> tuple:
+        """Return ``(shape_png, stitch_png)`` for a (shape, stitch) pair."""
+        return self.shape_png(shape), self.stitch_png(stitch_name)
+
+    def stats(self) -> dict:
+        return {
+            "metrics": self.metrics.stats(),
+            "model": self.models.stats(),
+            "text": self.text.stats(),
+            "figures": self.figures.stats(),
+            "catalogue": self.catalogue.stats() if self.catalogue is not None else None,
+        }
+
+
+_lock = threading.Lock()
+_chart_pipeline = None
+_pattern_pipeline = None
+
+
+def get_chart_pipeline() -> ChartPipeline:
+    """Return the process-wide chart pipeline."""
+    global _chart_pipeline
+    with _lock:
+        if _chart_pipeline is None:
+            _chart_pipeline = ChartPipeline()
+        return _chart_pipeline
+
+
+def get_pattern_pipeline() -> PatternPipeline:
+    """Return the process-wide pattern pipeline."""
+    global _pattern_pipeline
+    with _lock:
+        if _pattern_pipeline is None:
+            from crochet.catalogue import get_catalogue
+            _pattern_pipeline = PatternPipeline(get_catalogue())
+        return _pattern_pipeline
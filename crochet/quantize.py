@@ -0,0 +1,251 @@
+"""Color quantization backends for the chart pipeline.
+
+Every backend takes the chart-sized PIL image and a color budget and
+returns ``(grid, palette, meta)``: a uint8 index grid, a list of RGB
+tuples and backend-specific metadata.
+
+- ``median_cut``: Pillow's built-in quantizer (the original behaviour).
+- ``kmeans``: NumPy mini-batch k-means in CIE Lab, so clusters follow
+  perceived rather than raw RGB differences.
+- ``yarn:<palette>``: nearest match against a fixed yarn palette via a
+  precomputed 32×32×32 RGB lookup table - one array index per stitch.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+# Modes Pillow can quantize directly; everything else goes through RGB.
+QUANTIZABLE_MODES = ("L", "RGB", "RGBA")
+
+# Bits kept per channel in the yarn lookup table (32 levels -> 32³ entries).
+LUT_BITS = 5
+
+# Solid shades commonly stocked in worsted-weight acrylic ranges.
+YARN_PALETTES = {
+    "Worsted Basics": {
+        "White": "#f4f4ef",
+        "Cream": "#efe6cf",
+        "Light Grey": "#b9b8b5",
+        "Charcoal": "#4a4a4c",
+        "Black": "#1c1c1e",
+        "Red": "#b3202a",
+        "Burgundy": "#6b1e2b",
+        "Orange": "#e0662a",
+        "Gold": "#e3a72f",
+        "Yellow": "#f2d64b",
+        "Lime": "#9cc24a",
+        "Kelly Green": "#2f8a3e",
+        "Forest": "#24492f",
+        "Teal": "#1f7a7a",
+        "Sky Blue": "#7fb4de",
+        "Royal Blue": "#2a4fa0",
+        "Navy": "#1d2747",
+        "Lavender": "#b5a2d0",
+        "Purple": "#5e3a82",
+        "Pink": "#f0a3bd",
+        "Hot Pink": "#d83c7d",
+        "Tan": "#c9a27a",
+        "Brown": "#6e4a2f",
+        "Dark Brown": "#3c2a1e",
+    },
+    "Cotton Pastels": {
+        "Bright White": "#fbfbf8",
+        "Ecru": "#ece1c8",
+        "Blush": "#f3c7c4",
+        "Peach": "#f6c39c",
+        "Butter": "#f5e3a1",
+        "Mint": "#bfe3cf",
+        "Sage": "#9fb596",
+        "Duck Egg": "#b7d6d8",
+        "Baby Blue": "#b6cde9",
+        "Lilac": "#cdbce0",
+        "Dove Grey": "#c9c7c4",
+        "Stone": "#a39a8c",
+    },
+}
+
+
+def hex_to_rgb(value: str) -> tuple:
+    """Return an (r, g, b) tuple for a "#rrggbb" string."""
+    value = value.lstrip("#")
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Convert an (..., 3) uint8 sRGB array to float32 CIE Lab (D65)."""
+    c = np.asarray(rgb, dtype=np.float32) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ np.array([[0.4124, 0.2126, 0.0193],
+                        [0.3576, 0.7152, 0.1192],
+                        [0.1805, 0.0722, 0.9505]], dtype=np.float32)
+    xyz /= np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16.0 / 116.0)
+    lab = np.empty_like(f)
+    lab[..., 0] = 116.0 * f[..., 1] - 16.0
+    lab[..., 1] = 500.0 * (f[..., 0] - f[..., 1])
+    lab[..., 2] = 200.0 * (f[..., 1] - f[..., 2])
+    return lab
+
+
+def nearest_center(points: np.ndarray, centers: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    """Return the index of the nearest center for every point (squared Euclidean)."""
+    out = np.empty(len(points), dtype=np.intp)
+    c_sq = (centers ** 2).sum(axis=1)
+    for i in range(0, len(points), chunk):
+        p = points[i:i + chunk]
+        out[i:i + chunk] = np.argmin(c_sq - 2.0 * (p @ centers.T), axis=1)
+    return out
+
+
+def cluster_sums(labels: np.ndarray, values: np.ndarray, k: int, weights: np.ndarray = None) -> np.ndarray:
+    """Return the (optionally weighted) per-cluster sum of ``values`` rows."""
+    w = np.ones(len(labels)) if weights is None else weights
+    return np.stack([np.bincount(labels, weights=values[:, c] * w, minlength=k)
+                     for c in range(values.shape[1])], axis=1)
+
+
+def compact(labels: np.ndarray, colors: np.ndarray, weights: np.ndarray, inverse: np.ndarray, shape: tuple) -> tuple:
+    """Drop unused clusters and return (grid, palette) with mean RGB per cluster.
+
+    ``labels`` and ``weights`` are per unique color; ``inverse`` maps each
+    pixel to its unique color.
+    """
+    used, remap = np.unique(labels, return_inverse=True)
+    counts = np.bincount(remap, weights=weights, minlength=len(used))[:, None]
+    sums = cluster_sums(remap, colors.astype(np.float64), len(used), weights)
+    palette = [tuple(int(v) for v in row) for row in np.rint(sums / counts).astype(int)]
+    return remap[inverse].reshape(shape).astype(np.uint8), palette
+
+
+def unique_colors(rgb: np.ndarray) -> tuple:
+    """Return (colors, inverse, counts) for an (n, 3) uint8 array via packed 24-bit codes."""
+    codes = (rgb[:, 0].astype(np.uint32) << 16) | (rgb[:, 1].astype(np.uint32) << 8) | rgb[:, 2]
+    uniq, inverse, counts = np.unique(codes, return_inverse=True, return_counts=True)
+    colors = np.stack([(uniq >> 16) & 0xFF, (uniq >> 8) & 0xFF, uniq & 0xFF], axis=1).astype(np.uint8)
+    return colors, inverse.ravel(), counts.astype(np.float64)
+
+
+def to_rgb_array(img: Image.Image) -> np.ndarray:
+    """Return the image as an (h, w, 3) uint8 RGB array."""
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return np.asarray(img)
+
+
+# --- BACKENDS ---
+def median_cut(img: Image.Image, num_colors: int) -> tuple:
+    """Pillow's default quantizer (median cut, or fast octree for RGBA)."""
+    if img.mode not in QUANTIZABLE_MODES:
+        img = img.convert("RGB")
+    img_quantized = img.quantize(colors=num_colors)
+    grid = np.asarray(img_quantized, dtype=np.uint8)
+    flat = img_quantized.getpalette() or []
+    n = min(len(flat) // 3, num_colors, 256)
+    palette = [tuple(flat[i * 3:i * 3 + 3]) for i in range(n)]
+    return grid, palette, {}
+
+
+def kmeans(img: Image.Image, num_colors: int, iterations: int = 40, batch_size: int = 2048, seed: int = 0) -> tuple:
+    """Mini-batch k-means in Lab space (Sculley 2010), seeded for repeatability."""
+    rgb_img = to_rgb_array(img)
+    colors, inverse, weights = unique_colors(rgb_img.reshape(-1, 3))
+    lab = rgb_to_lab(colors).astype(np.float64)
+    k = min(num_colors, len(colors))
+    rng = np.random.default_rng(seed)
+
+    # k-means++ seeding over the unique colors, weighted by frequency
+    centers = np.empty((k, 3))
+    centers[0] = lab[rng.choice(len(lab), p=weights / weights.sum())]
+    dist = ((lab - centers[0]) ** 2).sum(axis=1)
+    for i in range(1, k):
+        p = dist * weights
+        total = p.sum()
+        idx = rng.choice(len(lab), p=p / total) if total > 0 else rng.integers(len(lab))
+        centers[i] = lab[idx]
+        dist = np.minimum(dist, ((lab - centers[i]) ** 2).sum(axis=1))
+
+    if len(colors) > k:
+        seen = np.zeros(k)
+        p = weights / weights.sum()
+        for _ in range(iterations):
+            batch = lab[rng.choice(len(lab), size=batch_size, p=p)]
+            nearest = nearest_center(batch, centers)
+            counts = np.bincount(nearest, minlength=k)
+            sums = cluster_sums(nearest, batch, k)
+            seen += counts
+            moved = counts > 0
+            centers[moved] += (sums[moved] - counts[moved, None] * centers[moved]) / seen[moved, None]
+
+    labels = nearest_center(lab, centers)
+    grid, palette = compact(labels, colors, weights, inverse, rgb_img.shape[:2])
+    return grid, palette, {}
+
+
+@lru_cache(maxsize=32)
+def yarn_lut(palette_rgb: tuple) -> np.ndarray:
+    """Return the 32³ RGB -> palette index lookup table for ``palette_rgb``.
+
+    Each LUT cell is matched, in Lab, from the RGB value at its center.
+    """
+    levels = 1 << LUT_BITS
+    step = 256 // levels
+    axis = np.arange(levels, dtype=np.uint8) * step + step // 2
+    cells = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1).reshape(-1, 3)
+    lut = nearest_center(rgb_to_lab(cells).astype(np.float64), rgb_to_lab(np.array(palette_rgb, dtype=np.uint8)).astype(np.float64))
+    lut = lut.astype(np.uint8)
+    lut.flags.writeable = False  # shared by every caller through lru_cache
+    return lut
+
+
+def lut_index(rgb: np.ndarray) -> np.ndarray:
+    """Return the flat lookup-table cell for every RGB pixel."""
+    shift = 8 - LUT_BITS
+    q = (rgb >> shift).astype(np.uint16)
+    return (q[..., 0] << (2 * LUT_BITS)) | (q[..., 1] << LUT_BITS) | q[..., 2]
+
+
+def yarn_palette(img: Image.Image, num_colors: int, palette_name: str) -> tuple:
+    """Map every stitch to the nearest shade of a fixed yarn palette.
+
+    Stitches are mapped against the full palette first; if more than
+    ``num_colors`` shades are used, only the most used ones are kept and
+    the chart is mapped again against that subset.
+    """
+    if palette_name not in YARN_PALETTES:
+        raise ValueError(f"unknown yarn palette {palette_name!r}")
+    names = list(YARN_PALETTES[palette_name])
+    shades = [hex_to_rgb(YARN_PALETTES[palette_name][n]) for n in names]
+
+    cells = lut_index(to_rgb_array(img))
+    labels = yarn_lut(tuple(shades))[cells]
+    counts = np.bincount(labels.ravel(), minlength=len(shades))
+    keep = np.flatnonzero(counts)
+    if len(keep) > num_colors:
+        keep = np.sort(np.argsort(counts, kind="stable")[::-1][:num_colors])
+        labels = keep[yarn_lut(tuple(shades[i] for i in keep))[cells]]
+    used, grid = np.unique(labels, return_inverse=True)
+    palette = [shades[i] for i in used]
+    meta = {"yarn_palette": palette_name, "color_names": [names[i] for i in used]}
+    return grid.reshape(labels.shape).astype(np.uint8), palette, meta
+
+
+QUANTIZERS = {
+    "median_cut": median_cut,
+    "kmeans": kmeans,
+}
+
+
+def quantizer_names() -> list:
+    """Return every quantizer name accepted by ``quantize``."""
+    return list(QUANTIZERS) + [f"yarn:{name}" for name in YARN_PALETTES]
+
+
+def quantize(img: Image.Image, num_colors: int, method: str = "median_cut") -> tuple:
+    """Quantize ``img`` with the named backend; returns (grid, palette, meta)."""
+    if method.startswith("yarn:"):
+        return yarn_palette(img, num_colors, method[len("yarn:"):])
+    if method not in QUANTIZERS:
+        raise ValueError(f"unknown quantizer {method!r}; choose from {', '.join(quantizer_names())}")
+    return QUANTIZERS[method](img, num_colors)
@@ -0,0 +1,182 @@
+"""Per-session chart storage under a memory budget.
+
+Streamlit keeps ``st.session_state`` alive for as long as a browser tab
+stays connected, and for a while after it goes away, so anything stored
+there (decoded images, grids, ZIP archives) grows with the number of
+sessions. The app instead keeps a small handle in session state and puts
+the artifacts here:
+
+    store = get_session_store()
+    store.put(session_id, "source", key, chart)
+    key, chart = store.get(session_id, "source") or (None, None)
+
+Only compact artifacts are stored - a chart is its uint8 index grid,
+palette and metadata - and anything derived from them (previews, PNG and
+CSV exports) comes from the shared pipeline caches instead.
+
+Three limits apply:
+
+* a per-session budget: over it, the session's least recently stored
+  slots are dropped (the newest slot is always kept);
+* a global budget: over it, whole sessions are dropped, least recently
+  used first;
+* a TTL: sessions not touched for ``ttl`` seconds are dropped.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_BUDGET_MB = 16
+TOTAL_BUDGET_MB = 512
+SESSION_TTL_S = 30 * 60
+
+# Rough allowance for the palette, meta dict and bookkeeping of one slot.
+SLOT_OVERHEAD = 4096
+
+
+def artifact_nbytes(value) -> int:
+    """Estimate the memory held by a stored artifact."""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value) + SLOT_OVERHEAD
+    grid = getattr(value, "grid", None)
+    if grid is not None:
+        return int(grid.nbytes) + SLOT_OVERHEAD
+    return SLOT_OVERHEAD
+
+
+class _Session:
+    __slots__ = ("slots", "nbytes", "last_used")
+
+    def __init__(self):
+        self.slots = OrderedDict()  # slot -> (key, value, nbytes), oldest first
+        self.nbytes = 0
+        self.last_used = time.monotonic()
+
+
+class SessionStore:
+    """Thread-safe ``session -> slot -> (key, value)`` store with byte budgets and a TTL."""
+
+    def __init__(self, session_bytes: int = SESSION_BUDGET_MB * 1024 * 1024,
+                 total_bytes: int = TOTAL_BUDGET_MB * 1024 * 1024, ttl: float = SESSION_TTL_S):
+        self.session_bytes = session_bytes
+        self.total_bytes = total_bytes
+        self.ttl = ttl
+        self._sessions = OrderedDict()  # session id -> _Session, least recently used first
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def put(self, session_id: str, slot: str, key, value):
+        """Store ``(key, value)`` in ``slot`` of ``session_id``, evicting to stay in budget."""
+        size = artifact_nbytes(value)
+        with self._lock:
+            self._expire()
+            session = self._touch(session_id, create=True)
+            self._drop_slot(session, slot)
+            session.slots[slot] = (key, value, size)
+            session.nbytes += size
+            self.nbytes += size
+            while session.nbytes > self.session_bytes and len(session.slots) > 1:
+                self._drop_slot(session, next(iter(session.slots)))
+                self.evictions += 1
+            for other in list(self._sessions):
+                if self.nbytes <= self.total_bytes:
+                    break
+                if other != session_id:
+                    self._drop_session(other)
+                    self.evictions += 1
+
+    def get(self, session_id: str, slot: str):
+        """Return ``(key, value)`` stored in ``slot``, or None if absent or evicted."""
+        with self._lock:
+            self._expire()
+            session = self._touch(session_id)
+            if session is None or slot not in session.slots:
+                return None
+            key, value, _size = session.slots[slot]
+            return key, value
+
+    def key(self, session_id: str, slot: str):
+        """Return only the key stored in ``slot``, or None."""
+        entry = self.get(session_id, slot)
+        return entry[0] if entry else None
+
+    def discard(self, session_id: str, slot: str = None):
+        """Drop one slot of a session, or the whole session when ``slot`` is None."""
+        with self._lock:
+            if slot is None:
+                self._drop_session(session_id)
+            elif session_id in self._sessions:
+                self._drop_slot(self._sessions[session_id], slot)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self.nbytes,
+                "budget_bytes": self.total_bytes,
+                "session_budget_bytes": self.session_bytes,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self.nbytes = 0
+
+    # --- internals (lock held) ---
+    def _touch(self, session_id, create=False):
+        session = self._sessions.get(session_id)
+        if session is None:
+            if not create:
+                return None
+            session = self._sessions[session_id] = _Session()
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used >= cutoff:
+                break
+            self._drop_session(session_id)
+            self.expired += 1
+
+    def _drop_slot(self, session, slot):
+        entry = session.slots.pop(slot, None)
+        if entry is not None:
+            session.nbytes -= entry[2]
+            self.nbytes -= entry[2]
+
+    def _drop_session(self, session_id):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self.nbytes -= session.nbytes
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide session store, configured from the environment.
+
+    ``CROCHET_SESSION_MB`` and ``CROCHET_SESSIONS_TOTAL_MB`` set the
+    per-session and global budgets; ``CROCHET_SESSION_TTL_S`` the idle
+    time after which a session's charts are dropped.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore(
+                session_bytes=int(os.environ.get("CROCHET_SESSION_MB", SESSION_BUDGET_MB)) * 1024 * 1024,
+                total_bytes=int(os.environ.get("CROCHET_SESSIONS_TOTAL_MB", TOTAL_BUDGET_MB)) * 1024 * 1024,
+                ttl=float(os.environ.get("CROCHET_SESSION_TTL_S", SESSION_TTL_S)),
+            )
+        return _store
@@ -0,0 +1,193 @@
+"""Stitch library and preset patterns shared by the UI and the API.
+
+The library lives in a data file rather than in code: ``data/stitches.json``
+by default, or any JSON or SQLite file named by ``CROCHET_STITCH_LIBRARY``.
+A JSON file is ``{"stitches": [{"name": ..., "desc": ..., ...}, ...]}``;
+an SQLite file has a ``stitches`` table with the same columns.
+
+On load, ``StitchLibrary`` builds inverted indexes from difficulty,
+drape, UK/US abbreviation tokens and name/description words to the
+stitches that have them, so filtering and search are set intersections
+over posting lists instead of a scan of every record::
+
+    library = get_library()
+    names = library.search("shell", difficulty=["Beginner"], abbreviation="dc", terminology="US")
+    page = library.page(names, page=1, per_page=10)
+
+``STITCH_DATABASE`` (``{name: info}``) is still available and loads the
+library on first access.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from bisect import bisect_left
+
+FIELDS = ("desc", "abbr_uk", "abbr_us", "video", "tutorial_name", "difficulty", "drape")
+DIFFICULTIES = ["Beginner", "Intermediate", "Advanced"]
+DRAPES = ["Airy", "Medium", "Structured", "Dimensional"]
+DEFAULT_LIBRARY = os.path.join(os.path.dirname(__file__), "data", "stitches.json")
+
+SHAPES = ["Square", "Rectangle", "Circle", "Triangle"]
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokens(text: str) -> list:
+    """Lower-case alphanumeric words of ``text``."""
+    return _TOKEN.findall(text.lower())
+
+
+def load_records(path: str) -> list:
+    """Read ``[{"name": ..., <FIELDS>}, ...]`` from a JSON or SQLite library file."""
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(f"SELECT name, {', '.join(FIELDS)} FROM stitches ORDER BY rowid").fetchall()
+        return [dict(row) for row in rows]
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["stitches"] if isinstance(data, dict) else data
+
+
+class StitchLibrary:
+    """Stitch records plus inverted indexes for filtering, search and paging."""
+
+    def __init__(self, records: list):
+        self.stitches = {}
+        for record in records:
+            missing = [k for k in ("name",) + FIELDS if not record.get(k)]
+            if missing:
+                raise ValueError(f"stitch {record.get('name', '?')!r} is missing {', '.join(missing)}")
+            self.stitches[record["name"]] = {k: record[k] for k in FIELDS}
+        self.names = list(self.stitches)
+        self.by_difficulty = {}
+        self.by_drape = {}
+        self.by_abbreviation = {"UK": {}, "US": {}}
+        self.by_word = {}
+        for i, (name, info) in enumerate(self.stitches.items()):
+            self.by_difficulty.setdefault(info["difficulty"], set()).add(i)
+            self.by_drape.setdefault(info["drape"], set()).add(i)
+            for terminology, field in (("UK", "abbr_uk"), ("US", "abbr_us")):
+                for token in tokens(info[field]):
+                    self.by_abbreviation[terminology].setdefault(token, set()).add(i)
+            for token in tokens(f"{name} {info['desc']} {info['tutorial_name']}"):
+                self.by_word.setdefault(token, set()).add(i)
+        self._words = sorted(self.by_word)
+
+    @classmethod
+    def load(cls, path: str = None) -> "StitchLibrary":
+        return cls(load_records(path or DEFAULT_LIBRARY))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name) -> bool:
+        return name in self.stitches
+
+    def __getitem__(self, name: str) -> dict:
+        return self.stitches[name]
+
+    def facets(self) -> dict:
+        """Return ``{"difficulty": {value: count}, "drape": {value: count}}``."""
+        return {
+            "difficulty": {k: len(v) for k, v in self.by_difficulty.items()},
+            "drape": {k: len(v) for k, v in self.by_drape.items()},
+        }
+
+    def _prefixed(self, prefix: str) -> set:
+        """Union of the postings of every indexed word starting with ``prefix``."""
+        ids = set()
+        i = bisect_left(self._words, prefix)
+        while i < len(self._words) and self._words[i].startswith(prefix):
+            ids |= self.by_word[self._words[i]]
+            i += 1
+        return ids
+
+    def search(self, query: str = "", difficulty: list = None, drape: list = None, abbreviation: str = "",
+               terminology: str = None) -> list:
+        """Return matching stitch names in library order.
+
+        Every word of ``query`` must prefix-match a word of the name,
+        description or tutorial, or exactly match an abbreviation token.
+        ``difficulty`` and ``drape`` keep stitches with any of the listed
+        values (None = no filter). ``abbreviation`` keeps stitches using
+        that abbreviation in ``terminology`` ("UK", "US" or None for either).
+        """
+        sets = []
+        if difficulty is not None:
+            sets.append(set().union(*(self.by_difficulty.get(d, ()) for d in difficulty)))
+        if drape is not None:
+            sets.append(set().union(*(self.by_drape.get(d, ()) for d in drape)))
+        terms = ("UK", "US") if terminology is None else (terminology,)
+        for token in tokens(abbreviation):
+            sets.append(set().union(*(self.by_abbreviation[t].get(token, ()) for t in terms)))
+        for token in tokens(query):
+            abbr = set().union(*(self.by_abbreviation[t].get(token, ()) for t in ("UK", "US")))
+            sets.append(self._prefixed(token) | abbr)
+        if not sets:
+            return list(self.names)
+        sets.sort(key=len)
+        ids = sets[0].intersection(*sets[1:])
+        return [self.names[i] for i in sorted(ids)]
+
+    @staticmethod
+    def page(names: list, page: int = 1, per_page: int = 10) -> list:
+        """Return the 1-based ``page`` of ``names``."""
+        start = (max(1, page) - 1) * per_page
+        return names[start:start + per_page]
+
+
+_library = None
+_library_lock = threading.Lock()
+
+
+def get_library() -> StitchLibrary:
+    """Return the process-wide stitch library (``CROCHET_STITCH_LIBRARY`` or the bundled file)."""
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = StitchLibrary.load(os.environ.get("CROCHET_STITCH_LIBRARY") or None)
+        return _library
+
+
+def __getattr__(name):
+    if name == "STITCH_DATABASE":
+        return get_library().stitches
+    raise AttributeError(f"module 'crochet.stitches' has no attribute {name!r}")
+
+
+# --- PRESET PATTERNS ---
+PRESETS = {
+    "Custom": {},
+    "Classic Shawl": {
+        "shape": "Square",
+        "size": 100,
+        "neck": 15,
+        "stitch": "Treble Mesh",
+        "description": "A flowing square shawl with neck opening."
+    },
+    "Baby Blanket": {
+        "shape": "Rectangle",
+        "size": 80,
+        "neck": 0,
+        "stitch": "Granite Stitch",
+        "description": "A cozy rectangular blanket for babies."
+    },
+    "Coaster": {
+        "shape": "Square",
+        "size": 10,
+        "neck": 0,
+        "stitch": "Double Crochet",
+        "description": "Quick little coaster in solid DC."
+    },
+    "Shawlette": {
+        "shape": "Triangle",
+        "size": 60,
+        "neck": 0,
+        "stitch": "Shell Stitch",
+        "description": "Small triangular shawl with shell edge."
+    }
+}
@@ -0,0 +1,144 @@
+"""Per-stage timing spans aggregated into histograms.
+
+Hot paths are wrapped in ``span("stage")`` (or decorated with
+``@timed("stage")``); each span adds its duration to that stage's
+histogram in the process-wide registry::
+
+    with span("decode"):
+        image = decode_image(data)
+
+    snapshot()          # {"decode": {"count": ..., "p50_ms": ..., "p95_ms": ..., ...}, ...}
+    prometheus_text()   # text exposition format for scraping
+
+Histograms use fixed buckets, so recording is a bisect and a few integer
+adds under a lock; percentiles in ``snapshot`` come from a bounded window
+of recent samples. Stages run in worker processes (batch jobs, API chart
+workers) are recorded in those processes' registries.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Bucket upper bounds in seconds (Prometheus convention); +Inf is implicit.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RECENT_SAMPLES = 512
+METRIC_NAME = "crochet_stage_duration_seconds"
+
+
+class Histogram:
+    """Bucketed durations for one stage plus a window of recent samples."""
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        """Return the ``q`` (0-100) percentile of the recent samples, in seconds."""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000.0,
+            "mean_ms": self.total / self.count * 1000.0 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000.0,
+            "p95_ms": self.percentile(95) * 1000.0,
+            "p99_ms": self.percentile(99) * 1000.0,
+            "max_ms": self.max * 1000.0,
+        }
+
+
+class Registry:
+    """Thread-safe map of stage name -> Histogram."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self) -> dict:
+        """Return ``{stage: summary}`` for every stage seen, sorted by name."""
+        with self._lock:
+            return {stage: self._histograms[stage].summary() for stage in sorted(self._histograms)}
+
+    def prometheus_text(self) -> str:
+        """Return every histogram in the Prometheus text exposition format."""
+        lines = [f"# HELP {METRIC_NAME} Time spent in each Crochet Architect stage.",
+                 f"# TYPE {METRIC_NAME} histogram"]
+        with self._lock:
+            for stage in sorted(self._histograms):
+                h = self._histograms[stage]
+                label = stage.replace("\\", "\\\\").replace('"', '\\"')
+                cumulative = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cumulative += n
+                    lines.append(f'{METRIC_NAME}_bucket{{stage="{label}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{label}",le="+Inf"}} {h.count}')
+                lines.append(f'{METRIC_NAME}_sum{{stage="{label}"}} {h.total:.6f}')
+                lines.append(f'{METRIC_NAME}_count{{stage="{label}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+_registry = Registry()
+
+
+def get_registry() -> Registry:
+    """Return the process-wide timing registry."""
+    return _registry
+
+
+@contextmanager
+def span(stage: str, registry: Registry = None):
+    """Time the enclosed block into ``stage``'s histogram (also when it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        (registry or _registry).observe(stage, time.perf_counter() - start)
+
+
+def timed(stage: str):
+    """Decorator form of ``span``."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def snapshot() -> dict:
+    return _registry.snapshot()
+
+
+def prometheus_text() -> str:
+    return _registry.prometheus_text()
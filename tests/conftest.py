@@ -0,0 +1,52 @@
+"""Shared fixtures: small synthetic images and charts, so the suite needs no sample files."""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from crochet.engine import Chart
+
+
+def synthetic_image(width: int = 240, height: int = 180, mode: str = "RGB") -> Image.Image:
+    """A gradient with a few flat shapes on it: smooth areas for dithering, edges for runs."""
+    y, x = np.mgrid[0:height, 0:width]
+    rgb = np.stack([x * 255 // max(1, width - 1), y * 255 // max(1, height - 1),
+                    (x + y) * 255 // max(1, width + height - 2)], axis=-1).astype(np.uint8)
+    rgb[height // 4:height // 2, width // 4:width // 2] = (200, 30, 40)
+    rgb[height // 2:, width // 2:width // 2 + width // 8] = (20, 20, 160)
+    image = Image.fromarray(rgb, "RGB")
+    return image.convert(mode) if mode != "RGB" else image
+
+
+def encode(image: Image.Image, fmt: str = "PNG") -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def image():
+    return synthetic_image()
+
+
+@pytest.fixture
+def png_bytes(image):
+    return encode(image, "PNG")
+
+
+@pytest.fixture
+def jpeg_bytes(image):
+    return encode(image, "JPEG")
+
+
+@pytest.fixture
+def chart():
+    """A 30×20 chart in 4 colors with stripes, a block and a few single-stitch specks."""
+    grid = np.zeros((20, 30), dtype=np.uint8)
+    grid[:, 10:20] = 1
+    grid[5:15, 3:8] = 2
+    grid[::4, 25] = 3
+    palette = [(250, 250, 250), (200, 30, 40), (20, 20, 160), (30, 120, 40)]
+    return Chart(grid=grid, palette=palette, meta={"width_sts": 30, "num_colors": 4})
@@ -0,0 +1,96 @@
+import csv
+import io
+
+import numpy as np
+import pytest
+
+from crochet.analysis import (ALLOWANCE, CHART_STYLES, YARN_CSV_HEADER, analyze_chart, carried_stitches,
+                              cell_meters, main, yarn_csv)
+from crochet.chartfile import save_chart
+from crochet.engine import Chart
+from crochet.export import row_runs
+from crochet.gauge import YARDS_PER_METER, default_gauge
+
+
+def naive_carried(grid, n_colors):
+    carried = np.zeros(n_colors, dtype=np.int64)
+    for row in grid:
+        for color in range(n_colors):
+            xs = np.flatnonzero(row == color)
+            if xs.size:
+                carried[color] += xs[-1] - xs[0] + 1 - xs.size
+    return carried
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_carried_stitches_match_loop(seed):
+    rng = np.random.default_rng(seed)
+    grid = rng.integers(0, 5, (11, 17), dtype=np.uint8)
+    grid[3] = 2
+    runs = row_runs(grid, 6)
+    assert carried_stitches(runs, 17).tolist() == naive_carried(grid, 6).tolist()
+
+
+def test_analysis_of_fixture(chart):
+    gauge = default_gauge("DK (3)")
+    analysis = analyze_chart(chart, gauge)
+    assert analysis.stitches.tolist() == np.bincount(chart.grid.ravel(), minlength=4).tolist()
+    assert analysis.carried.tolist() == naive_carried(chart.grid, 4).tolist()
+    stitch_m = 1.0 / gauge.stitches_per_cm / 100.0
+    expected = (analysis.stitches * cell_meters(gauge) + analysis.carried * stitch_m) * (1 + ALLOWANCE)
+    assert np.allclose(analysis.meters, expected)
+    assert np.allclose(analysis.yards, analysis.meters * YARDS_PER_METER)
+    # Rows crossing both the block and a speck use all four colors in seven runs
+    assert analysis.max_colors_per_row == 4 and analysis.max_changes_per_row == 6
+    assert analysis.total_changes == int(row_runs(chart.grid).yarn_changes.sum())
+
+
+def test_c2c_carries_nothing_and_uses_more_yarn(chart):
+    gauge = default_gauge("Worsted (4)")
+    tapestry, c2c = analyze_chart(chart, gauge), analyze_chart(chart, gauge, "C2C")
+    assert not c2c.carried.any() and tapestry.carried.any()
+    assert cell_meters(gauge, "C2C") > cell_meters(gauge, "Tapestry")
+    assert c2c.total_meters > tapestry.total_meters
+
+
+def test_style_and_gauge_defaults(chart):
+    with pytest.raises(ValueError, match="unknown chart style"):
+        analyze_chart(chart, style="Filet")
+    assert analyze_chart(chart).gauge.yarn_weight == "Worsted (4)"
+    assert set(CHART_STYLES) == {"Tapestry", "C2C"}
+
+
+def test_to_dict(chart):
+    data = analyze_chart(chart).to_dict()
+    assert data["style"] == "Tapestry" and data["yarn_weight"] == "Worsted (4)"
+    assert len(data["changes_per_row"]) == chart.height and sum(data["stitches"]) == chart.width * chart.height
+    assert data["total_meters"] == pytest.approx(sum(data["meters"]), abs=0.5)
+
+
+def test_yarn_csv_lists_used_colors(chart):
+    chart.meta["color_names"] = ["Snow", "Cherry"]
+    unused = Chart(grid=np.zeros((2, 3), dtype=np.uint8), palette=[(1, 2, 3), (4, 5, 6)], meta={})
+    rows = list(csv.reader(io.StringIO(yarn_csv([("a", chart), ("b", unused)]))))
+    assert rows[0] == YARN_CSV_HEADER
+    assert [row[:4] for row in rows[1:]] == [["a", "C1", "#fafafa", "Snow"], ["a", "C2", "#c81e28", "Cherry"],
+                                             ["a", "C3", "#1414a0", ""], ["a", "C4", "#1e7828", ""],
+                                             ["b", "C1", "#010203", ""]]
+    assert int(rows[1][4]) == int((chart.grid == 0).sum())
+
+
+def test_cli(chart, tmp_path, capsys):
+    folder = tmp_path / "charts"
+    (folder / "sub").mkdir(parents=True)
+    save_chart(chart, str(folder / "one.crochet"))
+    save_chart(chart, str(folder / "sub" / "two.crochet"))
+    (folder / "notes.txt").write_text("not a chart")
+    out = tmp_path / "yarn.csv"
+    assert main([str(folder), "-o", str(out), "--yarn-weight", "Bulky (5)", "--style", "C2C"]) == 0
+    assert "2 charts" in capsys.readouterr().err
+    rows = list(csv.reader(out.open(newline="", encoding="utf-8")))
+    assert {row[0] for row in rows[1:]} == {"one", "sub/two"} and len(rows) == 1 + 2 * 4
+
+    assert main([str(folder / "one.crochet")]) == 0
+    assert capsys.readouterr().out.splitlines()[1].startswith("one,C1,")
+    (tmp_path / "empty").mkdir()
+    assert main([str(tmp_path / "empty")]) == 1
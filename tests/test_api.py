@@ -0,0 +1,163 @@
+import http.client
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import encode, synthetic_image
+from crochet import api
+from crochet.api import ApiError, ApiServer, ChartWorkers, chart_params
+from crochet.chartfile import loads
+
+PASSWORD = "secret"
+
+
+@pytest.fixture
+def workers():
+    workers = ChartWorkers(max_workers=1, max_pending=1)
+    yield workers
+    workers.shutdown()
+
+
+@pytest.fixture
+def server(workers):
+    server = ApiServer(("127.0.0.1", 0), PASSWORD, workers)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, body=None, password=PASSWORD):
+    conn = http.client.HTTPConnection(*server.server_address[:2], timeout=30)
+    headers = {"Authorization": f"Bearer {password}"} if password else {}
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response.status, dict(response.getheaders()), data
+
+
+def unique_png(seed: int) -> bytes:
+    """A PNG no other test converts, so the shared chart cache cannot answer it."""
+    image = synthetic_image(64 + seed, 48)
+    image.putpixel((0, 0), (seed % 256, 7, 11))
+    return encode(image)
+
+
+def test_health_needs_no_password(server):
+    status, _headers, body = request(server, "GET", "/health", password=None)
+    assert status == 200 and json.loads(body)["capacity"] == 1
+
+
+def test_wrong_password_is_rejected(server):
+    status, headers, _body = request(server, "POST", "/pattern", b"{}", password="nope")
+    assert status == 401 and headers["WWW-Authenticate"].startswith("Bearer")
+
+
+def test_pattern(server):
+    body = json.dumps({"shape": "Circle", "size": 60, "colors": 3, "format": "text"}).encode()
+    status, _headers, data = request(server, "POST", "/pattern", body)
+    payload = json.loads(data)
+    assert status == 200 and payload["format"] == "text" and "Circle" in payload["text"]
+    assert payload["pattern"]["colors"] == 3
+
+
+@pytest.mark.parametrize("body", [b"not json", b"[1, 2]", b'{"size": 1}', b'{"shape": "Hexagon"}'])
+def test_pattern_bad_requests(server, body):
+    assert request(server, "POST", "/pattern", body)[0] == 400
+
+
+def test_chart_formats(server):
+    png = unique_png(1)
+    status, _headers, data = request(server, "POST", "/chart?width=20&colors=4", png)
+    payload = json.loads(data)
+    assert status == 200 and payload["width"] == 20 and len(payload["grid"]) == payload["height"]
+    assert payload["yarn"]["style"] == "Tapestry"
+    status, headers, data = request(server, "POST", "/chart?width=20&colors=4&format=crochet", png)
+    assert status == 200 and headers["Content-Type"] == api.MIME_TYPE
+    assert loads(data).grid.tolist() == payload["grid"]
+    status, _headers, data = request(server, "POST", "/chart?width=20&colors=4&format=csv", png)
+    assert status == 200 and data.startswith(b"Row,")
+
+
+def test_chart_rejects_bad_input(server):
+    assert request(server, "POST", "/chart?width=5", unique_png(2))[0] == 400
+    assert request(server, "POST", "/chart", b"not an image")[0] == 422
+    assert request(server, "POST", "/chart", b"")[0] == 400
+    assert request(server, "GET", "/nowhere")[0] == 404
+
+
+@pytest.mark.parametrize("length", ["abc", "-1", "1.5", "1_0", "+2"])
+@pytest.mark.parametrize("password", [PASSWORD, "nope"])
+def test_malformed_content_length_is_a_bad_request(server, length, password):
+    conn = http.client.HTTPConnection(*server.server_address[:2], timeout=30)
+    conn.putrequest("POST", "/pattern")
+    conn.putheader("Authorization", f"Bearer {password}")
+    conn.putheader("Content-Length", length)
+    conn.endheaders()
+    conn.send(b"{}")
+    response = conn.getresponse()
+    body = json.loads(response.read())
+    conn.close()
+    assert response.status == 400 and "Content-Length" in body["error"]
+    assert request(server, "GET", "/health", password=None)[0] == 200
+
+
+def test_chart_params_defaults():
+    assert chart_params({}) == {"width_sts": 30, "num_colors": 6, "large": False, "quantizer": "median_cut",
+                                "dither": "none"}
+    assert chart_params({"large": "1", "width": "700"})["width_sts"] == 700
+
+
+def test_full_queue_answers_503(server, workers):
+    workers._slots.acquire()  # the only slot is taken
+    try:
+        status, headers, data = request(server, "POST", "/chart", unique_png(3))
+    finally:
+        workers._slots.release()
+    assert status == 503 and headers["Retry-After"] == "1"
+    assert json.loads(data)["error"].startswith("conversion queue is full")
+    assert workers.stats()["rejected"] == 1
+
+
+def test_cached_charts_skip_the_queue(server, workers):
+    png = unique_png(4)
+    assert request(server, "POST", "/chart", png)[0] == 200
+    workers._slots.acquire()
+    try:
+        assert request(server, "POST", "/chart", png)[0] == 200
+    finally:
+        workers._slots.release()
+
+
+def test_timed_out_conversion_keeps_its_slot(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(api, "convert_image", lambda *args, **kwargs: release.wait(10) and None)
+    workers = ChartWorkers(max_workers=1, max_pending=1, timeout=0.05)
+    workers._pool.shutdown()
+    workers._pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        with pytest.raises(ApiError) as timeout:
+            workers.convert(unique_png(5), 20, 4)
+        assert timeout.value.status == 504
+        assert workers.stats()["in_flight"] == 1  # still running in its worker
+        with pytest.raises(ApiError) as rejected:
+            workers.convert(unique_png(6), 20, 4)
+        assert rejected.value.status == 503
+        release.set()
+        workers._pool.shutdown(wait=True)
+        assert workers.stats()["in_flight"] == 0
+        assert workers._slots.acquire(blocking=False)
+    finally:
+        release.set()
+        workers.shutdown()
+
+
+def test_metrics_exposes_request_spans(server):
+    request(server, "GET", "/health", password=None)
+    status, headers, body = request(server, "GET", "/metrics", password=None)
+    assert status == 200 and headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert 'crochet_stage_duration_seconds_count{stage="api/health"}' in body.decode()
@@ -0,0 +1,77 @@
+import io
+import zipfile
+
+import numpy as np
+
+from conftest import encode, synthetic_image
+from crochet.batch import BatchResult, archive_stem, convert_many, is_image_name, iter_sources, main, write_archive
+from crochet.chartfile import loads
+from crochet.engine import convert_image
+
+
+def make_sources(tmp_path):
+    (tmp_path / "photos" / "sub").mkdir(parents=True)
+    (tmp_path / "photos" / "a.png").write_bytes(encode(synthetic_image(60, 40)))
+    (tmp_path / "photos" / "sub" / "b.jpg").write_bytes(encode(synthetic_image(50, 50), "JPEG"))
+    (tmp_path / "photos" / "notes.txt").write_text("not an image")
+    (tmp_path / "photos" / ".hidden.png").write_bytes(b"")
+    with zipfile.ZipFile(tmp_path / "more.zip", "w") as zf:
+        zf.writestr("c.png", encode(synthetic_image(30, 30)))
+        zf.writestr("__MACOSX/._c.png", b"junk")
+        zf.writestr("broken.png", b"not really a png")
+    return [str(tmp_path / "photos"), str(tmp_path / "more.zip")]
+
+
+def test_image_names():
+    assert is_image_name("dir/Photo.JPG") and is_image_name("x.gif")
+    assert not is_image_name("notes.txt") and not is_image_name(".hidden.png")
+
+
+def test_iter_sources_walks_folders_and_zips(tmp_path):
+    names = [name for name, _data in iter_sources(make_sources(tmp_path))]
+    assert names == ["a.png", "sub/b.jpg", "c.png", "broken.png"]
+
+
+def test_convert_many_matches_single_conversions(tmp_path):
+    sources = list(iter_sources(make_sources(tmp_path)))
+    results = {r.name: r for r in convert_many(sources, 20, 4, max_workers=2)}
+    assert set(results) == {name for name, _ in sources}
+    assert not results["broken.png"].ok and "UnidentifiedImageError" in results["broken.png"].error
+    for name, data in sources:
+        if name != "broken.png":
+            assert np.array_equal(results[name].chart.grid, convert_image(data, 20, 4).grid)
+
+
+def test_convert_many_applies_color_settings(tmp_path):
+    from crochet.pipeline import ChartPipeline
+
+    sources = [("a.png", encode(synthetic_image(90, 60)))]
+    options = {"quantizer": "kmeans", "dither": "serpentine"}
+    result = next(convert_many(sources, 24, 5, max_workers=1, **options))
+    # As the app converts a single upload
+    _key, single = ChartPipeline().convert(sources[0][1], 24, 5, **options)
+    assert np.array_equal(result.chart.grid, single.grid) and result.chart.palette == single.palette
+    assert result.chart.meta["quantizer"] == "kmeans" and result.chart.meta["dither"] == "serpentine"
+
+
+def test_archive_stem_strips_extension_and_leading_slash():
+    assert archive_stem("/sub/b.jpg") == "sub/b"
+    assert archive_stem("dir\\c.png") == "dir/c"
+
+
+def test_write_archive_contents(chart):
+    buf = io.BytesIO()
+    summary = write_archive([BatchResult("x.png", chart=chart), BatchResult("bad.png", error="boom")], buf)
+    assert summary == {"converted": 1, "failed": 1, "errors": ["bad.png: boom"]}
+    with zipfile.ZipFile(buf) as zf:
+        assert sorted(zf.namelist()) == ["errors.txt", "x.crochet", "x.csv", "x.png", "yarn.csv"]
+        assert np.array_equal(loads(zf.read("x.crochet")).grid, chart.grid)
+        assert zf.read("yarn.csv").decode().splitlines()[0].startswith("Chart,Color")
+
+
+def test_cli_writes_archive(tmp_path, capsys):
+    out = tmp_path / "charts.zip"
+    assert main(make_sources(tmp_path) + ["-o", str(out), "--width", "16", "--colors", "3", "--workers", "1"]) == 0
+    assert "3 charts written" in capsys.readouterr().out
+    with zipfile.ZipFile(out) as zf:
+        assert "sub/b.png" in zf.namelist() and "errors.txt" in zf.namelist()
@@ -0,0 +1,62 @@
+import io
+import json
+
+import pytest
+from PIL import Image
+
+from crochet.bench import (MODES, QUICK_SIZES, Case, Result, build_cases, compare, main, measure, pattern_inputs,
+                           run_pattern, synthetic_grid, synthetic_image)
+
+
+def result(name, median_ms, rss_mb=10.0):
+    return Result(name, "g", {}, 3, {"min": median_ms, "median": median_ms, "max": median_ms}, 50.0, rss_mb, 1.0, "x")
+
+
+def test_cases_are_unique_and_cover_every_group():
+    paths = {(size, mode): f"{mode}-{size}" for size in QUICK_SIZES for mode in MODES}
+    cases = build_cases(QUICK_SIZES, paths)
+    names = [c.name for c in cases]
+    assert len(names) == len(set(names))
+    assert {c.group for c in cases} >= {"convert", "quantize", "dither", "export", "analysis", "cleanup", "render",
+                                        "pdf", "pattern", "preview"}
+    assert all(c.source in paths for c in cases if c.source)
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_synthetic_images_decode(mode):
+    img = Image.open(io.BytesIO(synthetic_image(64, mode)))
+    assert img.size == (64, 48)
+
+
+def test_synthetic_grid():
+    grid = synthetic_grid(40, 30, n_colors=5)
+    assert grid.shape == (30, 40) and int(grid.max()) < 5
+
+
+def test_measure_times_every_repeat():
+    case = Case("pattern/text", "pattern", lambda: pattern_inputs(False), lambda inputs: run_pattern(inputs, "text"),
+                1, "patterns/s")
+    raw = measure(case, 2)
+    assert len(raw["times"]) == 2 and all(t >= 0 for t in raw["times"])
+
+
+def test_compare_flags_slowdowns_and_memory_growth():
+    baseline = {"results": [{"name": "a", "wall_ms": {"median": 100.0}, "rss_delta_mb": 10.0},
+                            {"name": "b", "wall_ms": {"median": 1.0}, "rss_delta_mb": 1.0}]}
+    assert compare([result("a", 120.0), result("b", 1.0, rss_mb=1.0)], baseline, 0.25) == []
+    slow = compare([result("a", 130.0)], baseline, 0.25)
+    assert len(slow) == 1 and slow[0].startswith("a: median 100.0 -> 130.0 ms")
+    # Tiny absolute changes are noise, however large relatively
+    assert compare([result("b", 2.5, rss_mb=3.0)], baseline, 0.25) == []
+    assert compare([result("a", 100.0, rss_mb=20.0)], baseline, 0.25) == ["a: memory 10.0 -> 20.0 MB"]
+    assert compare([result("new", 999.0)], baseline, 0.25) == []
+
+
+def test_cli_writes_results_and_checks_baseline(tmp_path):
+    out = tmp_path / "bench.json"
+    args = ["--quick", "--filter", "pattern/markdown", "--repeats", "1", "-o", str(out)]
+    assert main(args) == 0
+    report = json.loads(out.read_text())
+    assert {r["name"] for r in report["results"]} == {"pattern/markdown", "pattern/markdown-gauge"}
+    assert report["environment"]["cpu_count"] >= 1
+    assert main(args + ["--baseline", str(out)]) == 0  # against itself: within tolerance
@@ -0,0 +1,112 @@
+import numpy as np
+
+from crochet.cache import ChartCache, cached_convert, chart_key, image_digest
+from crochet.engine import Chart
+from crochet.pipeline import ChartPipeline
+
+
+def make_chart(side: int, value: int = 0) -> Chart:
+    return Chart(grid=np.full((side, side), value, dtype=np.uint8), palette=[(0, 0, 0)])
+
+
+def test_key_fills_in_defaults():
+    digest = image_digest(b"abc")
+    assert chart_key(digest, width_sts=40, num_colors=5) == chart_key(
+        digest, width_sts=40, num_colors=5, large=False, quantizer="median_cut", dither="none")
+
+
+def test_key_depends_on_image_and_every_setting():
+    digest = image_digest(b"abc")
+    base = chart_key(digest, width_sts=40, num_colors=5)
+    assert base != chart_key(image_digest(b"abd"), width_sts=40, num_colors=5)
+    assert base != chart_key(digest, width_sts=41, num_colors=5)
+    assert base != chart_key(digest, width_sts=40, num_colors=6)
+    assert base != chart_key(digest, width_sts=40, num_colors=5, dither="bayer")
+    assert base != chart_key(digest, width_sts=40, num_colors=5, quantizer="kmeans")
+    assert base != chart_key(digest, width_sts=40, num_colors=5, large=True)
+
+
+def test_hit_miss_counters():
+    cache = ChartCache()
+    assert cache.get("k") is None
+    cache.put("k", make_chart(4))
+    assert cache.get("k") is not None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["items"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_put_freezes_grid():
+    cache = ChartCache()
+    chart = make_chart(4)
+    cache.put("k", chart)
+    assert not cache.get("k").grid.flags.writeable
+
+
+def test_lru_evicts_least_recently_used_by_count():
+    cache = ChartCache(max_items=2)
+    cache.put("a", make_chart(2))
+    cache.put("b", make_chart(2))
+    cache.get("a")  # "b" is now least recently used
+    cache.put("c", make_chart(2))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_evicts_by_bytes_but_keeps_newest():
+    cache = ChartCache(max_bytes=150)
+    cache.put("a", make_chart(10))  # 100 bytes
+    cache.put("b", make_chart(10))
+    assert cache.get("a") is None and cache.get("b") is not None
+    cache.put("big", make_chart(20))  # over budget alone, still kept
+    assert cache.get("big") is not None and cache.stats()["items"] == 1
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    chart = Chart(grid=np.arange(12, dtype=np.uint8).reshape(3, 4) % 3,
+                  palette=[(1, 2, 3), (4, 5, 6), (7, 8, 9)], meta={"num_colors": 3})
+    ChartCache(disk_dir=str(tmp_path)).put("k", chart)
+    fresh = ChartCache(disk_dir=str(tmp_path))
+    loaded = fresh.get("k")
+    assert np.array_equal(loaded.grid, chart.grid)
+    assert loaded.palette == chart.palette and loaded.meta == chart.meta
+    assert fresh.stats()["disk_hits"] == 1
+    assert fresh.get("k") is not None and fresh.stats()["hits"] == 1
+
+
+def test_disk_tier_keeps_tuples_in_meta(tmp_path, png_bytes):
+    meta = {"source_size": (640, 480), "nested": {"box": (1, (2, 3)), "list": [(4, 5)]},
+            "color_names": ["a", "b"], "__tuple__": "plain"}
+    ChartCache(disk_dir=str(tmp_path)).put("k", Chart(grid=make_chart(3).grid, palette=[(0, 0, 0)], meta=meta))
+    assert ChartCache(disk_dir=str(tmp_path)).get("k").meta == meta
+
+    memory = cached_convert(png_bytes, 30, 4, cache=ChartCache(disk_dir=str(tmp_path)))
+    disk = cached_convert(png_bytes, 30, 4, cache=ChartCache(disk_dir=str(tmp_path)))
+    assert isinstance(memory.meta["source_size"], tuple)
+    assert disk is not memory and disk.meta == memory.meta
+
+
+def test_disk_tier_evicts_oldest_over_budget(tmp_path):
+    ChartCache(disk_dir=str(tmp_path)).put("a", make_chart(50))
+    size = sum(p.stat().st_size for p in tmp_path.iterdir())
+    cache = ChartCache(disk_dir=str(tmp_path), max_disk_bytes=size * 3 // 2)
+    cache.put("b", make_chart(50, 0))
+    assert [p.name.split(".")[0] for p in tmp_path.iterdir()] == ["b"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cached_convert_reuses_result(png_bytes):
+    cache = ChartCache()
+    first = cached_convert(png_bytes, 40, 5, cache=cache)
+    assert cached_convert(png_bytes, 40, 5, cache=cache) is first
+    assert cached_convert(png_bytes, 40, 6, cache=cache) is not first
+    assert first.meta["source_sha256"] == image_digest(png_bytes)
+
+
+def test_cached_convert_and_pipeline_share_entries(png_bytes):
+    cache = ChartCache()
+    chart = cached_convert(png_bytes, 40, 5, cache=cache)
+    key, piped = ChartPipeline(cache).convert(png_bytes, 40, 5)
+    assert piped is chart
+    assert key == chart_key(image_digest(png_bytes), width_sts=40, num_colors=5)
@@ -0,0 +1,166 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from crochet import catalogue
+from crochet.catalogue import (DEFAULT_YARN_WEIGHT, EXTENSIONS, MANIFEST, Catalogue, build, main, pattern_key,
+                               preview_key)
+from crochet.gauge import base_stitch, default_gauge
+from crochet.pattern import FORMATS, MEASUREMENT_SYSTEMS, render_pattern
+from crochet.pipeline import PatternPipeline
+from crochet.stitches import SHAPES, StitchLibrary, get_library
+
+SIZE, NECK = 60, 0
+COLORS = (1, 3)
+
+
+@pytest.fixture(scope="module")
+def small_space():
+    """Shrink the catalogue to one preset size and two stitches of the bundled library."""
+    full = get_library()
+    names = full.names[:2]
+    small = StitchLibrary([{"name": name, **full[name]} for name in names])
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(catalogue, "get_library", lambda: small)
+        mp.setattr(catalogue, "preset_sizes", lambda: [(SIZE, NECK)])
+        yield names
+
+
+@pytest.fixture(scope="module")
+def built(small_space, tmp_path_factory):
+    root = str(tmp_path_factory.mktemp("catalogue"))
+    manifest = build(root, colors=COLORS, max_workers=2)
+    return root, manifest
+
+
+def model_for(shape, stitch, colors, system=MEASUREMENT_SYSTEMS[0]):
+    info = get_library()[stitch]
+    gauge = default_gauge(DEFAULT_YARN_WEIGHT, base_stitch(info["abbr_us"]))
+    return PatternPipeline().model(shape, stitch, info, SIZE, NECK, colors, system, gauge)
+
+
+def test_manifest(built, small_space):
+    root, manifest = built
+    assert manifest["patterns"] == len(SHAPES) * 2 * len(MEASUREMENT_SYSTEMS) * len(COLORS)
+    assert manifest["files"] == manifest["patterns"] * (len(FORMATS) + 1) + len(SHAPES) + 2
+    assert manifest["stitches"] == small_space and manifest["yarn_weights"] == [DEFAULT_YARN_WEIGHT]
+    with open(os.path.join(root, MANIFEST), encoding="utf-8") as f:
+        assert json.load(f)["fingerprint"] == catalogue.fingerprint()
+    files = sum(len(names) for _, _, names in os.walk(root)) - 1
+    assert files == manifest["files"]
+
+
+def test_served_patterns_match_rendering(built, small_space):
+    root, _manifest = built
+    cat = Catalogue(root)
+    assert cat.available
+    for shape in SHAPES:
+        for system in MEASUREMENT_SYSTEMS:
+            model = model_for(shape, small_space[1], 3, system)
+            for fmt in FORMATS:
+                assert cat.pattern(model, fmt) == render_pattern(model, fmt)
+            assert cat.pattern(model, "pdf").startswith(b"%PDF")
+    assert cat.preview("shape", SHAPES[0]).startswith(b"\x89PNG")
+    assert cat.preview("stitch", small_space[0]).startswith(b"\x89PNG")
+
+
+def test_uncatalogued_inputs_miss(built, small_space):
+    cat = Catalogue(built[0])
+    assert cat.pattern(model_for(SHAPES[0], small_space[0], 7), "markdown") is None
+    assert cat.preview("stitch", "Nope") is None
+    assert cat.stats()["misses"] == 2 and cat.stats()["hits"] == 0
+
+
+def test_pipeline_serves_from_catalogue(built, small_space):
+    cat = Catalogue(built[0])
+    pipeline = PatternPipeline(cat)
+    model = model_for(SHAPES[1], small_space[0], 1)
+    assert pipeline.render(model, "html") == render_pattern(model, "html")
+    pipeline.pdf(model, "A4")
+    # Only A4 is catalogued; a Letter PDF is laid out from the catalogued text
+    pipeline.pdf(model, "Letter")
+    assert cat.stats()["hits"] == 3
+    assert pipeline.stats()["catalogue"]["available"]
+
+
+def test_stale_catalogue_is_ignored(built, small_space, tmp_path, monkeypatch):
+    root = str(tmp_path / "copy")
+    shutil.copytree(built[0], root)
+    model = model_for(SHAPES[0], small_space[0], 1)
+    assert Catalogue(root).pattern(model, "text") is not None
+    monkeypatch.setattr(catalogue, "fingerprint", lambda: "0" * 64)
+    stale = Catalogue(root)
+    assert not stale.available and stale.pattern(model, "text") is None
+    assert stale.stats() == {"available": False, "patterns": 0, "hits": 0, "misses": 0}
+
+
+def test_missing_or_broken_manifest(tmp_path):
+    assert not Catalogue(str(tmp_path)).available
+    (tmp_path / MANIFEST).write_text("{not json")
+    assert not Catalogue(str(tmp_path)).available
+
+
+def test_fingerprint_tracks_sources(monkeypatch):
+    before = catalogue.fingerprint()
+    monkeypatch.setattr(catalogue, "CATALOGUE_VERSION", catalogue.CATALOGUE_VERSION + 1)
+    assert catalogue.fingerprint() != before
+
+
+def test_fingerprint_covers_package_and_library(tmp_path, monkeypatch):
+    names = {os.path.basename(path) for path in catalogue.source_files()}
+    assert {"render.py", "pipeline.py", "pattern.py", "stitches.py", "stitches.json"} <= names
+    before = catalogue.fingerprint()
+    library = tmp_path / "lib.json"
+    library.write_text(json.dumps({"stitches": []}), encoding="utf-8")
+    monkeypatch.setenv("CROCHET_STITCH_LIBRARY", str(library))
+    assert catalogue.fingerprint() != before
+
+
+def test_render_code_change_invalidates(monkeypatch, tmp_path):
+    before = catalogue.fingerprint()
+    edited = tmp_path / "render.py"
+    edited.write_text("# edited\n")
+    files = [str(edited) if p.endswith(os.sep + "render.py") else p for p in catalogue.source_files()]
+    monkeypatch.setattr(catalogue, "source_files", lambda: files)
+    assert catalogue.fingerprint() != before
+
+
+def test_keys():
+    a, b = model_for(SHAPES[0], get_library().names[0], 1), model_for(SHAPES[0], get_library().names[0], 2)
+    assert pattern_key(a) == pattern_key(model_for(SHAPES[0], get_library().names[0], 1)) != pattern_key(b)
+    assert preview_key("shape", "Circle") != preview_key("stitch", "Circle")
+    assert Catalogue("/x").path("abcdef", EXTENSIONS["pdf"]) == os.path.join("/x", "ab", "abcdef.pdf")
+
+
+def test_manifest_is_written_last(small_space, tmp_path):
+    root = str(tmp_path)
+    (tmp_path / MANIFEST).write_text(json.dumps({"fingerprint": catalogue.fingerprint()}))
+    seen = []
+    build(root, colors=(1,), max_workers=1,
+          progress=lambda done, total: seen.append(os.path.exists(os.path.join(root, MANIFEST))))
+    assert seen and not any(seen)
+    assert Catalogue(root).available
+
+
+def test_if_stale_skips_current_catalogue(small_space, tmp_path, capsys):
+    root = str(tmp_path)
+    build(root, max_workers=2)
+    mtime = os.stat(os.path.join(root, MANIFEST)).st_mtime_ns
+    assert main(["-o", root, "--if-stale"]) == 0
+    assert "up to date" in capsys.readouterr().err
+    assert os.stat(os.path.join(root, MANIFEST)).st_mtime_ns == mtime
+
+
+def test_covers(built, small_space, monkeypatch):
+    manifest = catalogue.read_manifest(built[0])
+    assert manifest["fingerprint"] == built[1]["fingerprint"] and manifest["colors"] == list(COLORS)
+    # The fixture catalogue only holds some color counts, so a full build is still needed
+    assert catalogue.covers(manifest, [DEFAULT_YARN_WEIGHT], COLORS)
+    assert not catalogue.covers(manifest, [DEFAULT_YARN_WEIGHT])
+    assert not catalogue.covers(manifest, ["Bulky (5)"], COLORS)
+    assert not catalogue.covers(None, [DEFAULT_YARN_WEIGHT], COLORS)
+    assert not catalogue.covers({**manifest, "stitches": small_space[:1]}, [DEFAULT_YARN_WEIGHT], COLORS)
+    monkeypatch.setattr(catalogue, "fingerprint", lambda: "0" * 64)
+    assert not catalogue.covers(manifest, [DEFAULT_YARN_WEIGHT], COLORS)
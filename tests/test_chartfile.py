@@ -0,0 +1,139 @@
+import json
+
+import numpy as np
+import pytest
+
+from crochet.chartfile import (_PREAMBLE, CHART_FORMAT_VERSION, MAGIC, ChartFile, bits_per_stitch, dumps,
+                               load_chart, loads, pack_grid, read_header, row_bytes, save_chart, unpack_rows)
+from crochet.engine import Chart
+
+
+def with_header(data: bytes, **changes) -> bytes:
+    """Return ``data`` with its JSON header fields replaced (``None`` deletes a field)."""
+    header, offset = read_header(data)
+    header.pop("version")
+    for name, value in changes.items():
+        if value is None:
+            header.pop(name, None)
+        else:
+            header[name] = value
+    raw = json.dumps(header).encode("utf-8")
+    preamble = _PREAMBLE.pack(MAGIC, CHART_FORMAT_VERSION, 0, len(raw))
+    return preamble + raw + b"\0" * (-(len(preamble) + len(raw)) % 8) + data[offset:]
+
+
+@pytest.mark.parametrize("n_colors, bits", [(1, 1), (2, 1), (3, 2), (4, 2), (5, 3), (8, 3), (9, 4), (12, 4),
+                                            (256, 8)])
+def test_bits_per_stitch(n_colors, bits):
+    assert bits_per_stitch(n_colors) == bits
+
+
+@pytest.mark.parametrize("bits", range(1, 9))
+def test_pack_round_trip(bits):
+    grid = np.random.default_rng(bits).integers(0, 1 << bits, (7, 13), dtype=np.uint8)
+    packed = pack_grid(grid, bits)
+    assert packed.shape == (7, row_bytes(13, bits))
+    assert (unpack_rows(packed, 13, bits) == grid).all()
+    assert (unpack_rows(packed[2:5], 13, bits) == grid[2:5]).all()
+
+
+def test_pack_is_msb_first():
+    assert pack_grid(np.array([[1, 0, 3]], dtype=np.uint8), 2).tolist() == [[0b01001100]]
+
+
+def test_round_trip(chart):
+    chart.meta.update(elapsed_ms=12.5, color_names=["a", "b", "c", "d"])
+    data = dumps(chart, "ab" * 32)
+    assert data[:4] == MAGIC
+    out = loads(data)
+    assert (out.grid == chart.grid).all() and out.grid.dtype == np.uint8
+    assert out.palette == chart.palette
+    assert out.meta["source_sha256"] == "ab" * 32 and out.meta["color_names"] == ["a", "b", "c", "d"]
+    assert "elapsed_ms" not in out.meta
+    header, offset = read_header(data)
+    assert offset % 8 == 0 and len(data) == offset + 20 * row_bytes(30, 2)
+    assert header["version"] == CHART_FORMAT_VERSION and header["bits"] == 2
+
+
+def test_checksum_mismatch(chart):
+    data = bytearray(dumps(chart))
+    data[-1] ^= 0x80
+    with pytest.raises(ValueError, match="checksum"):
+        loads(bytes(data))
+    assert (loads(bytes(data), verify=False).grid != chart.grid).sum() == 1
+
+
+@pytest.mark.parametrize("mangle, message", [
+    (lambda d: d[:6], "too short"),
+    (lambda d: b"PNG\0" + d[4:], "magic"),
+    (lambda d: d[:4] + (CHART_FORMAT_VERSION + 1).to_bytes(2, "little") + d[6:], "newer"),
+    (lambda d: d[:-3], "truncated"),
+])
+def test_bad_files(chart, mangle, message):
+    with pytest.raises(ValueError, match=message):
+        loads(mangle(dumps(chart)))
+
+
+@pytest.mark.parametrize("changes", [
+    {"width": None}, {"width": "30"}, {"height": -1}, {"height": True},
+    {"bits": 0}, {"bits": 9}, {"bits": None},
+    {"palette": None}, {"palette": []}, {"palette": [[0, 0, 0]] * 5}, {"palette": [[0, 0]] * 4},
+    {"palette": [[0, 0, 256]] * 4}, {"palette": [[0, 0, 1.5]] * 4}, {"palette": "red"},
+    {"settings": [1, 2]}, {"source_sha256": 5}, {"crc32": "0"},
+])
+def test_bad_headers_raise_value_error(chart, changes):
+    with pytest.raises(ValueError, match="corrupt"):
+        loads(with_header(dumps(chart), **changes))
+
+
+def test_stitch_outside_palette(chart):
+    data = with_header(dumps(chart), palette=[[0, 0, 0]] * 3)
+    with pytest.raises(ValueError, match="outside the palette"):
+        loads(data)
+
+
+def test_save_and_load(chart, tmp_path):
+    path = str(tmp_path / "c.crochet")
+    save_chart(chart, path, "f" * 64)
+    assert [p.name for p in tmp_path.iterdir()] == ["c.crochet"]
+    out = load_chart(path)
+    assert (out.grid == chart.grid).all() and out.meta["source_sha256"] == "f" * 64
+
+
+def test_chart_file_pages_rows(chart, tmp_path):
+    path = str(tmp_path / "c.crochet")
+    save_chart(chart, path)
+    with ChartFile(path) as cf:
+        assert (cf.width, cf.height) == (30, 20)
+        assert cf.palette == chart.palette and cf.settings == chart.meta
+        assert (cf.rows(5, 9) == chart.grid[5:9]).all()
+        assert cf.rows(18).shape == (2, 30)
+        assert cf.verify()
+        assert (cf.to_chart().grid == chart.grid).all()
+
+
+def test_chart_file_verify_detects_corruption(chart, tmp_path):
+    data = bytearray(dumps(chart))
+    data[-1] ^= 0x80
+    path = tmp_path / "bad.crochet"
+    path.write_bytes(bytes(data))
+    with ChartFile(str(path)) as cf:
+        assert not cf.verify()
+
+
+def test_chart_file_close(chart, tmp_path):
+    path = tmp_path / "c.crochet"
+    save_chart(chart, str(path))
+    cf = ChartFile(str(path))
+    band = cf.rows(0, 3)
+    cf.close()
+    cf.close()
+    assert (band == chart.grid[:3]).all()  # decoded rows outlive the map
+
+
+@pytest.mark.parametrize("data", [b"", b"CRCH", b"PNG\0" + b"\0" * 20])
+def test_chart_file_rejects_bad_files(tmp_path, data):
+    path = tmp_path / "bad.crochet"
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        ChartFile(str(path))
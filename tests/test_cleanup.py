@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from crochet.cleanup import cleanup_chart, despeckle, merge_palette, neighbour_counts, run_lengths, yarn_changes
+from crochet.engine import Chart, convert_image
+
+
+def naive_neighbour_counts(grid, n_colors):
+    h, w = grid.shape
+    counts = np.zeros((h, w, n_colors), dtype=int)
+    for y in range(h):
+        for x in range(w):
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    if (dy or dx) and 0 <= y + dy < h and 0 <= x + dx < w:
+                        counts[y, x, grid[y + dy, x + dx]] += 1
+    return counts
+
+
+def test_neighbour_counts_match_loop():
+    grid = np.random.default_rng(1).integers(0, 4, (9, 13), dtype=np.uint8)
+    assert (neighbour_counts(grid, 4) == naive_neighbour_counts(grid, 4)).all()
+
+
+def test_run_lengths():
+    grid = np.array([[0, 0, 1, 2, 2, 2], [2, 2, 2, 2, 0, 1]], dtype=np.uint8)
+    assert run_lengths(grid).tolist() == [[2, 2, 1, 3, 3, 3], [4, 4, 4, 4, 1, 1]]
+
+
+def test_merge_palette_merges_close_colors_into_weighted_mean():
+    grid = np.array([[0, 0, 0, 1], [2, 2, 2, 2]], dtype=np.uint8)
+    palette = [(200, 30, 40), (204, 30, 40), (20, 20, 160)]
+    merged, new_palette, kept = merge_palette(grid, palette, 3.0)
+    assert kept.tolist() == [0, 2]
+    assert new_palette == [(201, 30, 40), (20, 20, 160)]
+    assert merged.tolist() == [[0, 0, 0, 0], [1, 1, 1, 1]]
+    # Too tight a threshold leaves the palette alone
+    same, same_palette, _ = merge_palette(grid, palette, 0.5)
+    assert same_palette == palette and (same == grid).all()
+
+
+def test_merge_palette_drops_unused_entries():
+    grid = np.array([[0, 2]], dtype=np.uint8)
+    merged, palette, kept = merge_palette(grid, [(0, 0, 0), (9, 9, 9), (255, 255, 255)], 0.0)
+    assert kept.tolist() == [0, 2] and palette == [(0, 0, 0), (255, 255, 255)] and merged.tolist() == [[0, 1]]
+
+
+def test_despeckle_removes_islands(chart):
+    grid = despeckle(chart.grid, 4, min_area=2)
+    assert not (grid == 3).any()
+    assert (grid[:, 25] == 0).all()
+    # Large areas are untouched
+    assert (grid[:, 10:20] == 1).all() and (grid[5:15, 3:8] == 2).all()
+
+
+def test_despeckle_removes_short_runs():
+    grid = np.zeros((6, 12), dtype=np.uint8)
+    grid[:, 4] = 1    # a 1-stitch-wide column: a large area, but every run in it is short
+    grid[:, 8:11] = 1
+    assert (despeckle(grid, 2, min_area=2) == grid).all()
+    out = despeckle(grid, 2, min_area=0, min_run=3)
+    assert (out[:, 4] == 0).all() and (out[:, 8:11] == 1).all()
+
+
+def test_cleanup_is_noop_when_off(chart):
+    out = cleanup_chart(chart)
+    assert (out.grid == chart.grid).all() and out.palette == chart.palette
+    report = out.meta["cleanup"]
+    assert report["stitches_changed"] == 0 and report["yarn_changes_saved"] == 0
+    assert report["colors_before"] == report["colors_after"] == 4
+
+
+def test_cleanup_report_and_invariants(chart):
+    chart.meta["color_names"] = ["White", "Red", "Blue", "Green"]
+    out = cleanup_chart(chart, min_area=2)
+    report = out.meta["cleanup"]
+    assert len(out.palette) <= len(chart.palette)
+    assert out.grid.dtype == np.uint8 and out.grid.shape == chart.grid.shape
+    assert int(out.grid.max()) < len(out.palette)
+    # The specks' color is gone along with its name
+    assert out.palette == chart.palette[:3] and out.meta["color_names"] == ["White", "Red", "Blue"]
+    assert report["colors_after"] == 3 and report["stitches_changed"] == 5
+    assert report["yarn_changes_before"] == yarn_changes(chart.grid)
+    assert report["yarn_changes_after"] == yarn_changes(out.grid)
+    assert report["yarn_changes_saved"] == 10
+    assert chart.meta.get("cleanup") is None  # the input chart is not modified
+
+
+@pytest.mark.parametrize("merge_delta, min_area, min_run", [(10.0, 0, 0), (0.0, 3, 0), (25.0, 3, 3)])
+def test_cleanup_never_adds_colors_or_changes(png_bytes, merge_delta, min_area, min_run):
+    chart = convert_image(png_bytes, width_sts=60, num_colors=8)
+    out = cleanup_chart(chart, merge_delta, min_area, min_run)
+    assert len(out.palette) <= len(chart.palette)
+    assert int(out.grid.max()) < len(out.palette)
+    if not merge_delta:
+        assert set(out.palette) <= set(chart.palette)
+    assert out.meta["cleanup"]["yarn_changes_saved"] >= 0
+
+
+def test_cleanup_merges_then_compacts():
+    grid = np.array([[0, 1, 0, 1], [2, 2, 2, 2]], dtype=np.uint8)
+    chart = Chart(grid=grid, palette=[(10, 10, 10), (12, 10, 10), (240, 240, 240)], meta={})
+    out = cleanup_chart(chart, merge_delta=5.0)
+    assert len(out.palette) == 2
+    assert out.meta["cleanup"]["yarn_changes_before"] == 3
+    assert out.meta["cleanup"]["yarn_changes_saved"] == 3
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from crochet.dither import DITHER_LABELS, DITHER_MODES, bayer_matrix, dither_grid, palette_spacing
+from crochet.engine import quantize_chart
+from crochet.export import row_runs
+from crochet.quantize import nearest_center, to_rgb_array
+
+PALETTE = [(20, 20, 20), (120, 60, 40), (200, 180, 160), (250, 250, 250), (40, 90, 200)]
+
+
+def naive_floyd_steinberg(rgb, palette):
+    """Textbook row-by-row error diffusion, the reference for the wavefront version."""
+    h, w = rgb.shape[:2]
+    work = rgb.astype(np.float64).copy()
+    grid = np.empty((h, w), dtype=np.intp)
+    for y in range(h):
+        for x in range(w):
+            px = np.clip(work[y, x], 0, 255)
+            i = nearest_center(px[None], palette)[0]
+            grid[y, x] = i
+            err = px - palette[i]
+            for dy, dx, weight in ((0, 1, 7), (1, -1, 3), (1, 0, 5), (1, 1, 1)):
+                if y + dy < h and 0 <= x + dx < w:
+                    work[y + dy, x + dx] += err * (weight / 16)
+    return grid
+
+
+@pytest.fixture
+def rgb(image):
+    return to_rgb_array(image.resize((48, 36))).astype(np.float64)
+
+
+def test_labels_cover_modes():
+    assert set(DITHER_LABELS) == set(DITHER_MODES)
+
+
+@pytest.mark.parametrize("mode", DITHER_MODES)
+def test_indices_fit_palette(rgb, mode):
+    grid = dither_grid(rgb, PALETTE, mode)
+    assert grid.shape == rgb.shape[:2] and grid.dtype == np.uint8
+    assert int(grid.max()) < len(PALETTE)
+
+
+def test_none_is_nearest_color(rgb):
+    pal = np.array(PALETTE, dtype=np.float64)
+    expected = nearest_center(rgb.reshape(-1, 3), pal).reshape(rgb.shape[:2])
+    assert (dither_grid(rgb, PALETTE, "none") == expected).all()
+
+
+@pytest.mark.parametrize("shape", [(36, 48), (1, 9), (9, 1), (5, 3)])
+def test_floyd_steinberg_matches_loop(rgb, shape):
+    h, w = shape
+    sample = rgb[:h, :w]
+    pal = np.array(PALETTE, dtype=np.float64)
+    assert (dither_grid(sample, PALETTE, "floyd_steinberg") == naive_floyd_steinberg(sample, pal)).all()
+
+
+def test_flat_palette_colors_stay_flat():
+    rgb = np.empty((12, 16, 3))
+    rgb[:, :8] = PALETTE[0]
+    rgb[:, 8:] = PALETTE[2]
+    # Error diffusion has no error to spread when every pixel is a palette color
+    for mode in ("none", "floyd_steinberg", "serpentine"):
+        grid = dither_grid(rgb, PALETTE, mode)
+        assert (grid[:, :8] == 0).all() and (grid[:, 8:] == 2).all(), mode
+
+
+def test_bayer_pattern_repeats_every_8_stitches():
+    grid = dither_grid(np.full((24, 40, 3), 100.0), PALETTE, "bayer")
+    assert (grid[8:] == grid[:-8]).all() and (grid[:, 8:] == grid[:, :-8]).all()
+    assert len(np.unique(grid)) > 1
+
+
+def test_dithering_preserves_mean_tone():
+    # A flat mid grey between black and white: nearest mapping picks one side, dithering mixes both
+    rgb = np.full((32, 32, 3), 128.0)
+    palette = [(0, 0, 0), (255, 255, 255)]
+    assert len(np.unique(dither_grid(rgb, palette, "none"))) == 1
+    for mode in ("bayer", "floyd_steinberg", "serpentine"):
+        grid = dither_grid(rgb, palette, mode)
+        assert 0.35 < grid.mean() < 0.65, mode
+
+
+def test_serpentine_keeps_rows_smoother_than_floyd_steinberg(rgb):
+    changes = {mode: int(row_runs(dither_grid(rgb, PALETTE, mode)).yarn_changes.sum())
+               for mode in ("serpentine", "floyd_steinberg")}
+    assert changes["serpentine"] < changes["floyd_steinberg"]
+
+
+def test_bayer_matrix():
+    m = bayer_matrix(8)
+    assert m.shape == (8, 8)
+    assert sorted(((m + 0.5) * 64 - 0.5).round().astype(int).ravel().tolist()) == list(range(64))
+    assert abs(m.mean()) < 1e-12
+
+
+def test_palette_spacing():
+    assert palette_spacing(np.array([[0, 0, 0]], dtype=float)) == 0.0
+    assert palette_spacing(np.array([[0, 0, 0], [3, 4, 0], [100, 0, 0]], dtype=float)) == 5.0
+
+
+def test_unknown_mode(rgb):
+    with pytest.raises(ValueError, match="unknown dither mode"):
+        dither_grid(rgb, PALETTE, "atkinson")
+
+
+@pytest.mark.parametrize("mode", DITHER_MODES)
+def test_quantize_chart_compacts_palette(image, mode):
+    small = image.resize((40, 30))
+    chart = quantize_chart(small, 8, dither=mode)
+    assert chart.meta["dither"] == mode
+    used = np.bincount(chart.grid.ravel(), minlength=len(chart.palette))
+    assert (used > 0).all() and len(chart.palette) <= 8
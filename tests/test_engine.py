@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from crochet import engine
+from crochet.engine import (Chart, chart_height, convert_image, open_reduced, prepare_image, quantize_chart,
+                            resize_tiled)
+
+
+def test_convert_keeps_aspect_ratio_and_palette_bound(png_bytes):
+    chart = convert_image(png_bytes, 60, 6)
+    assert isinstance(chart, Chart)
+    assert chart.dimensions == (60, 45)
+    assert chart.grid.dtype == np.uint8
+    assert 1 <= len(chart.palette) <= 6
+    assert int(chart.grid.max()) < len(chart.palette)
+    assert chart.meta["width_sts"] == 60 and chart.meta["num_colors"] == 6
+    assert chart.meta["source_size"] == (240, 180)
+
+
+def test_chart_height_never_below_one_row():
+    assert chart_height((1000, 10), 5) == 1
+    assert chart_height((100, 200), 50) == 100
+
+
+def test_to_image_round_trips_grid(png_bytes):
+    chart = convert_image(png_bytes, 40, 5)
+    img = chart.to_image()
+    assert img.mode == "P" and img.size == chart.dimensions
+    assert np.array_equal(np.asarray(img), chart.grid)
+
+
+@pytest.mark.parametrize("num_colors", [0, 257])
+def test_convert_rejects_bad_color_count(png_bytes, num_colors):
+    with pytest.raises(ValueError):
+        convert_image(png_bytes, 40, num_colors)
+
+
+def test_prepare_rejects_zero_width(png_bytes):
+    with pytest.raises(ValueError):
+        prepare_image(png_bytes, 0)
+
+
+def test_quantize_chart_merges_meta(image):
+    chart = quantize_chart(image.resize((30, 20)), 3, meta={"width_sts": 30})
+    assert chart.meta["width_sts"] == 30 and chart.meta["quantizer"] == "median_cut"
+    assert len(chart.palette) <= 3
+
+
+def test_convert_is_deterministic(png_bytes):
+    a, b = convert_image(png_bytes, 50, 8), convert_image(png_bytes, 50, 8)
+    assert np.array_equal(a.grid, b.grid) and a.palette == b.palette
+
+
+# --- large-chart mode ---
+def nearest_reference(rgb: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Sample the centre of every output cell, like resize_tiled."""
+    src_h, src_w = rgb.shape[:2]
+    xs = ((np.arange(width) + 0.5) * (src_w / width)).astype(int)
+    ys = ((np.arange(height) + 0.5) * (src_h / height)).astype(int)
+    return rgb[ys][:, xs]
+
+
+@pytest.mark.parametrize("size", [(37, 21), (240, 180), (500, 400)])
+def test_resize_tiled_matches_reference(image, size):
+    out = resize_tiled(image, *size, tile_rows=7)
+    assert out.size == size
+    assert np.array_equal(np.asarray(out), nearest_reference(np.asarray(image), *size))
+
+
+@pytest.mark.parametrize("mode, expected", [("RGBA", "RGBA"), ("L", "L"), ("P", "RGB"), ("CMYK", "RGB")])
+def test_resize_tiled_output_modes(image, mode, expected):
+    assert resize_tiled(image.convert(mode), 20, 15).mode == expected
+
+
+def test_large_mode_png_matches_reference(image, png_bytes):
+    chart = convert_image(png_bytes, 60, 6, large=True)
+    assert chart.dimensions == (60, 45) and chart.meta["large"]
+    small, info = prepare_image(png_bytes, 60, large=True)
+    assert np.array_equal(np.asarray(small), nearest_reference(np.asarray(image), 60, 45))
+    assert info["source_size"] == (240, 180) and info["source_format"] == "PNG"
+
+
+def test_large_mode_drafts_jpeg(jpeg_bytes):
+    image, source_size = open_reduced(jpeg_bytes, 30)
+    assert source_size == (240, 180)
+    assert image.size[0] < 240 and image.size[0] >= 30
+    assert convert_image(jpeg_bytes, 30, 4, large=True).dimensions == (30, 22)
+
+
+def test_large_mode_refuses_huge_non_jpeg(monkeypatch, png_bytes, jpeg_bytes):
+    monkeypatch.setattr(engine, "MAX_SOURCE_PIXELS", 1000)
+    with pytest.raises(ValueError, match="too large"):
+        open_reduced(png_bytes, 30)
+    open_reduced(jpeg_bytes, 30)  # drafted below the cap
+
+
+def test_resize_tiled_crops_single_rows(image):
+    boxes = []
+    crop = image.crop
+
+    def recording_crop(box):
+        boxes.append(box)
+        return crop(box)
+
+    image.crop = recording_crop
+    resize_tiled(image, 24, 18)
+    assert len(boxes) == 18 and all(bottom - top == 1 for _l, top, _r, bottom in boxes)
@@ -0,0 +1,56 @@
+import csv
+import io
+from itertools import groupby
+
+import numpy as np
+from PIL import Image
+
+from crochet.export import chart_csv, chart_png_bytes, row_runs, run_labels
+
+
+def naive_runs(grid):
+    """Per-row (color, length) runs, the way the loop it replaced computed them."""
+    return [[(int(c), len(list(g))) for c, g in groupby(row.tolist())] for row in grid]
+
+
+def test_row_runs_match_naive_encoding():
+    grid = np.random.default_rng(1).integers(0, 4, (25, 17)).astype(np.uint8)
+    grid[3] = 2  # a single-run row
+    runs = row_runs(grid)
+    expected = naive_runs(grid)
+    for r, row in enumerate(expected):
+        a, b = runs.row_offsets[r], runs.row_offsets[r + 1]
+        assert list(zip(runs.color[a:b].tolist(), runs.length[a:b].tolist())) == row
+        assert set(runs.row[a:b].tolist()) == {r}
+    assert runs.yarn_changes.tolist() == [len(row) - 1 for row in expected]
+    assert runs.colors_per_row.tolist() == [len(set(row.tolist())) for row in grid]
+    assert runs.color_totals.tolist() == np.bincount(grid.ravel(), minlength=4).tolist()
+
+
+def test_row_runs_pads_unused_colors():
+    runs = row_runs(np.zeros((2, 3), dtype=np.uint8), n_colors=5)
+    assert runs.color_counts.shape == (2, 5)
+    assert runs.color_totals.tolist() == [6, 0, 0, 0, 0]
+
+
+def test_run_labels(chart):
+    labels = run_labels(row_runs(chart.grid, 4))
+    assert labels[0] == "10×C1, 10×C2, 5×C1, 1×C4, 4×C1"
+    assert labels[1] == "10×C1, 10×C2, 10×C1"
+    assert run_labels(row_runs(np.array([[0, 0, 1]], dtype=np.uint8)), ["White", "Red"]) == ["2×White, 1×Red"]
+
+
+def test_csv_rows_and_totals(chart):
+    rows = list(csv.reader(io.StringIO(chart_csv(chart.grid, 4))))
+    assert rows[0] == ["Row", "Stitch Count", "Colors Used", "Yarn Changes", "C1", "C2", "C3", "C4", "Runs"]
+    assert len(rows) == 1 + chart.height + 1
+    assert rows[1][:4] == ["1", "30", "3", "4"]
+    total = rows[-1]
+    assert total[:2] == ["Total", str(30 * 20)]
+    assert [int(v) for v in total[4:8]] == np.bincount(chart.grid.ravel(), minlength=4).tolist()
+
+
+def test_png_is_one_pixel_per_stitch(chart):
+    img = Image.open(io.BytesIO(chart_png_bytes(chart)))
+    assert img.size == chart.dimensions
+    assert np.array_equal(np.asarray(img), chart.grid)
@@ -0,0 +1,34 @@
+import io
+
+import pytest
+from PIL import Image
+
+from crochet.figures import shape_outline_png, stitch_texture_png
+from crochet.pipeline import PatternPipeline
+from crochet.stitches import SHAPES
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_shape_previews_are_pngs(shape):
+    img = Image.open(io.BytesIO(shape_outline_png(shape)))
+    assert img.format == "PNG" and min(img.size) > 50
+
+
+def test_stitch_preview_is_png():
+    assert Image.open(io.BytesIO(stitch_texture_png("Single Crochet"))).format == "PNG"
+
+
+def test_previews_leave_no_pyplot_figures():
+    plt = pytest.importorskip("matplotlib.pyplot")
+    before = plt.get_fignums()
+    shape_outline_png("Square")
+    assert plt.get_fignums() == before
+
+
+def test_pipeline_renders_each_preview_once():
+    pipeline = PatternPipeline()
+    first = pipeline.previews("Circle", "Single Crochet")
+    assert pipeline.previews("Circle", "Single Crochet") is not None
+    assert pipeline.shape_png("Circle") is first[0]
+    stats = pipeline.stats()["figures"]
+    assert stats["misses"] == 2 and stats["hits"] == 3
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from crochet.gauge import (SHAPES, STITCH_BASES, YARN_WEIGHTS, band_meters, base_stitch, default_gauge,
+                           round_counts, shape_extent, split_rounds, to_cm, yardage_grid)
+
+
+@pytest.mark.parametrize("abbr, expected", [("sc", "sc"), ("3dc group", "dc"), ("hdc, ch 1", "hdc"),
+                                            ("fpdc", "sc"), ("", "sc")])
+def test_base_stitch(abbr, expected):
+    assert base_stitch(abbr) == expected
+
+
+def test_default_gauge_scales_rows_by_stitch_height():
+    sc, dc = default_gauge("Worsted (4)"), default_gauge("Worsted (4)", "dc")
+    assert sc.stitches_per_10cm == dc.stitches_per_10cm == YARN_WEIGHTS["Worsted (4)"]["stitches_per_10cm"]
+    assert dc.rows_per_10cm == pytest.approx(sc.rows_per_10cm / 2, abs=0.1)
+    assert dc.meters_per_stitch > sc.meters_per_stitch
+
+
+def test_to_cm():
+    assert to_cm(10, "Imperial (inches)") == pytest.approx(25.4)
+    assert to_cm(10, "Metric (cm)") == 10
+
+
+@pytest.mark.parametrize("shape", list(SHAPES))
+def test_round_counts_grow_in_whole_repeats(shape):
+    gauge = default_gauge("DK (3)")
+    counts = round_counts(shape, 60, 10, gauge)
+    points = SHAPES[shape][1]
+    assert (counts % points == 0).all() and (counts >= points).all()
+    assert (np.diff(counts) >= 0).all()
+    outer, _offset = shape_extent(shape, 60)
+    assert len(counts) == np.ceil((outer - 5) / gauge.row_height_cm)
+
+
+def test_split_rounds():
+    assert split_rounds(10, 3) == [(1, 3), (4, 7), (8, 10)]
+    assert split_rounds(2, 5) == [(1, 1), (2, 2)]
+
+
+def test_band_meters_sum_to_total():
+    gauge = default_gauge("Worsted (4)")
+    counts = round_counts("Square", 40, 0, gauge)
+    bands = split_rounds(len(counts), 3)
+    meters = band_meters(counts, bands, gauge)
+    assert meters.sum() == pytest.approx(counts.sum() * gauge.meters_per_stitch)
+    first, last = bands[1]
+    assert meters[1] == pytest.approx(counts[first - 1:last].sum() * gauge.meters_per_stitch)
+
+
+def test_yardage_grid_broadcasts_and_tracks_round_sum():
+    sizes = np.array([40.0, 80.0, 120.0])
+    rows = np.array([11.0, 15.0])
+    grid = yardage_grid("Circle", sizes[:, None], rows[None, :], STITCH_BASES["sc"]["yarn"])
+    assert grid.shape == (3, 2)
+    assert (np.diff(grid, axis=0) > 0).all()
+    gauge = default_gauge("Worsted (4)")  # 15 rows / 10 cm
+    exact = round_counts("Circle", 80, 0, gauge).sum() * gauge.meters_per_stitch
+    assert grid[1, 1] == pytest.approx(exact, rel=0.05)
+
+
+def test_colors_are_capped_at_the_round_count():
+    from crochet.pattern import FORMATS, build_pattern, render_pattern
+
+    info = {"abbr_uk": "dc", "abbr_us": "sc", "difficulty": "Beginner", "drape": "Medium", "desc": "",
+            "video": "", "tutorial_name": ""}
+    gauge = default_gauge("Super Bulky (6)")
+    model = build_pattern("Circle", "sc", info, 4, 0, 12, "Metric (cm)", gauge=gauge)
+    assert model.est_rounds < 12
+    assert model.colors == len(model.color_bands) == len(model.band_meters) == model.est_rounds
+    assert model.requested_colors == 12
+    for fmt in FORMATS:
+        assert f"{model.colors} (12 requested; only {model.est_rounds} rounds" in render_pattern(model, fmt)
+    # Enough rounds: the count is kept as entered and not annotated
+    roomy = build_pattern("Circle", "sc", info, 60, 0, 12, "Metric (cm)", gauge=gauge)
+    assert roomy.colors == 12 and roomy.requested_colors is None
+    assert "requested" not in render_pattern(roomy, "text")
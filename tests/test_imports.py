@@ -0,0 +1,39 @@
+"""Startup import budget of app.py: each check runs in a fresh interpreter."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("numpy", "PIL", "matplotlib")
+
+
+def loaded_after(statement: str) -> list:
+    """Return which of ``HEAVY`` are in sys.modules after running ``statement`` in a new interpreter."""
+    code = f"import sys\n{statement}\nprint(' '.join(m for m in {HEAVY!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return out.stdout.split()
+
+
+def test_password_gate_imports_nothing_heavy():
+    assert loaded_after("import crochet.auth, crochet.timing") == []
+
+
+def test_pattern_side_leaves_pillow_and_matplotlib_unloaded():
+    statement = ("import crochet.gauge, crochet.pattern, crochet.pipeline, crochet.sessions, crochet.stitches\n"
+                 "crochet.pipeline.get_pattern_pipeline()")
+    assert loaded_after(statement) == ["numpy"]
+
+
+def test_package_reexports_resolve_lazily():
+    assert loaded_after("import crochet") == []
+    assert loaded_after("from crochet import Chart") == ["numpy", "PIL"]
+
+
+def test_unknown_package_attribute():
+    import crochet
+
+    with pytest.raises(AttributeError):
+        crochet.not_a_thing
@@ -0,0 +1,67 @@
+from itertools import groupby
+
+import numpy as np
+import pytest
+
+from crochet.instructions import (c2c_diagonals, c2c_instructions, c2c_phases, filet_instructions, filet_mask,
+                                  instructions_text)
+
+
+def labels(seq, names):
+    return ", ".join(f"{len(list(g))}×{names[c]}" for c, g in groupby(seq))
+
+
+def naive_c2c(grid):
+    """Walk every diagonal from the bottom-right corner, one tile at a time."""
+    b = grid[::-1, ::-1]
+    height, width = b.shape
+    rows = []
+    for d in range(width + height - 1):
+        seq = [int(b[r, d - r]) for r in range(max(0, d - width + 1), min(d, height - 1) + 1)]
+        rows.append(seq[::-1] if d % 2 else seq)
+    return rows
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (4, 9), (9, 4), (12, 12)])
+def test_c2c_matches_tile_by_tile_walk(shape):
+    grid = np.random.default_rng(sum(shape)).integers(0, 3, shape).astype(np.uint8)
+    names = ["C1", "C2", "C3"]
+    rows = c2c_instructions(grid)
+    expected = naive_c2c(grid)
+    assert len(rows) == shape[0] + shape[1] - 1
+    assert [r.stitches for r in rows] == [len(seq) for seq in expected]
+    assert [r.runs for r in rows] == [labels(seq, names) for seq in expected]
+    assert sum(r.stitches for r in rows) == grid.size
+
+
+def test_c2c_diagonals_are_padded_with_sentinel():
+    diagonals, lengths = c2c_diagonals(np.zeros((2, 3), dtype=np.uint8))
+    assert diagonals.shape == (4, 2) and lengths.tolist() == [1, 2, 2, 1]
+    assert diagonals[0, 1] == 1 and diagonals[3, 1] == 1
+
+
+def test_c2c_phases():
+    assert c2c_phases(3, 2) == ["start", "increase", "inc/dec", "decrease"]
+    assert c2c_phases(2, 2) == ["start", "increase", "decrease"]
+
+
+def test_filet_mask_defaults_to_dark_colors():
+    grid = np.array([[0, 1], [1, 0]], dtype=np.uint8)
+    assert filet_mask(grid, [(255, 255, 255), (0, 0, 0)]).tolist() == [[False, True], [True, False]]
+    assert filet_mask(grid, [(255, 255, 255), (0, 0, 0)], filled=[0]).tolist() == [[True, False], [False, True]]
+
+
+def test_filet_rows_alternate_direction():
+    # Bottom row is worked first, right to left; the next one left to right
+    grid = np.array([[1, 1, 0],
+                     [1, 0, 0]], dtype=np.uint8)
+    rows = filet_instructions(grid, [(255, 255, 255), (0, 0, 0)])
+    assert [(r.number, r.phase, r.stitches) for r in rows] == [(1, "RS", 3), (2, "WS", 3)]
+    assert rows[0].runs == "2×open, 1×closed"
+    assert rows[1].runs == "2×closed, 1×open"
+
+
+def test_instructions_text():
+    text = instructions_text("Chart", c2c_instructions(np.zeros((2, 2), dtype=np.uint8)), "Intro")
+    assert text.splitlines()[:3] == ["Chart", "=====", "Intro"]
+    assert "Row 3 (decrease, 1): 1×C1" in text
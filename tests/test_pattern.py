@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from crochet.gauge import default_gauge
+from crochet.pattern import FORMATS, build_pattern, color_bands, pattern_metrics, render_pattern, unit_abbreviation
+from crochet.stitches import get_library
+
+
+@pytest.fixture
+def stitch():
+    library = get_library()
+    key = next(iter(library.names))
+    return key, library[key]
+
+
+def test_metrics():
+    assert pattern_metrics(100, 15, 4) == {"size_per_color": 25, "est_rounds": 34, "foundation": 22}
+    assert pattern_metrics(100, 0, 4)["est_rounds"] == 40
+
+
+def test_color_bands_cover_rounds_in_order():
+    bands = color_bands(3, 20)
+    assert [(b.color, b.first_round, b.last_round) for b in bands] == [(1, 0, 10), (2, 10, 20), (3, 20, 30)]
+
+
+def test_units():
+    assert unit_abbreviation("Metric (cm)") == "cm"
+    assert unit_abbreviation("Imperial (inches)") == '"'
+
+
+def test_model_is_a_value(stitch):
+    key, info = stitch
+    a = build_pattern("Square", key, info, 100, 15, 3, "Metric (cm)")
+    b = build_pattern("Square", key, info, 100, 15, 3, "Metric (cm)")
+    assert a == b and hash(a) == hash(b)
+    assert a != build_pattern("Square", key, info, 100, 15, 4, "Metric (cm)")
+    assert json.loads(json.dumps(a.to_dict()))["stitch_info"] == info
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_every_format_renders_the_model(stitch, fmt):
+    key, info = stitch
+    text = render_pattern(build_pattern("Circle", key, info, 80, 10, 2, "Metric (cm)"), fmt)
+    assert "Circle" in text and "Color 2" in text
+    assert "$" not in text  # every template field was substituted
+
+
+def test_html_is_escaped(stitch):
+    key, info = stitch
+    text = render_pattern(build_pattern("<Square>", key, info, 80, 10, 2, "Metric (cm)"), "html")
+    assert "&lt;Square&gt;" in text and "<Square>" not in text
+
+
+def test_unknown_format(stitch):
+    key, info = stitch
+    with pytest.raises(ValueError, match="unknown pattern format"):
+        render_pattern(build_pattern("Square", key, info, 80, 10, 2, "Metric (cm)"), "rtf")
+
+
+def test_gauge_adds_rounds_and_yardage(stitch):
+    key, info = stitch
+    model = build_pattern("Square", key, info, 50, 0, 2, "Metric (cm)", gauge=default_gauge("Worsted (4)"))
+    assert model.est_rounds == len(model.round_counts) > 0
+    assert len(model.band_meters) == 2 and all(m > 0 for m in model.band_meters)
+    assert "Worsted (4)" in render_pattern(model, "markdown")
@@ -0,0 +1,97 @@
+import io
+import re
+
+import numpy as np
+import pytest
+
+from crochet.engine import Chart
+from crochet.pdf import A4, LETTER, PdfWriter, chart_tiles, pdf_bytes, pdf_text, text_width, wrap, write_pdf
+
+
+def naive_wrap(s, width, size, bold=False):
+    """Re-measure the candidate line for every word, as a reference for ``wrap``."""
+    lines, line = [], ""
+    for word in s.split(" "):
+        candidate = f"{line} {word}" if line else word
+        if line and text_width(candidate, size, bold) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    lines.append(line)
+    return lines
+
+
+def page_count(data: bytes) -> int:
+    return int(re.search(rb"/Type /Pages /Kids \[[^\]]*\] /Count (\d+)", data).group(1))
+
+
+def test_text_width():
+    assert text_width("", 12) == 0
+    assert text_width("ii", 10) < text_width("WW", 10)
+    assert text_width("Row 1", 10, bold=True) == pytest.approx(text_width("Row 1", 10) * 1.08)
+    assert text_width("é", 10) == pytest.approx(5.56)
+
+
+def test_pdf_text_escapes():
+    assert pdf_text("a (b) \\ c") == b"(a \\(b\\) \\\\ c)"
+    assert pdf_text("×→") == b"(\xd7?)"
+
+
+@pytest.mark.parametrize("width", [30.0, 120.0, 300.0])
+@pytest.mark.parametrize("bold", [False, True])
+def test_wrap_matches_reference(width, bold):
+    words = np.random.default_rng(int(width)).choice(["sc", "ch 3,", "Round", "(2 dc in next st)", "C12", "×"], 200)
+    text = " ".join(words.tolist())
+    lines = wrap(text, width, 9, bold)
+    assert lines == naive_wrap(text, width, 9, bold)
+    assert " ".join(lines) == text
+    assert all(text_width(line, 9, bold) <= width + 1e-9 or " " not in line for line in lines)
+
+
+def test_wrap_edge_cases():
+    assert wrap("", 100, 10) == [""]
+    assert wrap("Supercalifragilistic", 5, 10) == ["Supercalifragilistic"]
+
+
+@pytest.mark.parametrize("height, width, rows, cols, overlap", [(20, 30, 8, 12, 2), (5, 5, 10, 10, 2),
+                                                                (17, 9, 4, 4, 0), (10, 10, 2, 2, 2)])
+def test_chart_tiles_cover_chart(height, width, rows, cols, overlap):
+    chart = Chart(grid=np.zeros((height, width), dtype=np.uint8), palette=[(0, 0, 0)], meta={})
+    tiles = chart_tiles(chart, cols, rows, overlap)
+    covered = np.zeros((height, width), dtype=int)
+    for y0, y1, x0, x1 in tiles:
+        assert 0 <= y0 < y1 <= height and 0 <= x0 < x1 <= width
+        assert y1 - y0 <= rows and x1 - x0 <= cols
+        covered[y0:y1, x0:x1] += 1
+    assert covered.min() >= 1
+    # Working order: the first tile holds the bottom-right corner
+    assert tiles[0][1] == height and tiles[0][3] == width
+    if overlap and len(tiles) > 1 and cols > overlap and width > cols:
+        assert tiles[0][2] == tiles[1][3] - overlap
+
+
+def test_pdf_structure(chart):
+    data = pdf_bytes(chart, "Round 1: 6 sc in ring\nRound 2: 2 sc in each st", title="Test (1)")
+    assert data.startswith(b"%PDF-1.4") and data.rstrip().endswith(b"%%EOF")
+    # Cover, pattern, one chart page, legend and row counts
+    assert page_count(data) == data.count(b"/Type /Page ") == 5
+    assert b"/Title (Test \\(1\\))" in data
+    xref = int(data.rsplit(b"startxref", 1)[1].split()[0])
+    assert data[xref:xref + 4] == b"xref"
+
+
+def test_pdf_page_count_grows_with_tiles():
+    grid = np.indices((150, 120)).sum(axis=0).astype(np.uint8) % 3
+    chart = Chart(grid=grid, palette=[(255, 255, 255), (200, 0, 0), (0, 0, 200)], meta={})
+    buf = io.BytesIO()
+    pages = write_pdf(buf, chart, page_size=LETTER)
+    assert pages == page_count(buf.getvalue()) > 5
+    assert b"/MediaBox [0 0 612.00 792.00]" in buf.getvalue()
+
+
+def test_pattern_only_and_empty_pdf():
+    assert page_count(pdf_bytes(pattern_text="Round 1: sc")) == 2
+    buf = io.BytesIO()
+    PdfWriter(buf, A4).close()
+    assert page_count(buf.getvalue()) == 0
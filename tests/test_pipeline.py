@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from crochet.cache import ChartCache
+from crochet.pipeline import ChartPipeline, Memo, PatternPipeline, value_nbytes
+from crochet.stitches import get_library
+
+
+@pytest.fixture
+def pipeline():
+    return ChartPipeline(ChartCache())
+
+
+def test_memo_computes_once():
+    memo, calls = Memo("t"), []
+    for _ in range(3):
+        assert memo.get("k", lambda: calls.append(1) or "v") == "v"
+    assert len(calls) == 1 and memo.stats() == {"hits": 2, "misses": 1, "items": 1}
+
+
+def test_memo_evicts_least_recently_used():
+    memo = Memo("t", maxsize=2)
+    memo.get("a", lambda: 1)
+    memo.get("b", lambda: 2)
+    memo.get("a", lambda: 0)
+    memo.get("c", lambda: 3)
+    assert memo.get("a", lambda: "recomputed") == 1
+    assert memo.get("b", lambda: "recomputed") == "recomputed"
+
+
+def test_memo_byte_budget():
+    memo = Memo("t", maxsize=100, max_bytes=250)
+    memo.get("a", lambda: b"x" * 100)
+    memo.get("b", lambda: b"x" * 100)
+    memo.get("c", lambda: b"x" * 100)  # pushes "a" out
+    stats = memo.stats()
+    assert stats["items"] == 2 and stats["bytes"] == 200 and stats["evictions"] == 1
+    assert memo.get("a", lambda: "recomputed") == "recomputed"
+
+
+def test_memo_skips_values_over_the_whole_budget():
+    memo = Memo("t", max_bytes=250)
+    memo.get("small", lambda: b"x" * 10)
+    assert memo.get("huge", lambda: b"x" * 1000) == b"x" * 1000
+    stats = memo.stats()
+    assert stats["skipped"] == 1 and stats["items"] == 1 and stats["bytes"] == 10
+
+
+def test_value_nbytes(image, chart):
+    assert value_nbytes(b"abcd") == 4
+    assert value_nbytes(np.zeros((10, 10), dtype=np.uint16)) == 200
+    assert value_nbytes(image) == 240 * 180 * 3
+    assert value_nbytes((image, {"source_size": (240, 180)})) == 240 * 180 * 3
+    assert value_nbytes(chart) >= chart.grid.nbytes
+
+
+def test_changing_color_count_reuses_the_resize(pipeline, png_bytes):
+    key5, chart5 = pipeline.convert(png_bytes, 40, 5)
+    key8, chart8 = pipeline.convert(png_bytes, 40, 8)
+    assert key5 != key8
+    stats = pipeline.stats()
+    assert stats["decode"]["misses"] == 1
+    assert (stats["resize"]["hits"], stats["resize"]["misses"]) == (1, 1)
+    assert pipeline.convert(png_bytes, 40, 5) == (key5, chart5)
+
+
+def test_changing_width_decodes_once(pipeline, png_bytes):
+    pipeline.convert(png_bytes, 40, 5)
+    pipeline.convert(png_bytes, 50, 5)
+    stats = pipeline.stats()
+    assert stats["decode"]["hits"] == 1 and stats["resize"]["misses"] == 2
+
+
+def test_decode_stage_skips_sources_over_budget(pipeline, png_bytes):
+    pipeline.decode.max_bytes = 1000
+    pipeline.convert(png_bytes, 40, 5)
+    assert pipeline.stats()["decode"]["items"] == 0 and pipeline.stats()["decode"]["skipped"] == 1
+
+
+def test_cleanup_off_returns_chart_unchanged(pipeline, chart):
+    assert pipeline.cleaned("k", chart) == ("k", chart)
+    key, cleaned = pipeline.cleaned("k", chart, min_area=3)
+    assert key.startswith("k:clean:") and cleaned is not chart
+    assert pipeline.cleaned("k", chart, min_area=3)[1] is cleaned
+
+
+def test_exports_are_memoized(pipeline, chart):
+    assert pipeline.csv("k", chart) is pipeline.csv("k", chart)
+    assert pipeline.png("k", chart).startswith(b"\x89PNG")
+    assert pipeline.preview_png("k", chart, size=100) is pipeline.preview_png("k", chart, size=100)
+    assert pipeline.stats()["export"]["hits"] == 1 and pipeline.stats()["preview"]["hits"] == 1
+
+
+def test_pattern_pipeline_reuses_metrics_across_units():
+    pipeline = PatternPipeline()
+    library = get_library()
+    stitch_key = next(iter(library.names))
+    model = pipeline.model("Circle", stitch_key, library[stitch_key], 100, 15, 3, "Metric (cm)")
+    assert pipeline.model("Circle", stitch_key, library[stitch_key], 100, 15, 3, "Metric (cm)") is model
+    pipeline.model("Circle", stitch_key, library[stitch_key], 100, 15, 3, "Imperial (inches)")
+    stats = pipeline.stats()
+    assert stats["metrics"] == {"hits": 1, "misses": 1, "items": 1}
+    assert pipeline.render(model, "markdown") is pipeline.render(model, "markdown")
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from crochet.quantize import (YARN_PALETTES, hex_to_rgb, kmeans, nearest_center, quantize, quantizer_names,
+                              rgb_to_lab, unique_colors)
+
+
+@pytest.fixture
+def small(image):
+    return image.resize((60, 45))
+
+
+@pytest.mark.parametrize("method", quantizer_names())
+def test_every_backend_respects_the_color_cap(small, method):
+    grid, palette, _meta = quantize(small, 5, method)
+    assert grid.shape == (45, 60) and grid.dtype == np.uint8
+    assert 1 <= len(palette) <= 5
+    assert int(grid.max()) < len(palette)
+
+
+def test_unknown_quantizer_is_rejected(small):
+    with pytest.raises(ValueError, match="unknown quantizer"):
+        quantize(small, 5, "octree")
+    with pytest.raises(ValueError, match="unknown yarn palette"):
+        quantize(small, 5, "yarn:Nope")
+
+
+def test_kmeans_is_seeded(small):
+    a, b = kmeans(small, 6), kmeans(small, 6)
+    assert np.array_equal(a[0], b[0]) and a[1] == b[1]
+
+
+def test_kmeans_keeps_exact_colors_when_there_are_few():
+    rgb = np.zeros((10, 10, 3), dtype=np.uint8)
+    rgb[:, 5:] = (200, 40, 10)
+    grid, palette, _meta = kmeans(Image.fromarray(rgb), 8)
+    assert sorted(palette) == [(0, 0, 0), (200, 40, 10)]
+    assert np.array_equal(np.array(palette)[grid], rgb)
+
+
+def test_yarn_palette_uses_only_named_shades(small):
+    grid, palette, meta = quantize(small, 6, "yarn:Worsted Basics")
+    shades = YARN_PALETTES["Worsted Basics"]
+    assert meta["yarn_palette"] == "Worsted Basics"
+    assert len(meta["color_names"]) == len(palette)
+    for name, rgb in zip(meta["color_names"], palette):
+        assert hex_to_rgb(shades[name]) == rgb
+
+
+def test_yarn_palette_maps_a_shade_to_itself():
+    rgb = hex_to_rgb(YARN_PALETTES["Cotton Pastels"]["Mint"])
+    grid, palette, meta = quantize(Image.new("RGB", (4, 4), rgb), 3, "yarn:Cotton Pastels")
+    assert meta["color_names"] == ["Mint"] and palette == [rgb] and not grid.any()
+
+
+def test_nearest_center_matches_brute_force():
+    rng = np.random.default_rng(0)
+    points, centers = rng.normal(size=(500, 3)), rng.normal(size=(7, 3))
+    brute = ((points[:, None] - centers[None]) ** 2).sum(-1).argmin(1)
+    assert np.array_equal(nearest_center(points, centers, chunk=64), brute)
+
+
+def test_unique_colors_round_trip():
+    rgb = np.random.default_rng(0).integers(0, 3, (100, 3)).astype(np.uint8) * 100
+    colors, inverse, counts = unique_colors(rgb)
+    assert np.array_equal(colors[inverse], rgb)
+    assert counts.sum() == 100
+
+
+def test_lab_reference_points():
+    lab = rgb_to_lab(np.array([[0, 0, 0], [255, 255, 255]], dtype=np.uint8))
+    assert lab[0] == pytest.approx([0, 0, 0], abs=0.5)
+    assert lab[1] == pytest.approx([100, 0, 0], abs=0.5)
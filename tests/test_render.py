@@ -0,0 +1,120 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from crochet.engine import Chart
+from crochet.render import (EXTRA_COLORS, MIN_GRID_CELL, PRINT_CELL_RANGE, PRINT_MAX_PX, SYMBOLS, fit_cell,
+                            label_mask, print_cell, render_chart, render_png, stamp_label, symbol_name)
+
+
+def extra(chart, i):
+    """Palette index of ``EXTRA_COLORS[i]`` in a render of ``chart``: bg, minor, major, dark, light."""
+    return len(chart.palette) + i
+
+
+def test_unlabelled_render_is_indexed_grid(chart):
+    image = render_chart(chart, 10, labels=False, grid_every=0)
+    assert image.mode == "P" and image.size == (301, 201)
+    pixels = np.asarray(image)
+    # Cell interiors carry the stitch's palette index
+    assert (pixels[5::10, 5::10][:20, :30] == chart.grid).all()
+    assert image.getpalette()[:12] == [c for rgb in chart.palette for c in rgb]
+    assert image.getpalette()[12:15] == list(EXTRA_COLORS[0])
+
+
+def test_gridlines(chart):
+    pixels = np.asarray(render_chart(chart, 10, labels=False))
+    minor, major = extra(chart, 1), extra(chart, 2)
+    assert (pixels[10, :] == minor).sum() > 250
+    # Heavy lines every 10 stitches from the bottom-right corner, 2 px wide
+    for y in (0, 99, 100, 199, 200):
+        assert (pixels[y, 1:-1] == major).all()
+    for x in (0, 99, 100, 199, 200, 299, 300):
+        assert (pixels[1:-1, x] == major).all()
+
+
+def test_offsets_shift_heavy_lines(chart):
+    pixels = np.asarray(render_chart(chart, 10, labels=False, row_offset=3, col_offset=4))
+    major = extra(chart, 2)
+    assert (pixels[30, 1:-1] == major).all() and (pixels[130, 1:-1] == major).all()
+    assert (pixels[1:-1, 40] == major).all() and (pixels[1:-1, 140] == major).all()
+    assert not (pixels[100, 1:-1] == major).all()
+
+
+def test_tiny_cells_have_no_gridlines(chart):
+    pixels = np.asarray(render_chart(chart, MIN_GRID_CELL - 1, labels=False))
+    assert not np.isin(pixels, [extra(chart, 1), extra(chart, 2)]).any()
+
+
+def test_labels_add_margins_in_dark_ink(chart):
+    plain = render_chart(chart, 10, labels=False)
+    labelled = render_chart(chart, 10)
+    assert labelled.width > plain.width and labelled.height > plain.height
+    pixels, body = np.asarray(labelled), np.asarray(plain)
+    # The chart itself is unchanged; the numbers sit around it
+    offsets = [(y, x) for y in range(pixels.shape[0] - body.shape[0] + 1)
+               for x in range(pixels.shape[1] - body.shape[1] + 1)
+               if (pixels[y:y + body.shape[0], x:x + body.shape[1]] == body).all()]
+    assert len(offsets) == 1
+    y, x = offsets[0]
+    margins = pixels.copy()
+    margins[y:y + body.shape[0], x:x + body.shape[1]] = extra(chart, 0)
+    assert set(np.unique(margins).tolist()) == {extra(chart, 0), extra(chart, 3)}
+
+
+def test_symbols_use_legible_ink(chart):
+    pixels = np.asarray(render_chart(chart, 12, labels=False, symbols=True, grid_every=0))
+    dark, light = extra(chart, 3), extra(chart, 4)
+    white = pixels[1:12, 1:12]     # a white stitch gets dark ink
+    blue = pixels[61:72, 37:48]    # a dark blue block gets light ink
+    assert (white == dark).any() and not (white == light).any()
+    assert (blue == light).any() and not (blue == dark).any()
+    assert not np.isin(np.asarray(render_chart(chart, 12, labels=False, grid_every=0)), [dark, light]).any()
+
+
+def test_symbol_names_cycle():
+    assert symbol_name(0) == SYMBOLS[0] and symbol_name(len(SYMBOLS)) == SYMBOLS[0]
+    assert len(set(SYMBOLS)) == len(SYMBOLS)
+
+
+def test_label_mask_is_cached_and_read_only():
+    mask, _dx, _dy = label_mask("12", 14, "rm")
+    assert mask.dtype == bool and mask.any() and not mask.flags.writeable
+    assert label_mask("12", 14, "rm")[0] is mask
+
+
+@pytest.mark.parametrize("x, y", [(20, 20), (-3, 20), (20, -4), (59, 39), (200, 200)])
+def test_stamp_label_clips(x, y):
+    canvas = np.zeros((40, 60), dtype=np.uint8)
+    stamp_label(canvas, x, y, "88", 12, "lt", 7)
+    mask, dx, dy = label_mask("88", 12, "lt")
+    full = np.zeros((40 + 2 * 100, 60 + 2 * 100), dtype=np.uint8)
+    top, left = 100 + y + dy, 100 + x + dx
+    if 0 <= top and 0 <= left and top + mask.shape[0] <= full.shape[0] and left + mask.shape[1] <= full.shape[1]:
+        full[top:top + mask.shape[0], left:left + mask.shape[1]][mask] = 7
+    assert (canvas == full[100:140, 100:160]).all()
+    assert set(np.unique(canvas).tolist()) <= {0, 7}
+
+
+def test_cell_sizes():
+    wide = Chart(grid=np.zeros((100, 400), dtype=np.uint8), palette=[(0, 0, 0)], meta={})
+    assert fit_cell(wide, 1200) == 3 and fit_cell(wide, 100) == 1 and fit_cell(wide, 100, min_cell=2) == 2
+    assert print_cell(wide) == PRINT_MAX_PX // 400
+    small = Chart(grid=np.zeros((5, 5), dtype=np.uint8), palette=[(0, 0, 0)], meta={})
+    assert print_cell(small) == PRINT_CELL_RANGE[1]
+    huge = Chart(grid=np.zeros((10, 5000), dtype=np.uint8), palette=[(0, 0, 0)], meta={})
+    assert print_cell(huge) == PRINT_CELL_RANGE[0]
+
+
+def test_cell_aspect(chart):
+    image = render_chart(chart, 10, cell_aspect=0.8, labels=False)
+    assert image.size == (301, 161)
+
+
+def test_render_png(chart):
+    data = render_png(chart, 8, symbols=True)
+    image = Image.open(io.BytesIO(data))
+    assert image.format == "PNG" and image.mode == "P"
+    assert image.size == render_chart(chart, 8, symbols=True).size
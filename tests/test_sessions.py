@@ -0,0 +1,115 @@
+import pytest
+
+from crochet import sessions
+from crochet.sessions import SLOT_OVERHEAD, SessionStore, artifact_nbytes, get_session_store
+
+KB = 1024
+
+
+def blob(kb: int) -> bytes:
+    """An artifact that costs exactly ``kb`` KiB in the store."""
+    return b"x" * (kb * KB - SLOT_OVERHEAD)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sessions.time, "monotonic", clock)
+    return clock
+
+
+def test_artifact_nbytes(chart):
+    assert artifact_nbytes(b"abc") == 3 + SLOT_OVERHEAD
+    assert artifact_nbytes("abcd") == 4 + SLOT_OVERHEAD
+    assert artifact_nbytes(chart) == chart.grid.nbytes + SLOT_OVERHEAD
+    assert artifact_nbytes(object()) == SLOT_OVERHEAD
+
+
+def test_put_get_and_replace():
+    store = SessionStore()
+    assert store.get("s", "source") is None and store.key("s", "source") is None
+    store.put("s", "source", "k1", blob(8))
+    store.put("s", "source", "k2", blob(10))
+    assert store.key("s", "source") == "k2"
+    assert store.stats()["bytes"] == 10 * KB
+    store.discard("s", "source")
+    assert store.get("s", "source") is None and store.stats()["bytes"] == 0
+
+
+def test_session_budget_evicts_oldest_slots():
+    store = SessionStore(session_bytes=20 * KB)
+    store.put("s", "a", 1, blob(8))
+    store.put("s", "b", 2, blob(8))
+    store.put("s", "c", 3, blob(8))
+    assert store.get("s", "a") is None
+    assert store.key("s", "b") == 2 and store.key("s", "c") == 3
+    assert store.stats()["bytes"] == 16 * KB and store.stats()["evictions"] == 1
+
+
+def test_session_budget_keeps_newest_slot_even_if_too_big():
+    store = SessionStore(session_bytes=10 * KB)
+    store.put("s", "a", 1, blob(4))
+    store.put("s", "big", 2, blob(50))
+    assert store.get("s", "a") is None and store.key("s", "big") == 2
+    assert store.stats()["bytes"] == 50 * KB
+
+
+def test_total_budget_evicts_least_recently_used_session():
+    store = SessionStore(session_bytes=100 * KB, total_bytes=30 * KB)
+    store.put("old", "a", 1, blob(10))
+    store.put("mid", "a", 2, blob(10))
+    store.get("old", "a")  # "mid" is now the least recently used
+    store.put("new", "a", 3, blob(15))
+    assert store.get("mid", "a") is None
+    assert store.key("old", "a") == 1 and store.key("new", "a") == 3
+    stats = store.stats()
+    assert stats["sessions"] == 2 and stats["bytes"] == 25 * KB and stats["evictions"] == 1
+
+
+def test_total_budget_never_drops_the_writing_session():
+    store = SessionStore(session_bytes=100 * KB, total_bytes=10 * KB)
+    store.put("other", "a", 1, blob(5))
+    store.put("me", "a", 2, blob(40))
+    assert store.get("other", "a") is None and store.key("me", "a") == 2
+
+
+def test_idle_sessions_expire(clock):
+    store = SessionStore(ttl=60)
+    store.put("idle", "a", 1, blob(4))
+    store.put("busy", "a", 2, blob(4))
+    clock.now += 45
+    store.get("busy", "a")
+    clock.now += 30
+    assert store.get("idle", "a") is None
+    assert store.key("busy", "a") == 2
+    stats = store.stats()
+    assert stats["expired"] == 1 and stats["sessions"] == 1 and stats["bytes"] == 4 * KB
+
+
+def test_discard_session_and_clear():
+    store = SessionStore()
+    store.put("s", "a", 1, blob(4))
+    store.put("s", "b", 2, blob(4))
+    store.put("t", "a", 3, blob(4))
+    store.discard("s")
+    assert store.get("s", "b") is None and store.stats()["bytes"] == 4 * KB
+    store.clear()
+    assert store.stats()["sessions"] == 0 and store.stats()["bytes"] == 0
+
+
+def test_get_session_store_reads_environment(monkeypatch):
+    monkeypatch.setattr(sessions, "_store", None)
+    monkeypatch.setenv("CROCHET_SESSION_MB", "2")
+    monkeypatch.setenv("CROCHET_SESSIONS_TOTAL_MB", "8")
+    monkeypatch.setenv("CROCHET_SESSION_TTL_S", "90")
+    store = get_session_store()
+    assert store is get_session_store()
+    assert (store.session_bytes, store.total_bytes, store.ttl) == (2 * 1024 * 1024, 8 * 1024 * 1024, 90.0)
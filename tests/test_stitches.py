@@ -0,0 +1,129 @@
+import json
+import sqlite3
+
+import pytest
+
+from crochet import stitches
+from crochet.stitches import DIFFICULTIES, DRAPES, FIELDS, StitchLibrary, get_library, load_records, tokens
+
+
+def record(name, desc="Plain fabric.", uk="dc", us="sc", difficulty="Beginner", drape="Medium"):
+    return {"name": name, "desc": desc, "abbr_uk": uk, "abbr_us": us, "video": f"https://example.com/{name}",
+            "tutorial_name": f"{name} tutorial", "difficulty": difficulty, "drape": drape}
+
+
+RECORDS = [
+    record("Shell Stitch", "Scalloped fans of double crochet.", "5tr", "5dc", "Intermediate", "Airy"),
+    record("Granite Stitch", "Dense woven texture.", "dc, ch1", "sc, ch1", "Beginner", "Structured"),
+    record("Bobble", "Puffed clusters.", "5tr cl", "5dc cl", "Advanced", "Dimensional"),
+    record("Shelled Mesh", "Open mesh with shells.", "tr, ch2", "dc, ch2", "Beginner", "Airy"),
+]
+
+
+def naive_search(library, query="", difficulty=None, drape=None, abbreviation="", terminology=None):
+    """Scan every record; the reference for the indexed search."""
+    out = []
+    for name, info in library.stitches.items():
+        words = tokens(f"{name} {info['desc']} {info['tutorial_name']}")
+        abbrs = {"UK": tokens(info["abbr_uk"]), "US": tokens(info["abbr_us"])}
+        terms = ("UK", "US") if terminology is None else (terminology,)
+        if difficulty is not None and info["difficulty"] not in difficulty:
+            continue
+        if drape is not None and info["drape"] not in drape:
+            continue
+        if not all(any(a in abbrs[t] for t in terms) for a in tokens(abbreviation)):
+            continue
+        if not all(any(w.startswith(q) for w in words) or q in abbrs["UK"] + abbrs["US"] for q in tokens(query)):
+            continue
+        out.append(name)
+    return out
+
+
+@pytest.fixture
+def library():
+    return StitchLibrary(RECORDS)
+
+
+def test_tokens():
+    assert tokens("5dc Shell, ch-1!") == ["5dc", "shell", "ch", "1"]
+
+
+@pytest.mark.parametrize("kwargs, expected", [
+    ({}, ["Shell Stitch", "Granite Stitch", "Bobble", "Shelled Mesh"]),
+    ({"query": "shell"}, ["Shell Stitch", "Shelled Mesh"]),
+    ({"query": "shell mesh"}, ["Shelled Mesh"]),
+    ({"query": "SC"}, ["Shell Stitch", "Granite Stitch"]),  # "scalloped" or the sc abbreviation
+    ({"query": "CH1"}, ["Granite Stitch"]),
+    ({"query": "nothing"}, []),
+    ({"difficulty": ["Beginner"]}, ["Granite Stitch", "Shelled Mesh"]),
+    ({"difficulty": ["Beginner", "Advanced"], "drape": ["Airy", "Dimensional"]}, ["Bobble", "Shelled Mesh"]),
+    ({"difficulty": []}, []),
+    ({"abbreviation": "dc"}, ["Granite Stitch", "Shelled Mesh"]),
+    ({"abbreviation": "dc", "terminology": "US"}, ["Shelled Mesh"]),
+    ({"abbreviation": "dc", "terminology": "UK"}, ["Granite Stitch"]),
+])
+def test_search(library, kwargs, expected):
+    assert library.search(**kwargs) == expected
+    assert naive_search(library, **kwargs) == expected
+
+
+@pytest.mark.parametrize("query", ["", "st", "stitch", "dc", "ch", "shell", "open fabric", "beginner"])
+@pytest.mark.parametrize("difficulty", [None, ["Beginner"], ["Intermediate", "Advanced"]])
+@pytest.mark.parametrize("abbreviation, terminology", [("", None), ("ch1", None), ("sc", "US"), ("tr", "UK")])
+def test_bundled_library_search_matches_scan(query, difficulty, abbreviation, terminology):
+    library = get_library()
+    assert (library.search(query, difficulty, None, abbreviation, terminology)
+            == naive_search(library, query, difficulty, None, abbreviation, terminology))
+
+
+def test_bundled_library_is_valid():
+    library = get_library()
+    assert len(library) > 0
+    assert set(library.facets()["difficulty"]) <= set(DIFFICULTIES)
+    assert set(library.facets()["drape"]) <= set(DRAPES)
+    assert sum(library.facets()["difficulty"].values()) == len(library)
+
+
+def test_page():
+    names = [f"s{i}" for i in range(25)]
+    assert StitchLibrary.page(names, 1, 10) == names[:10]
+    assert StitchLibrary.page(names, 3, 10) == names[20:]
+    assert StitchLibrary.page(names, 4, 10) == []
+    assert StitchLibrary.page(names, 0, 10) == names[:10]
+
+
+def test_lookup_and_facets(library):
+    assert "Bobble" in library and "Popcorn" not in library
+    assert library["Bobble"]["abbr_us"] == "5dc cl"
+    assert library.facets()["drape"] == {"Airy": 2, "Structured": 1, "Dimensional": 1}
+
+
+def test_missing_field_is_rejected():
+    bad = dict(RECORDS[0], video="")
+    with pytest.raises(ValueError, match="video"):
+        StitchLibrary([bad])
+
+
+def test_load_json_and_sqlite(tmp_path):
+    path = tmp_path / "lib.json"
+    path.write_text(json.dumps({"version": 1, "stitches": RECORDS}), encoding="utf-8")
+    assert load_records(str(path)) == RECORDS
+    path.write_text(json.dumps(RECORDS), encoding="utf-8")
+    assert StitchLibrary.load(str(path)).names == [r["name"] for r in RECORDS]
+
+    db = tmp_path / "lib.sqlite"
+    with sqlite3.connect(db) as conn:
+        conn.execute(f"CREATE TABLE stitches (name TEXT, {', '.join(f'{f} TEXT' for f in FIELDS)})")
+        conn.executemany(f"INSERT INTO stitches VALUES ({', '.join('?' * (len(FIELDS) + 1))})",
+                         [[r["name"]] + [r[f] for f in FIELDS] for r in RECORDS])
+    conn.close()
+    assert StitchLibrary.load(str(db)).search("shell") == ["Shell Stitch", "Shelled Mesh"]
+
+
+def test_get_library_reads_environment(tmp_path, monkeypatch):
+    path = tmp_path / "lib.json"
+    path.write_text(json.dumps({"stitches": RECORDS[:2]}), encoding="utf-8")
+    monkeypatch.setattr(stitches, "_library", None)
+    monkeypatch.setenv("CROCHET_STITCH_LIBRARY", str(path))
+    assert get_library().names == ["Shell Stitch", "Granite Stitch"]
+    assert list(stitches.STITCH_DATABASE) == ["Shell Stitch", "Granite Stitch"]
@@ -0,0 +1,93 @@
+import pytest
+
+from crochet.timing import BUCKETS, METRIC_NAME, RECENT_SAMPLES, Histogram, Registry, get_registry, span, timed
+
+
+def test_histogram_buckets_and_summary():
+    h = Histogram()
+    for seconds in (0.0005, 0.001, 0.02, 0.3, 20.0):
+        h.observe(seconds)
+    assert h.count == 5 and sum(h.counts) == 5
+    # Bounds are inclusive upper limits; anything past the last one lands in +Inf
+    assert h.counts[BUCKETS.index(0.001)] == 2
+    assert h.counts[BUCKETS.index(0.025)] == 1
+    assert h.counts[BUCKETS.index(0.5)] == 1
+    assert h.counts[-1] == 1
+    summary = h.summary()
+    assert summary["total_ms"] == pytest.approx(20321.5)
+    assert summary["mean_ms"] == pytest.approx(20321.5 / 5)
+    assert summary["max_ms"] == pytest.approx(20000.0)
+
+
+def test_histogram_percentiles():
+    h = Histogram()
+    assert h.percentile(50) == 0.0 and h.summary()["p95_ms"] == 0.0
+    for i in range(1, 101):
+        h.observe(i / 1000.0)
+    assert h.percentile(0) == pytest.approx(0.001)
+    assert h.percentile(50) == pytest.approx(0.051)
+    assert h.percentile(100) == pytest.approx(0.1)
+    assert h.summary()["p99_ms"] == pytest.approx(99.0)
+
+
+def test_histogram_percentiles_use_recent_window():
+    h = Histogram()
+    for _ in range(RECENT_SAMPLES):
+        h.observe(5.0)
+    for _ in range(RECENT_SAMPLES):
+        h.observe(0.002)
+    assert h.count == 2 * RECENT_SAMPLES
+    assert h.percentile(99) == pytest.approx(0.002)
+    assert h.max == 5.0
+
+
+def test_span_records_into_registry_even_on_error():
+    registry = Registry()
+    with span("decode", registry):
+        pass
+    with pytest.raises(RuntimeError):
+        with span("decode", registry):
+            raise RuntimeError("boom")
+    snap = registry.snapshot()
+    assert list(snap) == ["decode"] and snap["decode"]["count"] == 2
+
+
+def test_timed_uses_process_registry():
+    registry = get_registry()
+    before = registry.snapshot().get("test-timed", {}).get("count", 0)
+
+    @timed("test-timed")
+    def double(x):
+        return 2 * x
+
+    assert double(4) == 8 and double.__name__ == "double"
+    assert registry.snapshot()["test-timed"]["count"] == before + 1
+
+
+def test_snapshot_sorted_and_clear():
+    registry = Registry()
+    for stage in ("resize", "decode", "export"):
+        registry.observe(stage, 0.01)
+    assert list(registry.snapshot()) == ["decode", "export", "resize"]
+    registry.clear()
+    assert registry.snapshot() == {}
+
+
+def test_prometheus_text():
+    registry = Registry()
+    registry.observe("decode", 0.003)
+    registry.observe("decode", 0.2)
+    registry.observe('we"ird', 30.0)
+    lines = registry.prometheus_text().splitlines()
+    assert lines[:2] == [f"# HELP {METRIC_NAME} Time spent in each Crochet Architect stage.",
+                         f"# TYPE {METRIC_NAME} histogram"]
+    buckets = [line for line in lines if line.startswith(f'{METRIC_NAME}_bucket{{stage="decode"')]
+    assert len(buckets) == len(BUCKETS) + 1
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert counts == sorted(counts) and counts[-1] == 2
+    assert f'{METRIC_NAME}_bucket{{stage="decode",le="0.005"}} 1' in lines
+    assert f'{METRIC_NAME}_bucket{{stage="decode",le="+Inf"}} 2' in lines
+    assert f'{METRIC_NAME}_sum{{stage="decode"}} 0.203000' in lines
+    assert f'{METRIC_NAME}_count{{stage="decode"}} 2' in lines
+    assert f'{METRIC_NAME}_count{{stage="we\\"ird"}} 1' in lines
+    assert Registry().prometheus_text().count("\n") == 2